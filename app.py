@@ -9,8 +9,10 @@ except ImportError:
 
 import streamlit as st
 import os
-import re
-from src import document_processor, vector_store_manager, rag_chain_builder, config # Your backend modules
+# Only lightweight modules are imported up front. ingestion, rag_chain_builder and
+# resource_registry pull in LangChain, Chroma and the Gemini clients, so they are
+# imported where first needed, i.e. not before an API key has been entered.
+from src import store_janitor, subject_catalog, instrumentation, config # Your backend modules
 
 # --- Page Configuration ---
 st.set_page_config(page_title="AI Course Companion", layout="wide")
@@ -23,7 +25,7 @@ def initialize_session_state():
         st.session_state.GEMINI_API_KEY = None
     
     if "subjects" not in st.session_state:
-        st.session_state.subjects = vector_store_manager.list_available_subjects()
+        st.session_state.subjects = subject_catalog.list_available_subjects()
     if "current_subject" not in st.session_state:
         st.session_state.current_subject = st.session_state.subjects[0] if st.session_state.subjects else None
     if "vector_store" not in st.session_state:
@@ -36,19 +38,145 @@ def initialize_session_state():
         st.session_state.rag_qa_chain = None
     if "summarization_chain" not in st.session_state:
         st.session_state.summarization_chain = None
-    if "quiz_generation_chain" not in st.session_state:
-        st.session_state.quiz_generation_chain = None
+    if "subject_summary_chain" not in st.session_state:
+        st.session_state.subject_summary_chain = None
+    if "quiz_engine" not in st.session_state:
+        st.session_state.quiz_engine = None
 
     # Output related state
     if "chat_history" not in st.session_state: # Used for Q&A
         st.session_state.chat_history = []
+    if "chat_history_pages" not in st.session_state: # Pages of chat_history shown
+        st.session_state.chat_history_pages = 1
+    if "chat_memory" not in st.session_state: # What the Q&A chain remembers (src.chat_memory)
+        st.session_state.chat_memory = None
     if "summary_output" not in st.session_state: # Used for Summarization
         st.session_state.summary_output = ""
     if "quiz_output" not in st.session_state: # Used for Quiz
         st.session_state.quiz_output = ""
 
+    # Timing breakdown of the most recent upload/question, for the debug panel
+    if "last_trace" not in st.session_state:
+        st.session_state.last_trace = None
+
+    # Background ingestion: messages for finished jobs, and subjects to reload after them
+    if "ingest_notices" not in st.session_state:
+        st.session_state.ingest_notices = []
+    if "subjects_to_reload" not in st.session_state:
+        st.session_state.subjects_to_reload = []
+
+    # Snapshot export prepared for download: (subject name, index version, zip bytes)
+    if "snapshot_download" not in st.session_state:
+        st.session_state.snapshot_download = None
+
+def reset_conversation():
+    """Forgets the Q&A transcript and the chain's conversation memory."""
+    st.session_state.chat_history = []
+    st.session_state.chat_history_pages = 1
+    st.session_state.chat_memory = None
+
+def append_chat_message(role, content):
+    """Adds a message to the transcript, dropping the oldest beyond config.CHAT_HISTORY_MAX_MESSAGES."""
+    st.session_state.chat_history.append({"role": role, "content": content})
+    del st.session_state.chat_history[:-config.CHAT_HISTORY_MAX_MESSAGES]
+
+def render_chat_history():
+    """Renders the latest page(s) of the transcript; older messages are shown on request."""
+    history = st.session_state.chat_history
+    shown = min(len(history), config.CHAT_HISTORY_PAGE_SIZE * st.session_state.chat_history_pages)
+    if len(history) > shown:
+        # A fixed label: the widget's identity must not change as messages are added.
+        st.caption(f"{len(history) - shown} earlier messages hidden.")
+        if st.button("Show earlier messages", key="show_earlier_messages_btn"):
+            st.session_state.chat_history_pages += 1
+            st.rerun()
+    for message in history[len(history) - shown:]:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+def render_sources(sources):
+    """Shows the retrieved source chunks for an answer in a collapsible list."""
+    if sources:
+        from src.near_duplicates import appears_in
+        with st.expander("View Sources Used"):
+            for i, doc in enumerate(sources):
+                source_name = doc.metadata.get('source', 'Unknown')
+                page_num = doc.metadata.get('page', 'N/A')
+                subject_tag = f"[{doc.metadata['subject']}] " if "subject" in doc.metadata else ""
+                st.markdown(f"**Source {i+1}:** {subject_tag}`{os.path.basename(source_name)}` (Page: {page_num})")
+                # Near-identical chunks elsewhere in the subject were merged into this one at ingest.
+                other_places = [
+                    f"`{source}` (Page: {page})" for source, page in appears_in(doc.metadata)
+                    if (source, page) != (os.path.basename(source_name), page_num)
+                ]
+                if other_places:
+                    st.caption("Also appears in: " + ", ".join(other_places))
+                st.caption(f"> {doc.page_content[:250].replace(chr(10), ' ')}...")
+
+def render_debug_panel():
+    """Shows where the time went in the last request, plus process-wide cache hit rates."""
+    trace = st.session_state.last_trace
+    if trace:
+        st.markdown(f"**Last request:** `{trace['request']}` took {trace['total_seconds']:.2f}s")
+        stage_rows = [
+            {"stage": stage, "calls": entry["count"], "seconds": round(entry["seconds"], 3)}
+            for stage, entry in sorted(trace["stages"].items(), key=lambda item: -item[1]["seconds"])
+        ]
+        st.dataframe(stage_rows, hide_index=True, use_container_width=True)
+        if trace["counts"]:
+            st.json(trace["counts"], expanded=False)
+    else:
+        st.caption("No request recorded yet in this session.")
+
+    hit_rates = instrumentation.get_metrics().cache_hit_rates()
+    if hit_rates:
+        st.markdown("**Cache hit rates (all sessions):**")
+        for cache_name, entry in sorted(hit_rates.items()):
+            st.caption(f"{cache_name}: {entry['hit_rate']:.0%} ({int(entry['hits'])} hits / {int(entry['misses'])} misses)")
+
+def format_quiz(questions):
+    """Renders question records from the quiz engine as text; None if there are none."""
+    if not questions:
+        return None
+    blocks = []
+    for question in questions:
+        options = "\n".join(f"{letter}) {text}" for letter, text in sorted(question["options"].items()))
+        blocks.append(
+            f"Q: {question['question']}\n{options}\nAnswer: {question['answer']}\n"
+            f'Source: {question["source"]} (Page: {question["page"]}) - "{question["snippet"]}"'
+        )
+    return "\n\n".join(blocks)
+
+def quiz_tokens(events, questions):
+    """Yields the text of QuizEngine.stream_quiz events as it is generated; the final question records go into `questions`."""
+    for kind, value in events:
+        if kind == "token":
+            yield value
+        elif kind == "questions":
+            questions.extend(value)
+
+@st.cache_resource(show_spinner=False)
+def load_demo_video_html():
+    """
+    Reads and base64-encodes the landing-page demo video once per process; every rerun
+    of the landing page reuses the same HTML string.
+    """
+    with open("assets/feature_demo.mp4", "rb") as video_file:
+        video_bytes = video_file.read()
+    # Encode the video in base64
+    video_base64 = base64.b64encode(video_bytes).decode()
+
+    # Create the HTML string for the video
+    return f"""
+        <video autoplay loop muted playsinline style="width: 100%; border-radius: 10px; box-shadow: 0 4px 12px rgba(0,0,0,0.1);">
+          <source src="data:video/mp4;base64,{video_base64}" type="video/mp4">
+          Your browser does not support the video tag.
+        </video>
+        """
+
 def load_subject_data(subject_name):
     """Loads vector store and ALL RAG chains for the selected subject."""
+    from src import resource_registry
     if not st.session_state.get("GEMINI_API_KEY"):
         st.error("Please enter your Google AI API Key in the sidebar to load a subject.")
         return
@@ -56,76 +184,201 @@ def load_subject_data(subject_name):
     if subject_name:
         # Only reset history if the subject is actually changing
         if st.session_state.get('current_subject') != subject_name:
-            st.session_state.chat_history = []
+            reset_conversation()
             st.session_state.summary_output = ""
             st.session_state.quiz_output = ""
 
         st.session_state.current_subject = subject_name
         with st.spinner(f"Loading data and building chains for {subject_name}..."):
-            vs = vector_store_manager.create_or_load_subject_vector_store(subject_name, st.session_state.GEMINI_API_KEY)
-            st.session_state.vector_store = vs
-            if vs:
-                api_key = st.session_state.GEMINI_API_KEY
-                st.session_state.rag_qa_chain = rag_chain_builder.create_rag_qa_chain(vs, api_key)
-                st.session_state.summarization_chain = rag_chain_builder.create_summarization_chain(vs, api_key)
-                st.session_state.quiz_generation_chain = rag_chain_builder.create_quiz_chain(vs, api_key)
+            # Stores and chains are cached per session, subject and index version, so
+            # switching back to a subject reuses what was already built.
+            resources = resource_registry.get_subject_resources(subject_name, st.session_state.GEMINI_API_KEY)
+            if resources:
+                st.session_state.vector_store = resources.vector_store
+                st.session_state.rag_qa_chain = resources.rag_qa_chain
+                st.session_state.summarization_chain = resources.summarization_chain
+                st.session_state.subject_summary_chain = resources.subject_summary_chain
+                st.session_state.quiz_engine = resources.quiz_engine
                 st.success(f"Switched to subject: {subject_name}. All modes are ready.")
             else:
+                st.session_state.vector_store = None
                 st.session_state.rag_qa_chain = None
                 st.session_state.summarization_chain = None
-                st.session_state.quiz_generation_chain = None
+                st.session_state.subject_summary_chain = None
+                st.session_state.quiz_engine = None
                 st.warning(f"No vector store found for {subject_name}. Please upload documents.")
     else: # subject_name is None
         st.session_state.current_subject = None
         st.session_state.vector_store = None
         st.session_state.rag_qa_chain = None
         st.session_state.summarization_chain = None
-        st.session_state.quiz_generation_chain = None
-        st.session_state.chat_history = []
+        st.session_state.subject_summary_chain = None
+        st.session_state.quiz_engine = None
+        reset_conversation()
         st.session_state.summary_output = ""
         st.session_state.quiz_output = ""
 
 def handle_pdf_upload(uploaded_files, subject_name):
-    """Processes uploaded PDF files for the given subject."""
+    """
+    Queues uploaded PDF files for the given subject as background ingestion jobs, so the
+    session stays usable (and the work survives a rerun or disconnect) while they run.
+    """
+    from src import ingest_jobs, resource_registry
+
     if not subject_name:
         st.error("Please select or add a subject first!")
         return
     if uploaded_files:
-        files_processed_successfully = False
+        job_queue = ingest_jobs.get_job_queue()
+        embeddings_model = resource_registry.get_embeddings_model(st.session_state.GEMINI_API_KEY)
         for uploaded_file in uploaded_files:
-            file_path = os.path.join(config.UPLOAD_DIRECTORY, uploaded_file.name)
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-            with st.spinner(f"Processing {uploaded_file.name} for {subject_name}..."):
-                try:
-                    docs = document_processor.load_pdf(file_path)
-                    split_docs = document_processor.split_documents(docs)
-                    
-                    # <<< MODIFY THIS LINE >>>
-                    vector_store_manager.create_or_load_subject_vector_store(
-                        subject_name,
-                        st.session_state.GEMINI_API_KEY, # Pass the key here
-                        docs_to_add=split_docs
-                    )
-                    st.success(f"Processed and added {uploaded_file.name} to {subject_name}.")
-                    files_processed_successfully = True
-                except Exception as e:
-                    st.error(f"Error processing {uploaded_file.name}: {e}")
-                finally:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-
-        if files_processed_successfully:
-            # Reload data and rebuild all chains for the current subject as its VS has changed
-            load_subject_data(subject_name)
-            # Refresh subject list in case a new subject's VS was just created
-            st.session_state.subjects = vector_store_manager.list_available_subjects()
-            st.rerun() # Rerun to reflect updated chains and subject list
+            job_queue.submit(
+                subject_name,
+                uploaded_file.name,
+                uploaded_file.getvalue(),
+                st.session_state.GEMINI_API_KEY, # Pass the key here
+                embeddings_model=embeddings_model
+            )
+        st.info(f"Queued {len(uploaded_files)} file(s) for {subject_name}. You can keep working while they are processed.")
+
+def handle_snapshot_import(snapshot_file, subject_name):
+    """
+    Creates a subject from an uploaded snapshot. Its stored embeddings are loaded as they
+    are, so this takes seconds and makes no embedding calls.
+    """
+    from src import resource_registry, vector_store_manager
+
+    try:
+        result = vector_store_manager.import_subject_snapshot(
+            subject_name,
+            snapshot_file,
+            st.session_state.GEMINI_API_KEY,
+            embeddings_model=resource_registry.get_embeddings_model(st.session_state.GEMINI_API_KEY)
+        )
+    except ValueError as e:
+        st.error(f"Could not import snapshot: {e}")
+        return
+    imported_path = subject_catalog.get_subject_db_path(result["subject_name"])
+    resource_registry.invalidate_store_path(imported_path)
+    st.session_state.subjects = subject_catalog.list_available_subjects()
+    # The listing shows a normalized name; select the entry that points at the imported store.
+    imported_subject = next(
+        (name for name in st.session_state.subjects if subject_catalog.get_subject_db_path(name) == imported_path),
+        result["subject_name"]
+    )
+    load_subject_data(imported_subject)
+    st.session_state.ingest_notices.append(
+        ("success", f"Imported {result['chunks_imported']} chunks into {imported_subject}.")
+    )
+    st.rerun()
+
+def prepare_snapshot_download(subject_name):
+    """Exports the subject's snapshot into session state for the download button."""
+    import io
+    from src import resource_registry, vector_store_manager
+
+    buffer = io.BytesIO()
+    with st.spinner(f"Exporting {subject_name}..."):
+        vector_store_manager.export_subject_snapshot(
+            subject_name,
+            buffer,
+            st.session_state.GEMINI_API_KEY,
+            embeddings_model=resource_registry.get_embeddings_model(st.session_state.GEMINI_API_KEY)
+        )
+    st.session_state.snapshot_download = (
+        subject_name, vector_store_manager.get_subject_index_version(subject_name), buffer.getvalue()
+    )
+
+def describe_finished_job(job):
+    """The (streamlit message function name, text) to show for a finished ingestion job."""
+    name, subject_name = job["file_name"], job["subject_name"]
+    if job["status"] == "failed":
+        return "error", f"Error processing {name}: {job['error']}"
+    stats = job["stats"]
+    if stats["file_skipped"]:
+        return "info", f"{name} is unchanged and already in {subject_name}; skipped."
+    return "success", (
+        f"Processed {name} for {subject_name}: "
+        f"{stats['chunks_added']} chunks added, {stats['chunks_deleted']} removed, "
+        f"{stats['pages_skipped']} unchanged pages skipped, "
+        f"{stats['chunks_deduplicated']} near-duplicate chunks merged."
+    )
+
+def render_ingest_jobs():
+    """
+    Shows progress of this session's ingestion jobs. While any are active it re-runs on
+    its own every config.INGEST_JOB_POLL_SECONDS (as a fragment, not the whole script);
+    when a job finishes, the whole app re-runs so the subject's chains are reloaded.
+    """
+    from src import ingest_jobs
+
+    job_queue = ingest_jobs.get_job_queue()
+    finished = []
+    for job in job_queue.list_jobs():
+        if job["status"] in ingest_jobs.ACTIVE_STATUSES:
+            if job["status"] == "queued" or not job["pages_total"]:
+                st.caption(f"⏳ {job['file_name']}: waiting...")
+            else:
+                st.progress(
+                    min(1.0, job["pages_done"] / job["pages_total"]),
+                    text=f"{job['file_name']}: page {job['pages_done']}/{job['pages_total']}, {job['chunks_stored']} chunks stored"
+                )
+        else:
+            finished.append(job)
+
+    if finished:
+        for job in finished:
+            st.session_state.ingest_notices.append(describe_finished_job(job))
+            if job["status"] == "done":
+                st.session_state.subjects_to_reload.append(job["subject_name"])
+                trace = job_queue.get_job(job["job_id"]).trace
+                if trace:
+                    st.session_state.last_trace = trace
+            job_queue.dismiss(job["job_id"])
+        st.rerun()
+
+def apply_finished_ingests():
+    """Reloads subjects whose background ingestion finished since the last run."""
+    reloaded = set(st.session_state.subjects_to_reload)
+    if not reloaded:
+        return
+    st.session_state.subjects_to_reload = []
+    # Refresh subject list in case a new subject's VS was just created
+    st.session_state.subjects = subject_catalog.list_available_subjects()
+    if st.session_state.current_subject in reloaded:
+        # Reload data and rebuild all chains for the current subject as its VS has changed
+        load_subject_data(st.session_state.current_subject)
+        if config.QUIZ_PREFILL_ENABLED and st.session_state.quiz_engine:
+            # Questions for the new material are generated while the student reads.
+            st.session_state.quiz_engine.prefill_in_background()
+
+def drop_evicted_subject():
+    """Resets the current subject if the janitor reclaimed its store while this tab sat idle."""
+    subject_name = st.session_state.current_subject
+    if not subject_name or st.session_state.vector_store is None:
+        return
+    subject_db_path = subject_catalog.get_subject_db_path(subject_name)
+    if os.path.isdir(subject_db_path):
+        # Every rerun on an open subject counts as using it.
+        store_janitor.get_janitor().touch(subject_db_path)
+        return
+    st.session_state.subjects = subject_catalog.list_available_subjects()
+    load_subject_data(None)
+    st.warning(f"The documents for '{subject_name}' were removed after a period of inactivity. Please upload them again.")
 
 
 # --- Main App Logic ---
+# The only place the workspace ID is created (and written to the URL); everything after
+# this only reads it.
+subject_catalog.ensure_workspace_id()
+# Reclaims idle session stores in the background; starting it again on reruns is a no-op.
+store_janitor.get_janitor().start()
+# Serves Prometheus metrics only if COURSE_COMPANION_METRICS_PORT is set; also idempotent.
+instrumentation.start_metrics_server()
 initialize_session_state()
+if st.session_state.get("GEMINI_API_KEY"):
+    apply_finished_ingests()
+    drop_evicted_subject()
 
 # --- Sidebar for Subject Management ---
 with st.sidebar:
@@ -159,6 +412,10 @@ with st.sidebar:
     # --- END OF NEW SECTION ---
 
     st.subheader("Subject Management")
+    st.caption(
+        "Your subjects are tied to this page's URL. Bookmark it to come back to them, even after a server restart. "
+        "Anyone with the URL can see and change your subjects, so keep it private."
+    )
 
     new_subject_name = st.text_input("Enter New Subject Name", key="new_subject_input")
     if st.button("Add Subject", key="add_subject_btn"):
@@ -176,6 +433,20 @@ with st.sidebar:
         else:
             st.warning("Subject name cannot be empty.")
 
+    if st.session_state.GEMINI_API_KEY:
+        with st.expander("Import a subject snapshot"):
+            snapshot_file = st.file_uploader(
+                "Snapshot (.zip) exported from this app",
+                type="zip",
+                key="snapshot_uploader"
+            )
+            st.caption("Imported under the name entered above, or the exported subject's name if empty.")
+            if st.button("Import Snapshot", key="import_snapshot_btn"):
+                if snapshot_file:
+                    handle_snapshot_import(snapshot_file, new_subject_name.strip() or None)
+                else:
+                    st.warning("No snapshot uploaded.")
+
     if st.session_state.subjects:
         # The on_change callback is a great way to handle subject switching
         selected_subject_from_box = st.selectbox(
@@ -207,9 +478,47 @@ with st.sidebar:
                 st.warning("Please select a subject first.")
             else:
                 st.warning("No files uploaded.")
+
+        current = st.session_state.current_subject
+        if current and st.session_state.GEMINI_API_KEY and os.path.isdir(subject_catalog.get_subject_db_path(current)):
+            # Exported subjects can be imported into a later session without re-embedding.
+            from src import vector_store_manager
+            prepared = st.session_state.snapshot_download
+            if prepared and prepared[:2] == (current, vector_store_manager.get_subject_index_version(current)):
+                st.download_button(
+                    f"Download snapshot of {current}",
+                    data=prepared[2],
+                    file_name=f"{current.replace(' ', '_')}_snapshot.zip",
+                    mime="application/zip",
+                    key="download_snapshot_btn"
+                )
+            elif st.button(f"Export {current} as a snapshot", key="export_snapshot_btn"):
+                prepare_snapshot_download(current)
+                st.rerun()
+
+        # Results of background ingestion jobs finished since the last run
+        for message_kind, message in st.session_state.ingest_notices:
+            getattr(st, message_kind)(message)
+        st.session_state.ingest_notices = []
+        if st.session_state.GEMINI_API_KEY:
+            from src import ingest_jobs, resource_registry
+            job_queue = ingest_jobs.get_job_queue()
+            if not st.session_state.get("ingest_jobs_resumed"):
+                # Pick up jobs a previous server process left unfinished for this workspace (URL).
+                st.session_state.ingest_jobs_resumed = True
+                job_queue.resume_interrupted(
+                    st.session_state.GEMINI_API_KEY,
+                    embeddings_model=resource_registry.get_embeddings_model(st.session_state.GEMINI_API_KEY)
+                )
+            jobs_active = any(job["status"] in ingest_jobs.ACTIVE_STATUSES for job in job_queue.list_jobs())
+            st.fragment(render_ingest_jobs, run_every=config.INGEST_JOB_POLL_SECONDS if jobs_active else None)()
         # Your delete logic is also fine
         # ... (keep your delete button logic here) ...
 
+    st.markdown("---")
+    if st.checkbox("Show performance breakdown", key="show_debug_panel"):
+        render_debug_panel()
+
 
 # --- CHANGE START 4: Implement main area with mode switcher ---
 if not st.session_state.get("GEMINI_API_KEY"):
@@ -220,20 +529,8 @@ if not st.session_state.get("GEMINI_API_KEY"):
     # Read the video file from the assets folder
     try:
         st.subheader("Demo:")
-        video_file = open("assets/feature_demo.mp4", "rb")
-        video_bytes = video_file.read()
-        # Encode the video in base64
-        video_base64 = base64.b64encode(video_bytes).decode()
-        
-        # Create the HTML string for the video
-        video_html = f"""
-            <video autoplay loop muted playsinline style="width: 100%; border-radius: 10px; box-shadow: 0 4px 12px rgba(0,0,0,0.1);">
-              <source src="data:video/mp4;base64,{video_base64}" type="video/mp4">
-              Your browser does not support the video tag.
-            </video>
-            """
         # Display the video
-        st.markdown(video_html, unsafe_allow_html=True)
+        st.markdown(load_demo_video_html(), unsafe_allow_html=True)
 
     except FileNotFoundError:
         st.warning("Could not load feature demo video. Make sure 'assets/feature_demo.mp4' exists.")
@@ -246,6 +543,7 @@ elif not st.session_state.vector_store:
     st.info(f"No documents processed yet for '{st.session_state.current_subject}'. Please upload and process PDFs for this subject to enable the different modes.")
 else:
     # This block runs ONLY when an API key is present, a subject is selected, and it has data.
+    from src import rag_chain_builder, resource_registry
     st.title(f"✨ AI Course Companion: {st.session_state.current_subject}")
 
     # ---- MODE SELECTION RADIO BUTTONS ----
@@ -268,34 +566,67 @@ else:
     if st.session_state.active_chain_type == "Q&A":
         st.subheader("💬 Chat Q&A")
         if st.session_state.rag_qa_chain:
-            # Display chat history
-            for message in st.session_state.chat_history:
-                with st.chat_message(message["role"]):
-                    st.markdown(message["content"])
+            # Optionally search other subjects too (e.g. Thermodynamics together with Heat Transfer)
+            other_subjects = [s for s in st.session_state.subjects if s != st.session_state.current_subject]
+            extra_subjects = []
+            if other_subjects:
+                if st.checkbox("Search all my subjects", key="search_all_subjects"):
+                    extra_subjects = other_subjects
+                else:
+                    extra_subjects = st.multiselect("Also search these subjects:", other_subjects, key="cross_subjects")
+            qa_chain = st.session_state.rag_qa_chain
+            if extra_subjects:
+                qa_chain = resource_registry.get_cross_subject_qa_chain(
+                    [st.session_state.current_subject] + extra_subjects, st.session_state.GEMINI_API_KEY
+                ) or qa_chain
+
+            # Display chat history (the latest page; earlier messages on request)
+            render_chat_history()
+            if st.session_state.chat_memory is None:
+                from src.chat_memory import ChatMemory
+                st.session_state.chat_memory = ChatMemory()
+            chat_memory = st.session_state.chat_memory
 
             # User input
-            if prompt := st.chat_input(f"Ask a question about {st.session_state.current_subject}..."):
-                st.session_state.chat_history.append({"role": "user", "content": prompt})
+            searched_label = ", ".join([st.session_state.current_subject] + extra_subjects)
+            if prompt := st.chat_input(f"Ask a question about {searched_label}..."):
+                append_chat_message("user", prompt)
                 with st.chat_message("user"):
                     st.markdown(prompt)
 
                 with st.chat_message("assistant"):
-                    with st.spinner("Thinking..."):
-                        response_dict = st.session_state.rag_qa_chain.invoke(prompt)
-                        answer = response_dict.get("answer", "Sorry, I couldn't find an answer.")
-                        st.markdown(answer)
-                        # Store assistant response in history
-                        st.session_state.chat_history.append({"role": "assistant", "content": answer})
-
-                    # Optional: Display sources
-                    sources = response_dict.get("context", [])
-                    if sources:
-                        with st.expander("View Sources Used"):
-                            for i, doc in enumerate(sources):
-                                source_name = doc.metadata.get('source', 'Unknown')
-                                page_num = doc.metadata.get('page', 'N/A')
-                                st.markdown(f"**Source {i+1}:** `{os.path.basename(source_name)}` (Page: {page_num})")
-                                st.caption(f"> {doc.page_content[:250].replace(chr(10), ' ')}...")
+                    query_placeholder = st.empty()
+                    answer_placeholder = st.empty()
+                    sources_placeholder = st.empty()
+                    response_state = {"sources": [], "cached": False}
+
+                    def answer_token_stream():
+                        """Renders sources as soon as retrieval returns, and yields answer tokens."""
+                        # Follow-ups are rewritten into standalone questions using the conversation so far.
+                        events = rag_chain_builder.stream_chain_events(qa_chain, chat_memory.qa_input(prompt))
+                        for kind, value in events:
+                            if kind == "sources":
+                                response_state["sources"] = value
+                                with sources_placeholder.container():
+                                    render_sources(value)
+                            elif kind == "cached":
+                                response_state["cached"] = value
+                            elif kind == "query":
+                                if value.strip() != prompt.strip():
+                                    query_placeholder.caption(f"🔎 Searched for: {value}")
+                            else:
+                                yield value
+
+                    with answer_placeholder.container():
+                        with instrumentation.trace_request("qa") as trace:
+                            answer = st.write_stream(answer_token_stream()) or "Sorry, I couldn't find an answer."
+                        st.session_state.last_trace = trace.to_dict()
+                        if response_state["cached"]:
+                            st.caption("⚡ Answered instantly from a previous, similar question.")
+                    # Store assistant response in history
+                    append_chat_message("assistant", answer)
+                    chat_memory.add_turn(prompt, answer)
+                    chat_memory.summarize_in_background(resource_registry.get_llm(st.session_state.GEMINI_API_KEY))
         else:
             st.warning("Q&A chain not available. An error might have occurred during loading.")
 
@@ -311,16 +642,25 @@ else:
             )
             
             if st.button("Generate Comprehensive Summary", key="summarize_btn"):
-                with st.spinner("Generating comprehensive summary... This may take a moment."):
-                    
-                    # Use the user's topic if provided, otherwise summarize the whole subject
-                    if summary_topic_input.strip():
-                        final_topic = summary_topic_input.strip()
-                    else:
-                        final_topic = f"A comprehensive overview of the key topics in {st.session_state.current_subject}"
-
-                    summary = st.session_state.summarization_chain.invoke(final_topic)
-                    st.session_state.summary_output = summary
+                # Use the user's topic if provided, otherwise summarize every document in the subject
+                if summary_topic_input.strip():
+                    summary_chain = st.session_state.summarization_chain
+                    summary_input = summary_topic_input.strip()
+                    spinner_text = "Summarizing the most relevant passages..."
+                else:
+                    summary_chain = st.session_state.subject_summary_chain
+                    summary_input = st.session_state.current_subject
+                    spinner_text = "Summarizing each document (previously summarized documents are reused)..."
+
+                # Show the summary as it is generated, then replace it with the formatted version below.
+                stream_placeholder = st.empty()
+                with stream_placeholder.container(), st.spinner(spinner_text):
+                    with instrumentation.trace_request("summary") as trace:
+                        events = rag_chain_builder.stream_chain_events(summary_chain, summary_input)
+                        summary = st.write_stream(value for kind, value in events if kind == "token")
+                stream_placeholder.empty()
+                st.session_state.last_trace = trace.to_dict()
+                st.session_state.summary_output = summary
 
             if st.session_state.summary_output:
                 st.markdown("### Summary:")
@@ -331,10 +671,7 @@ else:
     # --- Generate Quiz Mode ---
     elif st.session_state.active_chain_type == "Generate Quiz":
         st.subheader("❓ Generate Quiz")
-        if 'quiz_sources' not in st.session_state:
-            st.session_state.quiz_sources = []
-
-        if st.session_state.quiz_generation_chain:
+        if st.session_state.quiz_engine:
             topic_input = st.text_input(
                 "Enter a specific topic for the quiz (e.g., 'Carnot Cycle', 'Fluid Viscosity'):",
                 placeholder="Leave blank to quiz on the whole subject"
@@ -345,62 +682,30 @@ else:
                 if not topic_input.strip() and not st.session_state.current_subject:
                     st.warning("Please enter a topic or select a subject.")
                 else:
-                    with st.spinner(f"Generating a {num_questions}-question quiz..."):
-                        if topic_input.strip():
-                            final_query = topic_input.strip()
-                        else:
-                            final_query = f"Key concepts from the subject {st.session_state.current_subject}"
-
-                        quiz_input = {"context_query": final_query, "num_questions": num_questions}
-                        quiz_result_dict = st.session_state.quiz_generation_chain.invoke(quiz_input)
-                        
-                        st.session_state.quiz_output = quiz_result_dict.get("quiz_text", "")
-                        st.session_state.quiz_sources = quiz_result_dict.get("context_docs", [])
+                    if topic_input.strip():
+                        final_query = topic_input.strip()
+                    else:
+                        final_query = f"Key concepts from the subject {st.session_state.current_subject}"
+
+                    # Questions come from the subject's question bank; only missing ones are generated,
+                    # and those stream in as they are written, then are replaced by the formatted quiz.
+                    questions = []
+                    stream_placeholder = st.empty()
+                    with stream_placeholder.container(), st.spinner("Preparing your quiz..."):
+                        with instrumentation.trace_request("quiz") as trace:
+                            events = st.session_state.quiz_engine.stream_quiz(final_query, int(num_questions))
+                            st.write_stream(quiz_tokens(events, questions))
+                    stream_placeholder.empty()
+                    st.session_state.last_trace = trace.to_dict()
+                    st.session_state.quiz_output = format_quiz(questions)
 
             if st.session_state.quiz_output:
                 st.markdown("---")
                 st.markdown("### Generated Quiz:")
+                st.code(st.session_state.quiz_output, language=None)
+            elif st.session_state.quiz_output is None:
+                st.warning("Could not generate quiz questions from the retrieved material. Try a different topic.")
 
-                raw_quiz_text = st.session_state.quiz_output
-                
-                # 1. Check if the LLM refused to generate a quiz.
-                refusal_message = "The retrieved context is not suitable"
-                if refusal_message in raw_quiz_text:
-                    # If it refused, display the refusal message as a warning.
-                    st.warning(raw_quiz_text)
-                else:
-                    # 2. If it did NOT refuse, proceed with the normal parsing logic.
-                    source_docs = st.session_state.quiz_sources
-                    question_blocks = raw_quiz_text.strip().split('Q:')[1:]
-                    
-                    processed_text_parts = []
-                    for block in question_blocks:
-                        full_question_text = "Q:" + block.strip()
-                        match = re.search(r"Source: \[SOURCE (\d+)\]", full_question_text)
-                        
-                        if match and source_docs:
-                            source_num = int(match.group(1))
-                            if 1 <= source_num <= len(source_docs):
-                                doc = source_docs[source_num - 1]
-                                source_name = os.path.basename(doc.metadata.get('source', 'Unknown'))
-                                page_num = doc.metadata.get('page', 'N/A')
-                                
-                                cleaned_content = re.sub(r'[^a-zA-Z0-9\s.,()-]+', '', doc.page_content)
-                                normalized_text = re.sub(r'\s+', ' ', cleaned_content).strip()
-                                snippet_words = normalized_text.split()[:20]
-                                snippet = " ".join(snippet_words) + "..." if snippet_words else ""
-                                
-                                rich_source_info = f'Source: {source_name} (Page: {page_num}) - "{snippet}"'
-                                final_question_block = full_question_text.replace(match.group(0), rich_source_info)
-                                processed_text_parts.append(final_question_block)
-                            else:
-                                processed_text_parts.append(full_question_text)
-                        else:
-                            processed_text_parts.append(full_question_text)
-                    
-                    final_display_text = "\n\n".join(processed_text_parts)
-                    st.code(final_display_text, language=None)
-                
         else:
             st.warning("Quiz generation chain not available. An error might have occurred during loading.")
 
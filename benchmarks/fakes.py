@@ -0,0 +1,131 @@
+# --- 1. Standard library imports ---
+import hashlib
+import math
+import random
+import time
+from typing import Any, List, Optional
+
+# --- 2. Third-party imports ---
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Deterministic local stand-ins for GoogleGenerativeAIEmbeddings and ChatGoogleGenerativeAI.
+# Outputs depend only on the input text, and latency is simulated with time.sleep, so
+# benchmark numbers reflect this app's own overhead plus a known, configurable network cost.
+
+VOCABULARY = (
+    "entropy enthalpy pressure volume temperature turbine compressor nozzle diffuser "
+    "viscosity reynolds laminar turbulent boundary layer heat flux conduction convection "
+    "radiation fourier stress strain modulus yield fatigue beam torsion shaft bearing "
+    "efficiency cycle carnot rankine brayton refrigerant isentropic adiabatic work"
+).split()
+
+
+def _seeded_random(text: str) -> random.Random:
+    return random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+
+
+class FakeProviderError(Exception):
+    """A simulated transient provider failure, worded like the Gemini client's 503 errors."""
+
+    def __init__(self):
+        super().__init__("503 UNAVAILABLE: simulated provider outage")
+
+
+def _maybe_fail(failure_rate: float):
+    if failure_rate and random.random() < failure_rate:
+        raise FakeProviderError()
+
+
+class FakeGeminiEmbeddings(Embeddings):
+    """
+    Unit-length pseudo-random vectors seeded by the text, with simulated per-request latency.
+    A `failure_rate` fraction of requests raises FakeProviderError.
+    """
+
+    def __init__(self, size: int = 768, latency_seconds: float = 0.0, batch_size: int = 100,
+                 failure_rate: float = 0.0):
+        self.size = size
+        self.latency_seconds = latency_seconds
+        self.batch_size = batch_size
+        self.failure_rate = failure_rate
+        self.request_count = 0
+        self.texts_embedded = 0
+
+    def _vector(self, text: str) -> List[float]:
+        rng = _seeded_random(text)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.size)]
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Like the Gemini client, one request is made per batch of at most batch_size texts.
+        requests = math.ceil(len(texts) / self.batch_size) if texts else 0
+        time.sleep(self.latency_seconds * requests)
+        self.request_count += requests
+        _maybe_fail(self.failure_rate)
+        self.texts_embedded += len(texts)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency_seconds)
+        self.request_count += 1
+        _maybe_fail(self.failure_rate)
+        return self._vector(text)
+
+
+class FakeGeminiChat(BaseChatModel):
+    """
+    A chat model that returns deterministic text derived from the prompt.
+    Latency is modelled as a time-to-first-token plus a per-token delay, and the
+    streaming interface emits one token at a time. Quiz prompts get quiz-formatted output.
+    A `failure_rate` fraction of requests raises FakeProviderError before the first token.
+    """
+
+    first_token_latency_seconds: float = 0.0
+    per_token_latency_seconds: float = 0.0
+    response_tokens: int = 200
+    failure_rate: float = 0.0
+    request_count: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini-chat"
+
+    def _response_tokens(self, messages) -> List[str]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        rng = _seeded_random(prompt)
+        if "Quiz Questions:" in prompt:
+            blocks = []
+            for question_number in range(3):
+                topic = rng.choice(VOCABULARY)
+                blocks.append(
+                    f"Q: Which statement best describes {topic}?\n"
+                    f"A) {rng.choice(VOCABULARY)}\nB) {rng.choice(VOCABULARY)}\n"
+                    f"C) {rng.choice(VOCABULARY)}\nD) {rng.choice(VOCABULARY)}\n"
+                    f"Answer: {rng.choice('ABCD')}\nSource: [SOURCE {question_number + 1}]\n"
+                )
+            text = "\n".join(blocks)
+            return [token + " " for token in text.split(" ")]
+        return [rng.choice(VOCABULARY) + " " for _ in range(self.response_tokens)]
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        self.request_count += 1
+        tokens = self._response_tokens(messages)
+        time.sleep(self.first_token_latency_seconds)
+        _maybe_fail(self.failure_rate)
+        time.sleep(self.per_token_latency_seconds * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs):
+        self.request_count += 1
+        time.sleep(self.first_token_latency_seconds)
+        _maybe_fail(self.failure_rate)
+        for token in self._response_tokens(messages):
+            time.sleep(self.per_token_latency_seconds)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,394 @@
+"""
+Offline benchmark suite for the ingest and query paths.
+
+Runs without a Gemini key: embeddings and the chat model are replaced by the
+deterministic stand-ins in benchmarks/fakes.py with configurable simulated latency,
+and input PDFs are generated on the fly. Results are written as JSON so runs can be
+compared against a baseline before deploying.
+
+    python -m benchmarks.run_benchmarks --pages 100 --output bench_results.json
+"""
+
+# --- 1. Standard library imports ---
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 2. Third-party imports ---
+from langchain_chroma import Chroma
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import VOCABULARY, FakeGeminiChat, FakeGeminiEmbeddings
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from src import document_processor, ingestion, rag_chain_builder, vector_store_manager
+from src.gemini_gateway import CircuitBreaker, CircuitOpenError, GatewayChatModel, GeminiGateway
+from src.numpy_store import NumpyVectorStore
+
+
+def summarize(durations):
+    """Latency summary in milliseconds."""
+    ordered = sorted(durations)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def time_call(func, *args, repeat: int = 1, **kwargs):
+    """Runs func `repeat` times and returns (last result, list of durations in seconds)."""
+    durations, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        durations.append(time.perf_counter() - start)
+    return result, durations
+
+
+def random_queries(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(3, 12))) for _ in range(count)]
+
+
+# --- BENCHMARKS ---
+
+def bench_document_processing(pdf_path: str, num_pages: int):
+    """PDF parsing and splitting: sequential loader, process-pool loader and streaming pipeline."""
+    (docs, load_durations) = time_call(document_processor.load_pdf, pdf_path)
+    (chunks, split_durations) = time_call(document_processor.split_documents, docs)
+    (parallel_chunks, parallel_durations) = time_call(document_processor.load_and_split_pdfs_parallel, [pdf_path])
+
+    def stream_all():
+        with open(pdf_path, "rb") as f:
+            return sum(len(batch) for batch in document_processor.stream_pdf_chunk_batches(f, pdf_path, batch_size=400))
+    (streamed_count, stream_durations) = time_call(stream_all)
+
+    sequential_seconds = load_durations[0] + split_durations[0]
+    return {
+        "pages": num_pages,
+        "chunks": len(chunks),
+        "load_pdf_s": load_durations[0],
+        "split_documents_s": split_durations[0],
+        "sequential_pages_per_s": num_pages / sequential_seconds,
+        "parallel_s": parallel_durations[0],
+        "parallel_pages_per_s": num_pages / parallel_durations[0],
+        "parallel_chunks_match": len(parallel_chunks) == len(chunks),
+        "streaming_s": stream_durations[0],
+        "streaming_chunks_match": streamed_count == len(chunks),
+    }
+
+
+def bench_ingestion(pdf_path: str, embed_latency: float, embed_dim: int):
+    """Full streaming ingest into a fresh subject store, then a no-op re-ingest of the same file."""
+    subject_name = f"bench_ingest_{os.getpid()}"
+    embeddings = FakeGeminiEmbeddings(size=embed_dim, latency_seconds=embed_latency)
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    try:
+        stats, first_durations = time_call(
+            ingestion.ingest_pdf_stream, subject_name, None, "bench.pdf", io.BytesIO(pdf_bytes),
+            embeddings_model=embeddings
+        )
+        _, reingest_durations = time_call(
+            ingestion.ingest_pdf_stream, subject_name, None, "bench.pdf", io.BytesIO(pdf_bytes),
+            embeddings_model=embeddings
+        )
+    finally:
+        vector_store_manager.delete_subject_vector_store(subject_name)
+    return {
+        "chunks": stats["chunks_added"],
+        "ingest_s": first_durations[0],
+        "chunks_per_s": stats["chunks_added"] / first_durations[0],
+        "embedding_requests": embeddings.request_count,
+        "reingest_unchanged_s": reingest_durations[0],
+    }
+
+
+def bench_snapshot(pdf_path: str, embed_latency: float, embed_dim: int):
+    """Ingest of a subject vs. export of its snapshot and import into a new subject (warm start)."""
+    subject_name, copy_name = f"bench_snapshot_{os.getpid()}", f"bench_snapshot_copy_{os.getpid()}"
+    embeddings = FakeGeminiEmbeddings(size=embed_dim, latency_seconds=embed_latency)
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    try:
+        stats, ingest_durations = time_call(
+            ingestion.ingest_pdf_stream, subject_name, None, "bench.pdf", io.BytesIO(pdf_bytes),
+            embeddings_model=embeddings
+        )
+        snapshot = io.BytesIO()
+        _, export_durations = time_call(
+            vector_store_manager.export_subject_snapshot, subject_name, snapshot, embeddings_model=embeddings
+        )
+        requests_before_import = embeddings.request_count
+        snapshot.seek(0)
+        _, import_durations = time_call(
+            vector_store_manager.import_subject_snapshot, copy_name, snapshot, embeddings_model=embeddings
+        )
+    finally:
+        vector_store_manager.delete_subject_vector_store(subject_name)
+        vector_store_manager.delete_subject_vector_store(copy_name)
+    return {
+        "chunks": stats["chunks_added"],
+        "ingest_s": ingest_durations[0],
+        "export_s": export_durations[0],
+        "import_s": import_durations[0],
+        "snapshot_mb": len(snapshot.getvalue()) / 1e6,
+        "import_embedding_requests": embeddings.request_count - requests_before_import,
+    }
+
+
+def _open_store(backend: str, directory: str, embeddings):
+    if backend == "numpy":
+        return NumpyVectorStore(directory, embeddings)
+    if backend == "numpy-int8":
+        return NumpyVectorStore(directory, embeddings, dtype="int8")
+    return Chroma(collection_name="bench", persist_directory=directory, embedding_function=embeddings)
+
+
+def _build_store(backend: str, directory: str, size: int, embeddings):
+    store = _open_store(backend, directory, embeddings)
+    texts = random_queries(size, seed=size)
+    metadatas = [{"source": "bench.pdf", "page": i // 5} for i in range(size)]
+    for start in range(0, size, 1000):
+        store.add_texts(texts[start:start + 1000], metadatas=metadatas[start:start + 1000])
+    return store
+
+
+def _build_chroma_store(directory: str, size: int, embeddings):
+    return _build_store("chroma", directory, size, embeddings)
+
+
+def bench_retrieval(store_sizes, queries: int, embed_dim: int, backends=("chroma",)):
+    """Store open time and retriever latency per backend as the store grows (query embedding latency excluded)."""
+    results = []
+    embeddings = FakeGeminiEmbeddings(size=embed_dim)
+    for size in store_sizes:
+        for backend in backends:
+            directory = tempfile.mkdtemp(prefix=f"bench_{backend}_")
+            try:
+                _, build_durations = time_call(_build_store, backend, directory, size, embeddings)
+                store, open_durations = time_call(_open_store, backend, directory, embeddings)
+                retriever = store.as_retriever()
+                durations = []
+                for query in random_queries(queries):
+                    _, query_durations = time_call(retriever.invoke, query)
+                    durations.extend(query_durations)
+                results.append({
+                    "backend": backend,
+                    "store_size": size,
+                    "build_s": build_durations[0],
+                    "open_ms": open_durations[0] * 1000,
+                    **summarize(durations)
+                })
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+def bench_chains(store_size: int, queries: int, embed_latency: float, llm_first_token: float,
+                 llm_per_token: float, embed_dim: int):
+    """End-to-end Q&A, summary and quiz invocation against a fake LLM, including time to first token."""
+    directory = tempfile.mkdtemp(prefix="bench_chains_")
+    embeddings = FakeGeminiEmbeddings(size=embed_dim, latency_seconds=embed_latency)
+    llm = FakeGeminiChat(first_token_latency_seconds=llm_first_token, per_token_latency_seconds=llm_per_token)
+    try:
+        store = _build_chroma_store(directory, store_size, FakeGeminiEmbeddings(size=embed_dim))
+        store = Chroma(collection_name="bench", persist_directory=directory, embedding_function=embeddings)
+        chains = {
+            "qa": (rag_chain_builder.create_rag_qa_chain(store, None, llm=llm), lambda q: q),
+            "summary": (rag_chain_builder.create_summarization_chain(store, None, llm=llm), lambda q: q),
+            "quiz": (
+                rag_chain_builder.create_quiz_chain(store, None, llm=llm),
+                lambda q: {"context_query": q, "num_questions": 3}
+            ),
+        }
+        results = {}
+        for name, (chain, make_input) in chains.items():
+            invoke_durations, first_token_durations = [], []
+            for query in random_queries(queries, seed=7):
+                _, durations = time_call(chain.invoke, make_input(query))
+                invoke_durations.extend(durations)
+
+                start = time.perf_counter()
+                for kind, _ in rag_chain_builder.stream_chain_events(chain, make_input(query)):
+                    if kind == "token":
+                        first_token_durations.append(time.perf_counter() - start)
+                        break
+            results[name] = {"invoke": summarize(invoke_durations), "time_to_first_token": summarize(first_token_durations)}
+        return results
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_gateway(concurrency: int, llm_first_token: float, llm_per_token: float, outage_calls: int = 50):
+    """
+    `concurrency` identical quiz requests at once, sent straight to the fake provider and
+    through the Gemini gateway; then calls during a total provider outage, with the breaker.
+    """
+    prompt = "Key concepts from the subject. Quiz Questions:"
+    results = {}
+    for label in ("direct", "gateway"):
+        provider = FakeGeminiChat(first_token_latency_seconds=llm_first_token, per_token_latency_seconds=llm_per_token)
+        llm = provider if label == "direct" else GatewayChatModel(underlying=provider, gateway=GeminiGateway(label))
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            answers = list(executor.map(lambda _: llm.invoke(prompt).content, range(concurrency)))
+        results[label] = {
+            "wall_s": time.perf_counter() - start,
+            "provider_requests": provider.request_count,
+            "identical_answers": len(set(answers)) == 1,
+        }
+
+    provider = FakeGeminiChat(first_token_latency_seconds=llm_first_token, failure_rate=1.0)
+    gateway = GeminiGateway("outage", max_retries=0, breaker=CircuitBreaker("outage", cooldown_seconds=60))
+    llm = GatewayChatModel(underlying=provider, gateway=gateway)
+    outcomes, fail_fast_durations = {}, []
+    for _ in range(outage_calls):
+        start = time.perf_counter()
+        try:
+            llm.invoke(prompt)
+            outcome = "ok"
+        except CircuitOpenError:
+            outcome = "rejected"
+            fail_fast_durations.append(time.perf_counter() - start)
+        except Exception:
+            outcome = "provider_error"
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    results["outage"] = {
+        "calls": outage_calls,
+        "provider_requests": provider.request_count,
+        "outcomes": outcomes,
+        "fail_fast": summarize(fail_fast_durations),
+        "circuit": gateway.breaker.state,
+    }
+    return results
+
+
+# --- ENTRY POINT ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline ingest and query benchmarks with fake Gemini models.")
+    parser.add_argument("--pages", type=int, default=50, help="Pages in the synthetic PDF.")
+    parser.add_argument("--store-sizes", type=int, nargs="+", default=[500, 2000, 5000],
+                        help="Chunk counts for the retrieval benchmark.")
+    parser.add_argument("--backends", nargs="+", choices=["chroma", "numpy", "numpy-int8"],
+                        default=["chroma", "numpy", "numpy-int8"], help="Vector store backends to compare.")
+    parser.add_argument("--queries", type=int, default=20, help="Queries per retrieval/chain measurement.")
+    parser.add_argument("--reruns", type=int, default=10, help="Streamlit reruns timed per cold start.")
+    parser.add_argument("--embed-dim", type=int, default=768, help="Fake embedding dimensionality.")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="Simulated seconds per embedding request.")
+    parser.add_argument("--llm-first-token", type=float, default=0.3, help="Simulated LLM time to first token (s).")
+    parser.add_argument("--llm-per-token", type=float, default=0.002, help="Simulated LLM delay per token (s).")
+    parser.add_argument("--gateway-concurrency", type=int, default=32,
+                        help="Identical concurrent requests in the gateway benchmark.")
+    parser.add_argument("--only", nargs="+",
+                        choices=["documents", "ingestion", "snapshot", "retrieval", "chains", "startup", "gateway"],
+                        help="Run only these benchmark groups.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    return parser.parse_args(argv)
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["langchain_chroma", "langchain_google_genai", "chromadb"]
+
+# Runs in a fresh interpreter: times the first run of app.py (imports included) and the
+# reruns that follow, the way Streamlit re-executes the script on every interaction.
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file("app.py", default_timeout=120).run()
+cold_start_s = time.perf_counter() - start
+heavy_loaded = [name for name in {heavy!r} if name in sys.modules]
+reruns = []
+for _ in range({reruns}):
+    start = time.perf_counter()
+    app.run()
+    reruns.append(time.perf_counter() - start)
+print(json.dumps({{"cold_start_s": cold_start_s, "reruns": reruns, "heavy_modules_loaded": heavy_loaded,
+                  "exception": bool(app.exception)}}))
+"""
+
+
+def bench_startup(reruns: int, cold_starts: int = 3):
+    """Cold start (fresh interpreter) and per-rerun time of the landing page, before an API key is entered."""
+    cold_durations, rerun_durations, last = [], [], {}
+    for _ in range(cold_starts):
+        completed = subprocess.run(
+            [sys.executable, "-c", _STARTUP_SCRIPT.format(heavy=HEAVY_MODULES, reruns=reruns)],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        )
+        last = json.loads(completed.stdout.strip().splitlines()[-1])
+        cold_durations.append(last["cold_start_s"])
+        rerun_durations.extend(last["reruns"])
+    return {
+        "cold_start": summarize(cold_durations),
+        "rerun": summarize(rerun_durations),
+        "heavy_modules_loaded": last["heavy_modules_loaded"],
+        "app_exception": last["exception"],
+        "demo_video_present": os.path.exists(os.path.join(REPO_ROOT, "assets", "feature_demo.mp4")),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    groups = set(args.only or ["documents", "ingestion", "snapshot", "retrieval", "chains", "startup", "gateway"])
+    results = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        }
+    }
+
+    work_dir = tempfile.mkdtemp(prefix="bench_inputs_")
+    try:
+        pdf_path = write_synthetic_pdf(os.path.join(work_dir, "synthetic.pdf"), args.pages)
+        if "documents" in groups:
+            print("Benchmarking PDF parsing and splitting...")
+            results["document_processing"] = bench_document_processing(pdf_path, args.pages)
+        if "ingestion" in groups:
+            print("Benchmarking ingestion...")
+            results["ingestion"] = bench_ingestion(pdf_path, args.embed_latency, args.embed_dim)
+        if "snapshot" in groups:
+            print("Benchmarking subject snapshot export/import...")
+            results["snapshot"] = bench_snapshot(pdf_path, args.embed_latency, args.embed_dim)
+        if "retrieval" in groups:
+            print("Benchmarking retrieval...")
+            results["retrieval"] = bench_retrieval(args.store_sizes, args.queries, args.embed_dim, args.backends)
+        if "chains" in groups:
+            print("Benchmarking chains...")
+            results["chains"] = bench_chains(
+                min(args.store_sizes), args.queries, args.embed_latency,
+                args.llm_first_token, args.llm_per_token, args.embed_dim
+            )
+        if "startup" in groups:
+            print("Benchmarking app startup and reruns...")
+            results["startup"] = bench_startup(args.reruns)
+        if "gateway" in groups:
+            print("Benchmarking the Gemini gateway...")
+            results["gateway"] = bench_gateway(args.gateway_concurrency, args.llm_first_token, args.llm_per_token)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Wrote benchmark results to {args.output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# --- 1. Standard library imports ---
+import random
+
+from benchmarks.fakes import VOCABULARY
+
+# Writes minimal, valid PDF files of pseudo-technical text without any PDF library,
+# so benchmarks can generate inputs of any size on demand.
+
+_LINES_PER_PAGE = 60
+_WORDS_PER_LINE = 12
+
+
+def _escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_stream(rng: random.Random, page_number: int) -> bytes:
+    operations = ["BT /F1 9 Tf"]
+    y_position = 780
+    operations.append(f"1 0 0 1 40 {y_position} Tm (Section {page_number + 1}) Tj")
+    for _ in range(_LINES_PER_PAGE):
+        y_position -= 12
+        words = [rng.choice(VOCABULARY) for _ in range(_WORDS_PER_LINE)]
+        if rng.random() < 0.2:
+            words.append(f"eq-{rng.randint(1, 99)}.{rng.randint(1, 9)}")
+        line = _escape_pdf_text(" ".join(words) + ".")
+        operations.append(f"1 0 0 1 40 {y_position} Tm ({line}) Tj")
+    operations.append("ET")
+    return "\n".join(operations).encode("latin-1")
+
+
+def write_synthetic_pdf(path: str, num_pages: int, seed: int = 0) -> str:
+    """Writes a `num_pages`-page PDF of deterministic pseudo-technical text to `path`."""
+    rng = random.Random(seed)
+    page_object_ids = [4 + 2 * i for i in range(num_pages)]
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_object_ids)}] /Count {num_pages} >>".encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page_number, page_object_id in enumerate(page_object_ids):
+        stream = _page_stream(rng, page_number)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_object_id + 1} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for object_number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{object_number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode()
+    output += f"trailer << /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode()
+
+    with open(path, "wb") as f:
+        f.write(output)
+    return path
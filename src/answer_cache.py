@@ -0,0 +1,151 @@
+# --- 1. Standard library imports ---
+import math
+import threading
+from collections import OrderedDict
+from operator import mul
+
+# --- 2. Local application imports ---
+from src import config
+from src.instrumentation import record_cache_access
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+class SemanticAnswerCache:
+    """
+    An in-process cache of Q&A results, looked up by question similarity rather than
+    exact text. Entries are grouped by subject content key (see
+    SubjectManifest.content_key), so every session that uploaded the same documents
+    shares answers, and answers produced before the documents changed are never served.
+    Nothing is invalidated on delete or re-ingest: another session may hold the same
+    documents, and a key no subject has any more just ages out. Both the subjects and the entries inside each subject are evicted least-recently-used first.
+    """
+
+    def __init__(self, similarity_threshold: float = None, max_entries_per_subject: int = None, max_subjects: int = None):
+        self.similarity_threshold = similarity_threshold or config.ANSWER_CACHE_SIMILARITY_THRESHOLD
+        self.max_entries_per_subject = max_entries_per_subject or config.ANSWER_CACHE_MAX_ENTRIES_PER_SUBJECT
+        self.max_subjects = max_subjects or config.ANSWER_CACHE_MAX_SUBJECTS
+        self._subjects = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, subject_key: str, question_vector):
+        """Returns the cached response of the most similar past question, or None."""
+        query = _normalize(question_vector)
+        with self._lock:
+            entries = self._subjects.get(subject_key)
+            best_key, best_score = None, self.similarity_threshold
+            if entries:
+                self._subjects.move_to_end(subject_key)
+                for entry_key, entry in entries.items():
+                    score = sum(map(mul, query, entry["vector"]))
+                    if score >= best_score:
+                        best_key, best_score = entry_key, score
+            if best_key is None:
+                self.misses += 1
+                response = None
+            else:
+                entries.move_to_end(best_key)
+                self.hits += 1
+                response = entries[best_key]["response"]
+        record_cache_access("answer", hits=int(response is not None), misses=int(response is None))
+        return response
+
+    def store(self, subject_key: str, question: str, question_vector, response: dict):
+        with self._lock:
+            entries = self._subjects.setdefault(subject_key, OrderedDict())
+            self._subjects.move_to_end(subject_key)
+            entries[question] = {
+                "vector": _normalize(question_vector),
+                "response": response,
+            }
+            entries.move_to_end(question)
+            while len(entries) > self.max_entries_per_subject:
+                entries.popitem(last=False)
+            while len(self._subjects) > self.max_subjects:
+                self._subjects.popitem(last=False)
+
+
+class CachedQAChain:
+    """
+    Wraps a chain built by rag_chain_builder.create_rag_qa_chain. A question that is
+    close enough to one already answered for the same subject content, in any session,
+    returns the stored answer and source documents without calling retrieval or the LLM.
+    With a `condenser`, follow-ups are looked up by their standalone question, so the
+    same words asked in two different conversations do not share an answer.
+    """
+
+    def __init__(self, chain, embeddings_model, subject_key: str, cache: SemanticAnswerCache = None, condenser=None):
+        self.chain = chain
+        self.embeddings_model = embeddings_model
+        self.subject_key = subject_key
+        self.cache = cache if cache is not None else get_answer_cache()
+        self.condenser = condenser
+
+    def _resolve(self, chain_input, config):
+        """The chain input (with its standalone question filled in), that question and its embedding."""
+        inputs = {"question": chain_input} if isinstance(chain_input, str) else dict(chain_input)
+        if self.condenser is not None:
+            # Condensed once here; the wrapped chain reuses it instead of condensing again.
+            inputs["standalone_question"] = self.condenser.invoke(inputs, config=config)
+        question = inputs.get("standalone_question") or inputs["question"]
+        return inputs, question, self.embeddings_model.embed_query(question)
+
+    def invoke(self, chain_input, config=None):
+        inputs, question, question_vector = self._resolve(chain_input, config)
+        cached_response = self.cache.lookup(self.subject_key, question_vector)
+        if cached_response is not None:
+            return {**cached_response, "question": inputs["question"], "standalone_question": question, "cached": True}
+
+        response = self.chain.invoke(inputs, config=config)
+        self.cache.store(
+            self.subject_key,
+            question,
+            question_vector,
+            {"context": response.get("context", []), "answer": response.get("answer", "")}
+        )
+        return response
+
+    def stream(self, chain_input, config=None):
+        """
+        Streams like the wrapped chain. A cache hit is emitted as a single chunk;
+        a miss passes the chain's chunks through and caches the assembled answer.
+        """
+        inputs, question, question_vector = self._resolve(chain_input, config)
+        cached_response = self.cache.lookup(self.subject_key, question_vector)
+        if cached_response is not None:
+            yield {**cached_response, "question": inputs["question"], "standalone_question": question, "cached": True}
+            return
+
+        context_docs, answer_parts = [], []
+        for chunk in self.chain.stream(inputs, config=config):
+            context_docs = chunk.get("context", context_docs)
+            if "answer" in chunk:
+                answer_parts.append(chunk["answer"])
+            yield chunk
+
+        self.cache.store(
+            self.subject_key,
+            question,
+            question_vector,
+            {"context": context_docs, "answer": "".join(answer_parts)}
+        )
+
+
+# --- PROCESS-WIDE CACHE INSTANCE ---
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Returns the process-wide SemanticAnswerCache, shared by every session."""
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = SemanticAnswerCache()
+        return _answer_cache
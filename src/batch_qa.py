@@ -0,0 +1,172 @@
+"""
+Headless batch question answering for one subject.
+
+Reads questions from a JSONL file ({"id": ..., "question": ...} per line; "id"
+defaults to the line number), answers them with the subject's RAG Q&A chain with a
+bounded number of questions in flight, and appends one JSON line per answer (with its
+sources) to the output file as soon as it is ready. Questions already answered in the
+output file are skipped, so an interrupted or partly failed run is resumed by running
+the same command again.
+
+    python -m src.batch_qa --subject "Heat Transfer" --input faq.jsonl --output answers.jsonl
+"""
+
+# --- 1. Standard library imports ---
+import argparse
+import io
+import json
+import os
+import time
+
+# --- 2. Local application imports ---
+from src import config, ingestion, rag_chain_builder, vector_store_manager
+from src.instrumentation import get_callback_handler, record_count, trace_request
+
+
+def load_questions(input_path: str):
+    """Returns [{"id", "question"}] from a JSONL file, skipping blank lines."""
+    questions = []
+    with open(input_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            questions.append({"id": str(record.get("id", line_number)), "question": record["question"]})
+    return questions
+
+
+def load_answered_ids(output_path: str):
+    """IDs already answered successfully in an earlier run; failed questions are retried."""
+    answered = set()
+    if not os.path.exists(output_path):
+        return answered
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short when the previous run was killed.
+            if "answer" in record:
+                answered.add(str(record["id"]))
+    return answered
+
+
+def _ends_mid_line(path: str) -> bool:
+    """True if a previous run was killed while writing the file's last line."""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def format_sources(docs):
+    return [
+        {
+            "source": os.path.basename(doc.metadata.get("source", "Unknown")),
+            "page": doc.metadata.get("page", "N/A"),
+            "snippet": doc.page_content[:250].replace("\n", " "),
+        }
+        for doc in docs
+    ]
+
+
+def build_qa_chain(subject_name: str, gemini_api_key: str, embeddings_model=None, llm=None):
+    """The subject's Q&A chain (without the answer cache, so every question is really answered), or None."""
+    vector_store = vector_store_manager.create_or_load_subject_vector_store(
+        subject_name, gemini_api_key, embeddings_model=embeddings_model
+    )
+    if vector_store is None:
+        return None
+    return rag_chain_builder.create_rag_qa_chain(
+        vector_store,
+        gemini_api_key,
+        lexical_index=vector_store_manager.load_lexical_index(subject_name),
+        llm=llm
+    )
+
+
+def run_batch_qa(subject_name: str, gemini_api_key: str, input_path: str, output_path: str,
+                 max_concurrency: int = None, embeddings_model=None, llm=None):
+    """
+    Answers every not-yet-answered question in `input_path` and appends the results to
+    `output_path` in completion order. Returns {"total", "skipped", "answered", "failed"}.
+    """
+    max_concurrency = max_concurrency or config.BATCH_QA_MAX_CONCURRENCY
+    if embeddings_model is None:
+        embeddings_model = vector_store_manager.get_embeddings_model(gemini_api_key)
+    qa_chain = build_qa_chain(subject_name, gemini_api_key, embeddings_model, llm)
+    if qa_chain is None:
+        raise ValueError(f"Subject '{subject_name}' has no documents in session '{vector_store_manager.get_session_id()}'.")
+
+    questions = load_questions(input_path)
+    answered_ids = load_answered_ids(output_path)
+    pending = [question for question in questions if question["id"] not in answered_ids]
+    stats = {"total": len(questions), "skipped": len(questions) - len(pending), "answered": 0, "failed": 0}
+    if not pending:
+        return stats
+
+    start = time.perf_counter()
+    ends_mid_line = _ends_mid_line(output_path)
+    with trace_request("batch_qa"), open(output_path, "a", encoding="utf-8") as out:
+        if ends_mid_line:
+            out.write("\n")  # Otherwise the first new answer would continue the cut-short line.
+        results = qa_chain.batch_as_completed(
+            [question["question"] for question in pending],
+            config={"max_concurrency": max_concurrency, "callbacks": [get_callback_handler()]},
+            return_exceptions=True
+        )
+        for index, result in results:
+            question = pending[index]
+            record = {"id": question["id"], "question": question["question"]}
+            if isinstance(result, Exception):
+                print(f"WARNING: Question {question['id']} failed: {result}")
+                record["error"] = str(result)
+                stats["failed"] += 1
+            else:
+                record["answer"] = result["answer"]
+                record["sources"] = format_sources(result["context"])
+                stats["answered"] += 1
+            record["elapsed_s"] = round(time.perf_counter() - start, 3)
+            out.write(json.dumps(record) + "\n")
+            out.flush()  # Every finished answer survives a crash of the run.
+    record_count("batch_qa_answered", stats["answered"])
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions for one subject.")
+    parser.add_argument("--subject", required=True, help="Subject name, as shown in the app.")
+    parser.add_argument("--input", required=True, help="JSONL file with one {\"id\", \"question\"} object per line.")
+    parser.add_argument("--output", required=True, help="JSONL file the answers are appended to.")
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_QA_MAX_CONCURRENCY,
+                        help="Maximum questions answered at the same time.")
+    parser.add_argument("--ingest", nargs="+", default=[], metavar="PDF",
+                        help="PDFs to add to the subject before answering (unchanged files are skipped).")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"),
+                        help="Gemini API key (default: $GOOGLE_API_KEY).")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.api_key:
+        raise SystemExit("ERROR: Pass --api-key or set GOOGLE_API_KEY.")
+    embeddings_model = vector_store_manager.get_embeddings_model(args.api_key)
+    for pdf_path in args.ingest:
+        with open(pdf_path, "rb") as f:
+            stats = ingestion.ingest_pdf_stream(
+                args.subject, args.api_key, os.path.basename(pdf_path), io.BytesIO(f.read()),
+                embeddings_model=embeddings_model
+            )
+        print(f"Ingested {pdf_path}: {stats}")
+    stats = run_batch_qa(
+        args.subject, args.api_key, args.input, args.output,
+        max_concurrency=args.concurrency, embeddings_model=embeddings_model
+    )
+    print(f"Batch Q&A for {args.subject}: {stats}")
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# --- 1. Standard library imports ---
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 2. Third-party imports ---
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+# --- 3. Local application imports ---
+from src import config
+from src.instrumentation import span
+
+SUMMARY_PROMPT_TEMPLATE = """You keep running notes of a study conversation between a student and a professor.
+    Update the notes below with the new exchanges. Keep the topics, definitions, formulas and conclusions the student may refer back to; drop pleasantries and repetition.
+    Write at most {max_words} words of plain text.
+
+    ---
+    Current notes:
+    {summary}
+    ---
+    New exchanges:
+    {transcript}
+    ---
+
+    Updated notes:"""
+
+_summary_executor = ThreadPoolExecutor(max_workers=config.CHAT_MEMORY_SUMMARY_WORKERS, thread_name_prefix="chat-memory")
+
+
+def _clip_chars(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + " ..."
+
+
+def _clip_words(text: str, max_words: int) -> str:
+    words = text.split()
+    return text if len(words) <= max_words else " ".join(words[:max_words]) + " ..."
+
+
+def _format_turns(turns) -> str:
+    return "\n\n".join(f"Student: {question}\nProfessor: {answer}" for question, answer in turns)
+
+
+class ChatMemory:
+    """
+    What the Q&A chain remembers of one conversation: the last `window_turns`
+    question/answer turns (answers clipped to `turn_max_chars`) plus a rolling summary
+    of everything older, so its size stays bounded however long a study session runs.
+
+    Turns that leave the window are folded into the summary on a worker thread; until
+    that is done they are still passed on verbatim, so nothing is lost in between.
+    """
+
+    def __init__(self, window_turns: int = None, turn_max_chars: int = None, summary_max_words: int = None):
+        self.window_turns = window_turns or config.CHAT_MEMORY_WINDOW_TURNS
+        self.turn_max_chars = turn_max_chars or config.CHAT_MEMORY_TURN_MAX_CHARS
+        self.summary_max_words = summary_max_words or config.CHAT_MEMORY_SUMMARY_MAX_WORDS
+        self.summary = ""
+        self._recent = deque()
+        self._unsummarized = []
+        self._summarizing = False
+        self._lock = threading.Lock()
+
+    def add_turn(self, question: str, answer: str):
+        with self._lock:
+            self._recent.append((question, _clip_chars(answer, self.turn_max_chars)))
+            while len(self._recent) > self.window_turns:
+                self._unsummarized.append(self._recent.popleft())
+            # If summarizing keeps failing, the oldest turns are forgotten rather than piling up.
+            del self._unsummarized[:-self.window_turns]
+
+    def as_prompt_text(self) -> str:
+        """The conversation so far, as passed to the Q&A chain's "chat_history"."""
+        with self._lock:
+            turns = self._unsummarized + list(self._recent)
+            summary = self.summary
+        parts = [f"Summary of the earlier conversation: {summary}"] if summary else []
+        if turns:
+            parts.append(_format_turns(turns))
+        return "\n\n".join(parts)
+
+    def qa_input(self, question: str) -> dict:
+        """The Q&A chain input for a new question in this conversation."""
+        return {"question": question, "chat_history": self.as_prompt_text()}
+
+    def summarize_in_background(self, llm):
+        """Folds turns that left the window into the summary, unless that is already under way."""
+        with self._lock:
+            if self._summarizing or not self._unsummarized:
+                return
+            self._summarizing = True
+        _summary_executor.submit(self._summarize, llm)
+
+    def _summarize(self, llm):
+        try:
+            with self._lock:
+                turns, summary = list(self._unsummarized), self.summary
+            summary_chain = PromptTemplate.from_template(SUMMARY_PROMPT_TEMPLATE) | llm | StrOutputParser()
+            with span("chat_memory.summarize", turns=len(turns)):
+                new_summary = summary_chain.invoke({
+                    "max_words": self.summary_max_words,
+                    "summary": summary or "(none yet)",
+                    "transcript": _format_turns(turns),
+                })
+            with self._lock:
+                self.summary = _clip_words(new_summary.strip(), self.summary_max_words)
+                # Turns added (or dropped) meanwhile are left for the next round.
+                self._unsummarized = [turn for turn in self._unsummarized if not any(turn is done for done in turns)]
+        except Exception as e:
+            print(f"WARNING: Could not summarize earlier chat turns: {e}")
+        finally:
+            with self._lock:
+                self._summarizing = False
@@ -4,17 +4,250 @@ import tempfile
 # Get the absolute path of the project's root directory
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
-# --- Vector Database Path ---
-# Use a system's temporary directory for storing ChromaDB.
-# This ensures that each app instance (and potentially each user session on some platforms)
-# gets its own sandboxed, non-persistent storage. The data will be wiped when the
-# Streamlit container restarts, which is the desired behavior for a public app.
-# We add a subdirectory to keep things organized.
-BASE_VECTOR_DB_PATH = os.path.join(tempfile.gettempdir(), "me_course_companion_chroma")
+# --- Session Storage ---
+# Each session's subject stores and staged uploads live in one directory per session
+# under SESSIONS_ROOT. Only this directory is ever scanned or cleaned by the janitor.
+SESSIONS_ROOT = os.path.join(tempfile.gettempdir(), "me_course_companion_sessions")
+# A browser session's directory is named after the workspace ID kept in the page URL
+# (?workspace=...), which is created on the first visit. Reopening the same URL, after a
+# reload or a server restart, finds the same subjects and resumes unfinished ingestion jobs.
+# The URL is therefore a bearer token: anyone who has it can open the workspace.
+WORKSPACE_QUERY_PARAM = "workspace"
 
 
 # --- Upload Directory Path ---
 # This can still be relative to the project, as it's for very short-term storage
 # before a file is processed.
 UPLOAD_DIRECTORY = os.path.join(project_root, "uploaded_files")
-os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
\ No newline at end of file
+os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
+
+# --- Embedding Model ---
+EMBEDDING_MODEL_NAME = "models/embedding-001"
+EMBEDDING_TASK_TYPE = "retrieval_document"
+
+
+# --- Embedding Cache ---
+# A single SQLite file shared by every session on this host, so a syllabus that
+# was already embedded (by anyone, for any subject) is never sent to the API again.
+# The cap is a number of cached vectors; least-recently-used rows are evicted first.
+EMBEDDING_CACHE_PATH = os.path.join(tempfile.gettempdir(), "me_course_companion_embedding_cache.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = 200_000
+
+
+# --- Embedding Throughput ---
+# Chunks are embedded in batches of EMBEDDING_BATCH_SIZE (Gemini accepts at most 100
+# texts per batch request) across a bounded pool of worker threads. Every embedding
+# request sent to the provider, retries included, spends one token from a per-API-key
+# bucket refilled at EMBEDDING_REQUESTS_PER_MINUTE; the Gemini gateway (see below)
+# takes the tokens and retries failed requests.
+EMBEDDING_BATCH_SIZE = 100
+EMBEDDING_MAX_WORKERS = 4
+EMBEDDING_REQUESTS_PER_MINUTE = 150
+
+
+# --- Streaming Ingestion ---
+# Number of chunks held in memory between parsing and embedding. A few embedding
+# batches' worth keeps every embedding worker busy while memory stays bounded.
+INGEST_STREAM_BATCH_SIZE = 400
+# PDFs staged on disk by ingest jobs are parsed across a pool of PDF_PARSE_WORKERS
+# processes, PDF_PARSE_PAGES_PER_TASK pages per task; pages still reach the embedder in
+# order. With 1 worker (or a PDF of one task's size) pages are parsed in the ingest thread.
+PDF_PARSE_WORKERS = os.cpu_count() or 1
+PDF_PARSE_PAGES_PER_TASK = 8
+
+
+# --- Semantic Answer Cache ---
+# A new question reuses a past answer when the cosine similarity of their embeddings is
+# at least this high and both were asked of subjects holding the same documents (by
+# file name and content hash), in any session. Keep it strict: near-paraphrases only.
+ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.95
+ANSWER_CACHE_MAX_ENTRIES_PER_SUBJECT = 200
+ANSWER_CACHE_MAX_SUBJECTS = 500
+
+
+# --- Hybrid Retrieval ---
+# Keyword queries of at most this many terms, with no stop words and every term in the
+# BM25 index, are answered from that index alone, skipping the query embedding call.
+# Natural-language questions and longer queries fuse dense and lexical
+# rankings with reciprocal-rank fusion (RRF) over HYBRID_FETCH_K candidates from each.
+LEXICAL_FAST_PATH_MAX_TERMS = 3
+HYBRID_FETCH_K = 20
+HYBRID_RRF_K = 60
+
+
+# --- LLM ---
+LLM_MODEL_NAME = "gemini-1.5-flash-latest"
+LLM_TEMPERATURE = 0.2
+
+
+# --- Resource Registry ---
+# LLM and embedding clients are pooled per (API key, model) for the whole process.
+# Opened vector stores and built chains are cached per (session, subject, index version)
+# so switching between subjects does not rebuild anything. Idle entries expire after the
+# TTL and the least-recently-used entries are dropped beyond the size cap.
+CLIENT_POOL_TTL_SECONDS = 60 * 60
+CLIENT_POOL_MAX_ENTRIES = 64
+SUBJECT_RESOURCES_TTL_SECONDS = 30 * 60
+SUBJECT_RESOURCES_MAX_ENTRIES = 128
+
+
+# --- Shared Storage Mode ---
+# When enabled, chunk vectors are stored once per host in a content-addressed store
+# keyed by each PDF's SHA-256, and a session's subject is a lightweight view listing
+# the documents it references. Identical uploads from different sessions are embedded
+# once. Queries are always filtered to the session's own documents, and show each
+# session's own file names. The janitor deletes documents no session references any more.
+# Chroma does not support several processes writing and reading one persist directory,
+# so a shared store belongs to ONE server process per host: a second process that opens
+# it fails with an error. Run further processes with their own SHARED_VECTOR_DB_PATH.
+SHARED_STORAGE_ENABLED = os.environ.get("COURSE_COMPANION_SHARED_STORAGE", "0") == "1"
+SHARED_VECTOR_DB_PATH = os.path.join(tempfile.gettempdir(), "me_course_companion_shared_store")
+
+
+# --- Store Janitor ---
+# A background thread deletes session stores idle longer than the TTL, then enforces a
+# global disk quota by deleting the least recently used subject stores. Anything used
+# within the active window, or with ingestion jobs queued or running, is never deleted.
+JANITOR_SESSION_TTL_SECONDS = 6 * 60 * 60
+JANITOR_DISK_QUOTA_BYTES = 5 * 1024 ** 3
+JANITOR_ACTIVE_WINDOW_SECONDS = 30 * 60
+JANITOR_INTERVAL_SECONDS = 5 * 60
+
+
+# --- Instrumentation ---
+# Per-stage timings, token/chunk counts and cache hit rates are always collected in
+# memory. Set COURSE_COMPANION_METRICS_LOG=1 to also print each span as a JSON line,
+# and COURSE_COMPANION_METRICS_PORT to serve Prometheus text format on that port.
+# The server only listens on localhost unless COURSE_COMPANION_METRICS_HOST says
+# otherwise (e.g. 0.0.0.0 for a scraper on another host).
+METRICS_STRUCTURED_LOGS = os.environ.get("COURSE_COMPANION_METRICS_LOG", "0") == "1"
+METRICS_SERVER_PORT = int(os.environ.get("COURSE_COMPANION_METRICS_PORT", "0"))
+METRICS_SERVER_HOST = os.environ.get("COURSE_COMPANION_METRICS_HOST", "127.0.0.1")
+METRICS_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+# --- Context Packing ---
+# Retrieved chunks are packed before they reach the prompt: overlapping chunks from the
+# same page are merged (the splitter repeats up to 200 characters between neighbours),
+# exact and near-duplicate passages are dropped, and passages are added in relevance
+# order until the token budget is used. Tokens are estimated from character counts.
+CONTEXT_TOKEN_BUDGET = 4000
+CONTEXT_CHARS_PER_TOKEN = 4
+CONTEXT_MIN_OVERLAP_CHARS = 20
+CONTEXT_MAX_OVERLAP_CHARS = 400
+CONTEXT_NEAR_DUPLICATE_THRESHOLD = 0.9
+
+
+# --- Whole-Subject Summaries ---
+# "Summarize Subject" without a topic summarizes every document (map), then combines the
+# partial summaries in rounds until they fit one final prompt (reduce). Documents longer
+# than one section are mapped section by section first. Per-document summaries are
+# persisted by content hash, so a new upload costs one map call plus the reduce.
+# Bump SUMMARY_PROMPT_VERSION whenever the map/reduce prompts change.
+SUMMARY_MAP_SECTION_TOKENS = 8000
+SUMMARY_REDUCE_MAX_TOKENS = 12000
+SUMMARY_MAX_CONCURRENCY = 4
+SUMMARY_PROMPT_VERSION = 1
+
+
+# --- Quiz Question Bank ---
+# Quiz questions are generated in parallel, one LLM call per cluster of related source
+# chunks, parsed into structured records and kept in a per-subject bank keyed by source
+# chunk ID. "Generate Quiz" serves the least-used banked questions for the retrieved
+# chunks and only calls the LLM to top the bank up. After an upload the bank can be
+# pre-filled in the background from a sample of the subject's chunks.
+QUIZ_RETRIEVAL_K = 8
+QUIZ_CLUSTER_MAX_CHUNKS = 3
+QUIZ_QUESTIONS_PER_CLUSTER = 2
+QUIZ_MAX_CONCURRENCY = 4
+QUIZ_PREFILL_ENABLED = os.environ.get("COURSE_COMPANION_QUIZ_PREFILL", "1") == "1"
+QUIZ_PREFILL_MAX_CLUSTERS = 5
+
+
+# --- Vector Store Backend ---
+# New dedicated subject stores use this backend: "chroma", or "numpy" for an exact-search
+# index kept as memory-mapped embedding matrices plus JSON files of chunk texts and
+# metadata, appended to in segments. Existing subjects keep the backend they were created with.
+# NUMPY_STORE_DTYPE trades accuracy for size: "float16" (2 bytes/dim) or "int8" (1 byte/dim).
+VECTOR_BACKEND = os.environ.get("COURSE_COMPANION_VECTOR_BACKEND", "chroma")
+NUMPY_STORE_DTYPE = "float16"
+NUMPY_SEARCH_BLOCK_ROWS = 8192
+# Stores whose float32 working copy fits this budget keep it in memory after the first search.
+NUMPY_SEARCH_CACHE_MB = 256
+
+
+# --- Cross-Subject Search ---
+# Q&A can search several of the session's subjects at once. The question is embedded
+# once, every subject is searched concurrently for CROSS_SUBJECT_FETCH_K chunks, and the
+# results are merged by each store's normalized [0, 1] relevance score into the top
+# CROSS_SUBJECT_K before context packing.
+CROSS_SUBJECT_FETCH_K = 4
+CROSS_SUBJECT_K = 6
+CROSS_SUBJECT_MAX_WORKERS = 4
+
+
+# --- Batch Q&A ---
+# `python -m src.batch_qa` answers a JSONL file of questions for one subject without the
+# UI, at most BATCH_QA_MAX_CONCURRENCY questions in flight. Outside Streamlit, subjects
+# live under the session ID from COURSE_COMPANION_SESSION_ID ("local_test_session" if unset).
+BATCH_QA_MAX_CONCURRENCY = 4
+
+
+# --- Near-Duplicate Chunks ---
+# At ingest, chunks whose word shingles have an estimated Jaccard similarity of at least
+# NEAR_DUP_THRESHOLD with an already stored chunk of the subject (repeated slide
+# templates, headers, problem statements) are not embedded; the stored chunk records
+# their source and page instead. MinHash signatures use NEAR_DUP_NUM_PERM hashes split
+# into NEAR_DUP_BANDS LSH bands; changing either starts a new index.
+NEAR_DUP_ENABLED = os.environ.get("COURSE_COMPANION_NEAR_DUP", "1") == "1"
+NEAR_DUP_THRESHOLD = 0.85
+NEAR_DUP_NUM_PERM = 128
+NEAR_DUP_BANDS = 16
+NEAR_DUP_SHINGLE_WORDS = 5
+
+
+# --- Background Ingestion Jobs ---
+# Uploads are staged under <session dir>/INGEST_JOBS_DIR_NAME and ingested by a
+# per-process pool of INGEST_JOB_WORKERS threads (one file at a time per subject). Each
+# stored batch is checkpointed, so an interrupted job resumes without re-embedding.
+# The UI polls job progress every INGEST_JOB_POLL_SECONDS while jobs are active.
+INGEST_JOB_WORKERS = 2
+INGEST_JOBS_DIR_NAME = "ingest_jobs"
+INGEST_JOB_POLL_SECONDS = 1.0
+
+
+# --- Gemini Gateway ---
+# Every chat and embedding request goes through one gateway per (API key, purpose).
+# Identical concurrent requests are sent once, at most GATEWAY_MAX_CONCURRENCY_PER_KEY
+# run at a time, and transient errors (429, 5xx, timeouts) are retried up to
+# GATEWAY_MAX_RETRIES times with jittered exponential backoff. After
+# GATEWAY_BREAKER_FAILURE_THRESHOLD consecutive transient failures, calls fail fast for
+# GATEWAY_BREAKER_COOLDOWN_SECONDS before a single trial request is let through.
+GATEWAY_MAX_CONCURRENCY_PER_KEY = 8
+GATEWAY_MAX_RETRIES = 5
+GATEWAY_RETRY_BASE_DELAY_SECONDS = 1.0
+GATEWAY_BREAKER_FAILURE_THRESHOLD = 8
+GATEWAY_BREAKER_COOLDOWN_SECONDS = 30.0
+
+
+# --- Subject Snapshots ---
+# A subject can be exported as one zip archive (float16 embeddings, compressed chunk
+# texts and metadata, sidecar files, embedding model ID) and imported into another
+# session or container without re-embedding. Chunks are read and bulk-loaded
+# SNAPSHOT_BATCH_SIZE at a time. Bump the format version on incompatible changes.
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_BATCH_SIZE = 1000
+
+
+# --- Chat Memory ---
+# The Q&A chain sees the last CHAT_MEMORY_WINDOW_TURNS question/answer turns (answers
+# clipped to CHAT_MEMORY_TURN_MAX_CHARS) and a rolling summary of older turns of at most
+# CHAT_MEMORY_SUMMARY_MAX_WORDS words, and rewrites follow-ups into standalone questions
+# before retrieval. The chat transcript keeps the last CHAT_HISTORY_MAX_MESSAGES messages
+# and renders CHAT_HISTORY_PAGE_SIZE of them at a time.
+CHAT_MEMORY_WINDOW_TURNS = 4
+CHAT_MEMORY_TURN_MAX_CHARS = 1500
+CHAT_MEMORY_SUMMARY_MAX_WORDS = 250
+CHAT_MEMORY_SUMMARY_WORKERS = 2
+CHAT_HISTORY_MAX_MESSAGES = 200
+CHAT_HISTORY_PAGE_SIZE = 20
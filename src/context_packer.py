@@ -0,0 +1,122 @@
+# --- 1. Standard library imports ---
+import re
+
+# --- 2. Third-party imports ---
+from langchain_core.documents import Document
+
+# --- 3. Local application imports ---
+from src import config
+from src.instrumentation import record_count, span
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // config.CONTEXT_CHARS_PER_TOKEN + 1
+
+
+def _overlap_length(left: str, right: str) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`."""
+    longest = min(len(left), len(right), config.CONTEXT_MAX_OVERLAP_CHARS)
+    for length in range(longest, config.CONTEXT_MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+def _merge_text(first: str, second: str):
+    """Merges two passages of the same page if one contains or overlaps the other, else None."""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    overlap = _overlap_length(first, second)
+    if overlap:
+        return first + second[overlap:]
+    overlap = _overlap_length(second, first)
+    if overlap:
+        return second + first[overlap:]
+    return None
+
+
+def _shingles(text: str, size: int = 3):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _merge_same_page(docs):
+    """
+    Merges chunks from the same source and page that overlap or contain each other.
+    A merged passage takes the rank of its most relevant chunk.
+    """
+    packed = []
+    for doc in docs:
+        page_key = (doc.metadata.get("subject"), doc.metadata.get("source"), doc.metadata.get("page"))
+        for i, (existing_key, existing) in enumerate(packed):
+            if existing_key != page_key:
+                continue
+            merged_text = _merge_text(existing.page_content, doc.page_content)
+            if merged_text is not None:
+                packed[i] = (existing_key, Document(
+                    id=existing.id,
+                    page_content=merged_text,
+                    metadata={**existing.metadata, "merged_chunks": existing.metadata.get("merged_chunks", 1) + 1}
+                ))
+                break
+        else:
+            packed.append((page_key, doc))
+    return [doc for _, doc in packed]
+
+
+def _drop_duplicates(docs, threshold: float):
+    """Drops passages whose text repeats a more relevant passage exactly or nearly."""
+    kept, kept_shingles, seen_texts = [], [], set()
+    for doc in docs:
+        normalized = " ".join(doc.page_content.split()).lower()
+        if normalized in seen_texts:
+            continue
+        shingles = _shingles(normalized)
+        if any(_jaccard(shingles, other) >= threshold for other in kept_shingles):
+            continue
+        seen_texts.add(normalized)
+        kept_shingles.append(shingles)
+        kept.append(doc)
+    return kept
+
+
+def pack_documents(docs, token_budget: int = None, near_duplicate_threshold: float = None):
+    """
+    Packs retrieved documents (most relevant first) into a smaller context:
+    overlapping chunks of the same page are merged, duplicate passages dropped, and
+    passages kept in relevance order until `token_budget` estimated tokens are used.
+    A passage that does not fit is skipped so a smaller, less relevant one can still be used.
+    """
+    token_budget = token_budget or config.CONTEXT_TOKEN_BUDGET
+    threshold = near_duplicate_threshold or config.CONTEXT_NEAR_DUPLICATE_THRESHOLD
+    docs = list(docs)
+    with span("context_packing"):
+        candidates = _drop_duplicates(_merge_same_page(docs), threshold)
+        packed, used_tokens = [], 0
+        for doc in candidates:
+            doc_tokens = estimate_tokens(doc.page_content)
+            if used_tokens + doc_tokens > token_budget:
+                continue
+            packed.append(doc)
+            used_tokens += doc_tokens
+
+        if not packed and candidates:
+            # Never send an empty context: trim the most relevant passage to the budget.
+            best = candidates[0]
+            packed = [Document(
+                id=best.id,
+                page_content=best.page_content[:token_budget * config.CONTEXT_CHARS_PER_TOKEN],
+                metadata=best.metadata
+            )]
+
+    record_count("context_tokens_saved", sum(estimate_tokens(d.page_content) for d in docs)
+                 - sum(estimate_tokens(d.page_content) for d in packed))
+    return packed
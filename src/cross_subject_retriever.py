@@ -0,0 +1,78 @@
+# --- 1. Standard library imports ---
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List
+
+# --- 2. Third-party imports ---
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# --- 3. Local application imports ---
+from src import config
+from src.instrumentation import record_count, span
+from src.numpy_store import NumpyVectorStore
+
+_search_executor = ThreadPoolExecutor(max_workers=config.CROSS_SUBJECT_MAX_WORKERS, thread_name_prefix="cross-subject")
+
+
+def _cosine_relevance_fn(vector_store):
+    """
+    Maps a store's raw scores onto (cosine similarity + 1) / 2, so subjects stored in
+    different backends rank on one scale. NumpyVectorStore scores are cosine similarities;
+    Chroma's default space returns squared L2 distances, which for unit-length Gemini
+    embeddings equal 2 - 2 * cosine.
+    """
+    if isinstance(vector_store, NumpyVectorStore):
+        return lambda similarity: (similarity + 1.0) / 2.0
+    return lambda distance: 1.0 - distance / 4.0
+
+
+def _search_subject(subject_name: str, vector_store, query_embedding, k: int):
+    """Returns [(document tagged with its subject, relevance in [0, 1])] for one subject."""
+    with span("cross_subject.search", subject=subject_name):
+        docs_and_scores = vector_store.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k)
+    relevance_fn = _cosine_relevance_fn(vector_store)
+    return [
+        (
+            Document(id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "subject": subject_name}),
+            relevance_fn(score)
+        )
+        for doc, score in docs_and_scores
+    ]
+
+
+class CrossSubjectRetriever(BaseRetriever):
+    """
+    Searches several subjects' vector stores concurrently with one query embedding and
+    merges the results by normalized relevance. Every returned document carries the
+    name of its subject in metadata["subject"].
+    """
+
+    subject_stores: Any  # [(subject name, vector store)]
+    embeddings: Any
+    k: int = 6
+    fetch_k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        if not self.subject_stores:
+            return []
+        query_embedding = self.embeddings.embed_query(query)
+        # Each search runs in a copy of this context, so its spans land on the current
+        # request's trace and session_scope() overrides reach the worker.
+        futures = [
+            _search_executor.submit(
+                contextvars.copy_context().run, _search_subject, subject_name, vector_store, query_embedding, self.fetch_k
+            )
+            for subject_name, vector_store in self.subject_stores
+        ]
+        merged = []
+        for (subject_name, _), future in zip(self.subject_stores, futures):
+            try:
+                merged.extend(future.result())
+            except Exception as e:
+                # One broken store should not take the whole answer down.
+                print(f"WARNING: Cross-subject search failed for '{subject_name}': {e}")
+        record_count("cross_subject_searches", len(futures))
+        merged.sort(key=lambda item: item[1], reverse=True)
+        return [doc for doc, _ in merged[:self.k]]
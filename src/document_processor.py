@@ -1,14 +1,162 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from pypdf import PdfReader
+from langchain_core.documents import Document
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
+from src.instrumentation import record_count, span, timed
+
+@timed("pdf_load")
 def load_pdf(file_path):
     """Loads a PDF file and returns a list of Document objects."""
     loader = PyPDFLoader(file_path)
     documents = loader.load()
     return documents
 
+@timed("split")
 def split_documents(documents, chunk_size=1000, chunk_overlap=200):
     """Splits a list of Document objects into smaller chunks."""
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     split_docs = text_splitter.split_documents(documents)
     return split_docs
+
+def _page_to_document(reader, page_number, source_name):
+    """Extracts one pypdf page into a Document with PyPDFLoader-style metadata."""
+    return Document(
+        page_content=reader.pages[page_number].extract_text(extraction_mode="plain").strip(),
+        metadata={
+            "source": source_name,
+            "total_pages": len(reader.pages),
+            "page": page_number,
+            "page_label": reader.page_labels[page_number],
+        }
+    )
+
+# --- PARALLEL LOADING ---
+
+def _load_page_range(file_path, start_page, end_page, source_name):
+    """
+    Worker task: extracts pages [start_page, end_page) of one PDF.
+    Runs in a child process, so it only takes and returns picklable values.
+    """
+    reader = PdfReader(file_path)
+    return [_page_to_document(reader, page_number, source_name) for page_number in range(start_page, end_page)]
+
+def _load_and_split_page_range(file_path, start_page, end_page, chunk_size, chunk_overlap):
+    """Worker task: extracts pages [start_page, end_page) of one PDF and splits them."""
+    page_docs = _load_page_range(file_path, start_page, end_page, file_path)
+    return split_documents(page_docs, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+@timed("pdf_load_and_split_parallel")
+def load_and_split_pdfs_parallel(file_paths, chunk_size=1000, chunk_overlap=200, max_workers=None, pages_per_task=8):
+    """
+    Loads and splits one or more PDFs across a process pool.
+    Each PDF is cut into page ranges of `pages_per_task` pages, so a single large
+    textbook is spread over all cores just like several small PDFs are. Chunks are
+    returned in file order, then page order, with the same `source`/`page` metadata
+    as load_pdf + split_documents.
+    """
+    tasks = []
+    for file_path in file_paths:
+        total_pages = len(PdfReader(file_path).pages)
+        for start_page in range(0, total_pages, pages_per_task):
+            tasks.append((file_path, start_page, min(start_page + pages_per_task, total_pages)))
+
+    if not tasks:
+        return []
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if max_workers == 1:
+        results = [_load_and_split_page_range(*task, chunk_size, chunk_overlap) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # executor.map yields results in submission order, which keeps the output deterministic.
+            results = executor.map(
+                _load_and_split_page_range,
+                [task[0] for task in tasks],
+                [task[1] for task in tasks],
+                [task[2] for task in tasks],
+                [chunk_size] * len(tasks),
+                [chunk_overlap] * len(tasks),
+            )
+            results = list(results)
+
+    return [chunk for task_chunks in results for chunk in task_chunks]
+
+# --- STREAMING PIPELINE ---
+# These generators let a PDF flow from the upload buffer to the vector store one batch
+# at a time, so peak memory follows the batch size rather than the document size.
+
+def iter_pdf_pages(pdf_stream, source_name, on_page_count=None):
+    """
+    Yields one Document per page, parsed directly from a binary file-like object
+    (e.g. a Streamlit UploadedFile) without writing it to disk.
+    `on_page_count`, if given, is called with the number of pages before the first one.
+    """
+    reader = PdfReader(pdf_stream)
+    if on_page_count is not None:
+        on_page_count(len(reader.pages))
+    for page_number in range(len(reader.pages)):
+        with span("pdf_parse_page"):
+            page_doc = _page_to_document(reader, page_number, source_name)
+        record_count("pages_parsed", 1)
+        yield page_doc
+
+def iter_pdf_pages_parallel(file_path, source_name, on_page_count=None, max_workers=None, pages_per_task=8):
+    """
+    Like iter_pdf_pages, for a PDF on disk: page ranges of `pages_per_task` pages are
+    extracted across a process pool and yielded in page order. At most two ranges per
+    worker are parsed ahead of the consumer, so memory stays bounded for any PDF size.
+    """
+    total_pages = len(PdfReader(file_path).pages)
+    if on_page_count is not None:
+        on_page_count(total_pages)
+    ranges = [(start_page, min(start_page + pages_per_task, total_pages)) for start_page in range(0, total_pages, pages_per_task)]
+    max_workers = min(max_workers or os.cpu_count() or 1, len(ranges))
+    if max_workers <= 1:
+        yield from iter_pdf_pages(file_path, source_name)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        pending = deque()
+        for start_page, end_page in ranges:
+            pending.append(executor.submit(_load_page_range, file_path, start_page, end_page, source_name))
+            if len(pending) >= 2 * max_workers:
+                yield from _drain_page_range(pending.popleft())
+        while pending:
+            yield from _drain_page_range(pending.popleft())
+    finally:
+        # A consumer that stops early (e.g. a failed embedding batch) abandons the rest.
+        executor.shutdown(cancel_futures=True)
+
+def _drain_page_range(future):
+    with span("pdf_parse_pages"):
+        page_docs = future.result()
+    record_count("pages_parsed", len(page_docs))
+    yield from page_docs
+
+def iter_chunks(page_docs, chunk_size=1000, chunk_overlap=200):
+    """Splits a stream of page Documents into chunks, one page at a time."""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for page_doc in page_docs:
+        with span("split"):
+            chunks = text_splitter.split_documents([page_doc])
+        record_count("chunks_split", len(chunks))
+        yield from chunks
+
+def iter_batches(items, batch_size):
+    """Groups any iterable into lists of at most `batch_size` items."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+def stream_pdf_chunk_batches(pdf_stream, source_name, batch_size, chunk_size=1000, chunk_overlap=200):
+    """Streams a PDF as batches of chunks: pages -> chunks -> batches."""
+    pages = iter_pdf_pages(pdf_stream, source_name)
+    chunks = iter_chunks(pages, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return iter_batches(chunks, batch_size)
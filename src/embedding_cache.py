@@ -0,0 +1,174 @@
+# --- 1. Standard library imports ---
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+# --- 2. Third-party imports ---
+from langchain_core.embeddings import Embeddings
+
+# --- 3. Local application imports ---
+from src import config
+from src.instrumentation import record_cache_access, record_count, span
+
+
+def hash_text(text: str) -> str:
+    """Returns the SHA-256 hex digest of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    A persistent, size-capped vector cache stored in a single SQLite file.
+    Rows are keyed by (model name, task type, SHA-256 of the text) and evicted
+    least-recently-used first once the table grows past `max_entries`.
+    """
+
+    def __init__(self, db_path: str = None, max_entries: int = None):
+        self.db_path = db_path or config.EMBEDDING_CACHE_PATH
+        self.max_entries = max_entries or config.EMBEDDING_CACHE_MAX_ENTRIES
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    task_type TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (model, task_type, text_hash)
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+            )
+
+    def get_many(self, model: str, task_type: str, text_hashes):
+        """Returns a {text_hash: vector} dict for the hashes that are cached."""
+        found = {}
+        unique_hashes = list(dict.fromkeys(text_hashes))
+        now = time.time()
+        with self._lock, self._conn:
+            # SQLite limits the number of bound parameters, so look up in slices.
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" for _ in batch)
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND task_type = ? AND text_hash IN ({placeholders})",
+                    (model, task_type, *batch),
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    found[text_hash] = vector.tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND task_type = ? AND text_hash = ?",
+                    [(now, model, task_type, h) for h in found],
+                )
+        return found
+
+    def put_many(self, model: str, task_type: str, items):
+        """Stores (text_hash, vector) pairs and evicts the oldest rows if over the cap."""
+        now = time.time()
+        rows = [
+            (model, task_type, text_hash, array("f", vector).tobytes(), now)
+            for text_hash, vector in items
+        ]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, task_type, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+            overflow = count - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN "
+                    "(SELECT rowid FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                    (overflow,),
+                )
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings model so that only texts missing from the cache are sent
+    to the underlying API. Query embeddings are cached under their own task type.
+    """
+
+    def __init__(self, underlying: Embeddings, model_name: str, task_type: str, cache: EmbeddingCache = None):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.task_type = task_type
+        self.cache = cache if cache is not None else get_shared_cache()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        hashes = [hash_text(t) for t in texts]
+        cached = self.cache.get_many(self.model_name, self.task_type, hashes)
+
+        # De-duplicate misses so identical chunks within one upload are embedded once.
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+
+        if missing:
+            with span("embedding.documents", texts=len(missing)):
+                new_vectors = self.underlying.embed_documents(list(missing.values()))
+            record_count("texts_embedded", len(missing))
+            fresh = dict(zip(missing.keys(), new_vectors))
+            self.cache.put_many(self.model_name, self.task_type, fresh.items())
+            cached.update(fresh)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        record_cache_access("embedding", hits=len(texts) - len(missing), misses=len(missing))
+        return [cached[h] for h in hashes]
+
+    def embed_query(self, text):
+        query_task_type = f"{self.task_type}:query"
+        text_hash = hash_text(text)
+        cached = self.cache.get_many(self.model_name, query_task_type, [text_hash])
+        if text_hash in cached:
+            self.hits += 1
+            record_cache_access("query_embedding", hits=1)
+            return cached[text_hash]
+        with span("embedding.query"):
+            vector = self.underlying.embed_query(text)
+        self.cache.put_many(self.model_name, query_task_type, [(text_hash, vector)])
+        self.misses += 1
+        record_cache_access("query_embedding", misses=1)
+        return vector
+
+
+# --- PROCESS-WIDE CACHE INSTANCE ---
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache() -> EmbeddingCache:
+    """Returns the process-wide EmbeddingCache, opening it on first use."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = EmbeddingCache()
+        return _shared_cache
@@ -0,0 +1,37 @@
+# --- 1. Standard library imports ---
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 2. Third-party imports ---
+from langchain_core.embeddings import Embeddings
+
+# --- 3. Local application imports ---
+from src import config
+
+
+class ConcurrentBatchEmbeddings(Embeddings):
+    """
+    Splits a large embed_documents call into fixed-size batches and embeds them
+    across a bounded thread pool. Rate limiting and retries are left to the gateway
+    underneath, which spends a token on every provider attempt.
+    Results are returned in the original order.
+    """
+
+    def __init__(self, underlying: Embeddings, batch_size: int = None, max_workers: int = None):
+        self.underlying = underlying
+        self.batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+        self.max_workers = max_workers or config.EMBEDDING_MAX_WORKERS
+
+    def _embed_batch(self, batch):
+        return self.underlying.embed_documents(batch)
+
+    def embed_documents(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self._embed_batch(texts) if texts else []
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            batch_results = list(executor.map(self._embed_batch, batches))
+        return [vector for batch_vectors in batch_results for vector in batch_vectors]
+
+    def embed_query(self, text):
+        return self.underlying.embed_query(text)
@@ -0,0 +1,300 @@
+# --- 1. Standard library imports ---
+import copy
+import hashlib
+import json
+import threading
+import time
+from typing import Any, List, Optional
+
+# --- 2. Third-party imports ---
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+
+# --- 3. Local application imports ---
+from src import config
+from src.instrumentation import GATEWAY_REQUESTS_METRIC, get_metrics, span
+from src.rate_limiter import (
+    CircuitOpenError, TokenBucket, backoff_delay, call_with_backoff, get_token_bucket, is_transient_error
+)
+
+
+def request_key(*parts) -> str:
+    """A stable hash of everything that determines a provider response."""
+    return hashlib.sha256(json.dumps(parts, default=str, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures and rejects calls for
+    `cooldown_seconds`. Then one trial call is let through (half-open): success closes
+    the circuit, failure opens it for another cooldown.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = None, cooldown_seconds: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or config.GATEWAY_BREAKER_FAILURE_THRESHOLD
+        self.cooldown_seconds = cooldown_seconds or config.GATEWAY_BREAKER_COOLDOWN_SECONDS
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str):
+        if state != self.state:
+            self.state = state
+            get_metrics().increment(GATEWAY_REQUESTS_METRIC, gateway=self.name, outcome=f"circuit_{state}")
+            if state == "open":
+                print(f"WARNING: Gemini gateway '{self.name}' circuit opened after {self._failures} failures; "
+                      f"failing fast for {self.cooldown_seconds:.0f}s.")
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self._transition("half_open")
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            self._transition("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._transition("open")
+
+    def release_trial(self):
+        """Ends a half-open trial that failed for a reason unrelated to the provider's health."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class _Flight:
+    """One in-flight provider request that identical concurrent requests wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class GeminiGateway:
+    """
+    The single path from this process to one Gemini API key for one purpose (chat or
+    embeddings). Identical concurrent requests are coalesced into one provider call
+    (single-flight), at most `max_concurrency` calls run at once, transient errors are
+    retried with jittered backoff, and sustained failures open a circuit breaker so
+    callers fail fast instead of queueing behind a provider outage. With a `rate_limiter`,
+    every provider attempt (retries included) spends one token from it.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = None, max_retries: int = None,
+                 retry_base_delay: float = None, breaker: CircuitBreaker = None,
+                 rate_limiter: TokenBucket = None):
+        self.name = name
+        self.max_concurrency = max_concurrency or config.GATEWAY_MAX_CONCURRENCY_PER_KEY
+        self.max_retries = config.GATEWAY_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_base_delay = retry_base_delay or config.GATEWAY_RETRY_BASE_DELAY_SECONDS
+        self.breaker = breaker or CircuitBreaker(name)
+        self.rate_limiter = rate_limiter
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def _count(self, kind: str, outcome: str, value: float = 1):
+        get_metrics().increment(GATEWAY_REQUESTS_METRIC, value, gateway=self.name, kind=kind, outcome=outcome)
+
+    def _admit(self, kind: str):
+        if not self.breaker.allow_request():
+            self._count(kind, "rejected")
+            raise CircuitOpenError(f"Gemini gateway '{self.name}' is failing fast after repeated provider errors.")
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+    def _record_outcome(self, kind: str, error: Exception = None):
+        if error is None:
+            self.breaker.record_success()
+            self._count(kind, "ok")
+        elif is_transient_error(error):
+            self.breaker.record_failure()
+            self._count(kind, "error")
+        else:
+            # The request itself was bad (e.g. an invalid prompt); the provider is healthy.
+            self.breaker.release_trial()
+            self._count(kind, "error")
+
+    def _attempt(self, kind: str, func, *args, **kwargs):
+        self._admit(kind)
+        with self._slots, span(f"gateway.{kind}"):
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._record_outcome(kind, e)
+                raise
+        self._record_outcome(kind)
+        return result
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Seconds to wait before retry `attempt + 1`, with full jitter so callers don't retry in lockstep."""
+        return backoff_delay(attempt, self.retry_base_delay)
+
+    def _call_with_retries(self, kind: str, func, *args, **kwargs):
+        attempts = []
+
+        def attempt():
+            if attempts:
+                self._count(kind, "retry")
+            attempts.append(1)
+            return self._attempt(kind, func, *args, **kwargs)
+
+        return call_with_backoff(
+            attempt,
+            max_retries=self.max_retries,
+            should_retry=is_transient_error,
+            delay_for=self._backoff_delay
+        )
+
+    def call(self, kind: str, key: str, func, *args, **kwargs):
+        """
+        Returns func(*args, **kwargs). While a call with the same `kind` and `key` is in
+        flight, further callers wait for it and get a copy of its result (or its error).
+        """
+        flight_key = (kind, key)
+        with self._lock:
+            flight = self._flights.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[flight_key] = _Flight()
+
+        if not leader:
+            self._count(kind, "coalesced")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = self._call_with_retries(kind, func, *args, **kwargs)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[flight_key]
+            flight.done.set()
+
+    def stream(self, kind: str, func, *args, **kwargs):
+        """
+        Yields from the generator func(*args, **kwargs) while holding a concurrency slot.
+        Streams are not coalesced, and are retried only until their first chunk arrives.
+        """
+        for attempt in range(self.max_retries + 1):
+            self._admit(kind)
+            with self._slots, span(f"gateway.{kind}"):
+                started = False
+                try:
+                    for chunk in func(*args, **kwargs):
+                        started = True
+                        yield chunk
+                except GeneratorExit:
+                    # The consumer stopped reading; that says nothing about the provider.
+                    self.breaker.release_trial()
+                    raise
+                except Exception as e:
+                    self._record_outcome(kind, e)
+                    if started or attempt == self.max_retries or not is_transient_error(e):
+                        raise
+                    delay = self._backoff_delay(attempt)
+                    print(f"WARNING: Provider stream failed: {e} (attempt {attempt + 1}/{self.max_retries + 1}); "
+                          f"retrying in {delay:.1f}s.")
+                else:
+                    self._record_outcome(kind)
+                    return
+            self._count(kind, "retry")
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = len(self._flights)
+        return {"name": self.name, "circuit": self.breaker.state, "coalescing_requests": in_flight}
+
+
+# --- LANGCHAIN ADAPTERS ---
+
+class GatewayChatModel(BaseChatModel):
+    """A chat model that sends every request of `underlying` through a GeminiGateway."""
+
+    underlying: BaseChatModel
+    gateway: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gateway-{self.underlying._llm_type}"
+
+    @property
+    def _identifying_params(self):
+        return self.underlying._identifying_params
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        key = request_key(
+            self.underlying._identifying_params,
+            [(message.type, message.content, message.additional_kwargs) for message in messages],
+            stop,
+            kwargs
+        )
+        return self.gateway.call("chat", key, self.underlying._generate, messages, stop=stop,
+                                 run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs):
+        yield from self.gateway.stream("chat_stream", self.underlying._stream, messages, stop=stop,
+                                       run_manager=run_manager, **kwargs)
+
+
+class GatewayEmbeddings(Embeddings):
+    """Embeddings whose provider requests go through a GeminiGateway."""
+
+    def __init__(self, underlying: Embeddings, gateway: GeminiGateway, model_name: str = ""):
+        self.underlying = underlying
+        self.gateway = gateway
+        self.model_name = model_name
+
+    def embed_documents(self, texts):
+        key = request_key(self.model_name, texts)
+        return self.gateway.call("embed_documents", key, self.underlying.embed_documents, texts)
+
+    def embed_query(self, text):
+        key = request_key(self.model_name, text)
+        return self.gateway.call("embed_query", key, self.underlying.embed_query, text)
+
+
+# --- PROCESS-WIDE GATEWAYS ---
+# One gateway per (API key, purpose), because provider quotas are enforced per key.
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(api_key: str, purpose: str, requests_per_minute: float = None) -> GeminiGateway:
+    """
+    Returns the shared GeminiGateway for this API key and purpose, creating it on first use.
+    `requests_per_minute`, if given, caps its provider attempts with the key's token bucket.
+    """
+    key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    with _gateways_lock:
+        gateway = _gateways.get((key_hash, purpose))
+        if gateway is None:
+            rate_limiter = get_token_bucket(api_key, purpose, requests_per_minute) if requests_per_minute else None
+            gateway = _gateways[(key_hash, purpose)] = GeminiGateway(f"{purpose}:{key_hash[:8]}", rate_limiter=rate_limiter)
+        return gateway
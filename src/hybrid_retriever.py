@@ -0,0 +1,74 @@
+# --- 1. Standard library imports ---
+from typing import Any, List
+
+# --- 2. Third-party imports ---
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+# --- 3. Local application imports ---
+from src import config
+from src.instrumentation import record_count
+from src.lexical_index import STOP_WORDS, tokenize
+
+
+def reciprocal_rank_fusion(ranked_id_lists, rrf_k: int = 60):
+    """Fuses several ranked lists of IDs into one list, best first (Cormack et al., 2009)."""
+    scores = {}
+    for ranked_ids in ranked_id_lists:
+        for rank, doc_id in enumerate(ranked_ids):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Combines dense vector search with BM25 lexical search via reciprocal-rank fusion.
+    Short keyword queries (no stop words, every term indexed) take a lexical-only fast
+    path, which skips the query embedding call entirely. Questions such as "What is
+    entropy?" always get dense retrieval.
+    """
+
+    vector_store: Any
+    lexical_index: Any
+    k: int = 4
+    fetch_k: int = 20
+
+    def _is_keyword_query(self, query: str) -> bool:
+        terms = tokenize(query)
+        return (
+            0 < len(terms) <= config.LEXICAL_FAST_PATH_MAX_TERMS
+            and STOP_WORDS.isdisjoint(terms)
+            and self.lexical_index.has_terms(terms)
+        )
+
+    def _lexical_ids(self, query: str, k: int):
+        return [doc_id for doc_id, _ in self.lexical_index.search(query, k=k)]
+
+    def _fetch_by_ids(self, doc_ids):
+        docs_by_id = {doc.id: doc for doc in self.vector_store.get_by_ids(doc_ids)}
+        return [docs_by_id[doc_id] for doc_id in doc_ids if doc_id in docs_by_id]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        if self._is_keyword_query(query):
+            lexical_ids = self._lexical_ids(query, self.k)
+            if lexical_ids:
+                record_count("lexical_fast_path_queries", 1)
+                return self._fetch_by_ids(lexical_ids)
+
+        dense_docs = self.vector_store.similarity_search(query, k=self.fetch_k)
+        dense_by_id = {doc.id: doc for doc in dense_docs if doc.id}
+        dense_ids = [doc.id for doc in dense_docs if doc.id]
+        lexical_ids = self._lexical_ids(query, self.fetch_k)
+        if not lexical_ids or not dense_ids:
+            # Stores ingested before chunk IDs existed have nothing to fuse against.
+            return dense_docs[:self.k] if not lexical_ids else self._fetch_by_ids(lexical_ids[:self.k])
+
+        fused_ids = reciprocal_rank_fusion([dense_ids, lexical_ids], rrf_k=config.HYBRID_RRF_K)[:self.k]
+        missing_ids = [doc_id for doc_id in fused_ids if doc_id not in dense_by_id]
+        fetched_by_id = {doc.id: doc for doc in self._fetch_by_ids(missing_ids)} if missing_ids else {}
+        return [
+            dense_by_id.get(doc_id) or fetched_by_id[doc_id]
+            for doc_id in fused_ids
+            if doc_id in dense_by_id or doc_id in fetched_by_id
+        ]
@@ -0,0 +1,248 @@
+# --- 1. Standard library imports ---
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 2. Local application imports ---
+from src import config, ingestion
+from src.instrumentation import trace_request
+from src.store_janitor import get_janitor
+from src.subject_catalog import get_session_base_path, get_session_id, get_subject_db_path, session_scope
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def get_jobs_dir(session_base_path: str) -> str:
+    """Job state and staged uploads live in the session directory, beside its subject stores."""
+    return os.path.join(session_base_path, config.INGEST_JOBS_DIR_NAME)
+
+
+class IngestJob(ingestion.IngestProgress):
+    """
+    One uploaded PDF waiting for or going through ingestion. Its state (status, progress,
+    statistics and resume checkpoint) is persisted as JSON beside the staged PDF after
+    every stored batch, so another process can report on it or resume it.
+    """
+
+    def __init__(self, state: dict, jobs_dir: str):
+        self.state = state
+        self.jobs_dir = jobs_dir
+        self.lock = threading.Lock()
+        # Kept in memory only: API keys are never written to disk.
+        self.gemini_api_key = None
+        self.embeddings_model = None
+        self.trace = None
+
+    @property
+    def job_id(self) -> str:
+        return self.state["job_id"]
+
+    @property
+    def state_path(self) -> str:
+        return os.path.join(self.jobs_dir, f"{self.job_id}.json")
+
+    @property
+    def pdf_path(self) -> str:
+        return os.path.join(self.jobs_dir, f"{self.job_id}.pdf")
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {key: value for key, value in self.state.items() if key != "checkpoint"}
+
+    def update(self, **fields):
+        with self.lock:
+            self.state.update(fields, updated_at=time.time())
+        self.save()
+
+    def save(self):
+        with self.lock:
+            temp_path = f"{self.state_path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.state, f)
+            os.replace(temp_path, self.state_path)
+
+    @classmethod
+    def load(cls, state_path: str):
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                return cls(json.load(f), os.path.dirname(state_path))
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Ignoring unreadable ingest job {state_path}: {e}")
+            return None
+
+    # --- ingestion.IngestProgress ---
+
+    def on_page_count(self, total_pages: int):
+        with self.lock:
+            self.state.update(pages_total=total_pages, pages_done=0)
+
+    def on_page_done(self):
+        with self.lock:
+            self.state["pages_done"] += 1
+
+    def stored_chunk_ids(self, file_hash: str):
+        with self.lock:
+            checkpoint = self.state["checkpoint"]
+            return set(checkpoint["chunk_ids"]) if checkpoint["file_hash"] == file_hash else set()
+
+    def on_batch_stored(self, file_hash: str, chunk_ids):
+        with self.lock:
+            checkpoint = self.state["checkpoint"]
+            if checkpoint["file_hash"] != file_hash:
+                checkpoint.update(file_hash=file_hash, chunk_ids=[])
+            checkpoint["chunk_ids"].extend(chunk_ids)
+            self.state["chunks_stored"] += len(chunk_ids)
+            self.state["updated_at"] = time.time()
+        self.save()
+
+
+class IngestJobQueue:
+    """
+    A per-process pool of ingestion workers. Uploads are staged to disk and ingested in
+    the background, one file at a time per subject, while the UI polls their progress.
+    Jobs left queued or running by a previous process can be resumed; completed batches
+    are not embedded again.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or config.INGEST_JOB_WORKERS, thread_name_prefix="ingest-job"
+        )
+        self._jobs = {}
+        self._subject_locks = {}
+        self._lock = threading.Lock()
+
+    def _subject_lock(self, subject_db_path: str) -> threading.Lock:
+        with self._lock:
+            return self._subject_locks.setdefault(subject_db_path, threading.Lock())
+
+    def submit(self, subject_name: str, file_name: str, pdf_bytes: bytes, gemini_api_key: str, embeddings_model=None):
+        """Stages one upload for the current session's subject and queues it. Returns the job."""
+        jobs_dir = get_jobs_dir(get_session_base_path())
+        os.makedirs(jobs_dir, exist_ok=True)
+        now = time.time()
+        job = IngestJob({
+            "job_id": uuid.uuid4().hex,
+            "session_id": get_session_id(),
+            "subject_name": subject_name,
+            "file_name": file_name,
+            "status": "queued",
+            "pages_total": None,
+            "pages_done": 0,
+            "chunks_stored": 0,
+            "stats": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "checkpoint": {"file_hash": None, "chunk_ids": []},
+        }, jobs_dir)
+        with open(job.pdf_path, "wb") as f:
+            f.write(pdf_bytes)
+        job.save()
+        self._enqueue(job, gemini_api_key, embeddings_model)
+        return job
+
+    def _enqueue(self, job: IngestJob, gemini_api_key: str, embeddings_model):
+        job.gemini_api_key = gemini_api_key
+        job.embeddings_model = embeddings_model
+        with session_scope(job.state["session_id"]):
+            subject_db_path = get_subject_db_path(job.state["subject_name"])
+        # Leased from now on, so the janitor cannot delete the session (and its staged
+        # upload) while the job waits for a worker. _run releases it.
+        get_janitor().acquire_lease(subject_db_path)
+        with self._lock:
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, subject_db_path)
+
+    def _run(self, job: IngestJob, subject_db_path: str):
+        try:
+            self._ingest(job, subject_db_path)
+        finally:
+            get_janitor().release_lease(subject_db_path)
+
+    def _ingest(self, job: IngestJob, subject_db_path: str):
+        with session_scope(job.state["session_id"]):
+            subject_name = job.state["subject_name"]
+            with self._subject_lock(subject_db_path):
+                job.update(status="running")
+                try:
+                    with trace_request("ingest") as trace, open(job.pdf_path, "rb") as pdf_stream:
+                        stats = ingestion.ingest_pdf_stream(
+                            subject_name,
+                            job.gemini_api_key,
+                            job.state["file_name"],
+                            pdf_stream,
+                            embeddings_model=job.embeddings_model,
+                            progress=job
+                        )
+                    job.trace = trace.to_dict()
+                    job.update(status="done", stats=stats)
+                    os.remove(job.pdf_path)
+                except Exception as e:
+                    print(f"WARNING: Ingest job {job.job_id} ({job.state['file_name']}) failed: {e}")
+                    job.update(status="failed", error=str(e))
+
+    def resume_interrupted(self, gemini_api_key: str, embeddings_model=None):
+        """
+        Re-queues the current session's jobs that a previous process left queued or running.
+        Sessions are named by the workspace ID in the page URL, so the jobs are found when
+        the same URL is opened after a restart. Their checkpoints make the resumed ingest
+        skip batches that were already stored.
+        """
+        jobs_dir = get_jobs_dir(get_session_base_path())
+        if not os.path.isdir(jobs_dir):
+            return []
+        resumed = []
+        for name in sorted(os.listdir(jobs_dir)):
+            if not name.endswith(".json"):
+                continue
+            with self._lock:
+                if name[:-len(".json")] in self._jobs:
+                    continue
+            job = IngestJob.load(os.path.join(jobs_dir, name))
+            if job is None or job.state["status"] not in ACTIVE_STATUSES or not os.path.exists(job.pdf_path):
+                continue
+            job.update(status="queued")
+            self._enqueue(job, gemini_api_key, embeddings_model)
+            resumed.append(job)
+        return resumed
+
+    def get_job(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self, session_id: str = None):
+        """Snapshots of this process's jobs for a session (default: the current one), oldest first."""
+        session_id = session_id or get_session_id()
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.state["session_id"] == session_id]
+        return sorted((job.snapshot() for job in jobs), key=lambda state: state["created_at"])
+
+    def dismiss(self, job_id: str):
+        """Forgets a finished job and deletes its files."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state["status"] in ACTIVE_STATUSES:
+                return
+            del self._jobs[job_id]
+        for path in (job.state_path, job.pdf_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# --- PROCESS-WIDE QUEUE ---
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> IngestJobQueue:
+    """Returns the process-wide ingestion job queue."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = IngestJobQueue()
+        return _queue
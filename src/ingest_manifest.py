@@ -0,0 +1,112 @@
+# --- 1. Standard library imports ---
+import hashlib
+import json
+import os
+
+
+def get_manifest_path(subject_db_path: str) -> str:
+    """The manifest lives next to (not inside) the subject's Chroma directory."""
+    return f"{subject_db_path}_manifest.json"
+
+
+def hash_text(text: str) -> str:
+    """Returns the SHA-256 hex digest of a page's extracted text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_stream(binary_stream, block_size: int = 1024 * 1024) -> str:
+    """Hashes a binary file-like object in blocks and rewinds it for the next reader."""
+    digest = hashlib.sha256()
+    binary_stream.seek(0)
+    while block := binary_stream.read(block_size):
+        digest.update(block)
+    binary_stream.seek(0)
+    return digest.hexdigest()
+
+
+def make_chunk_id(file_name: str, page_number: int, page_hash: str, chunk_index: int) -> str:
+    """
+    Deterministic chunk ID. It includes the page hash, so an edited page always gets
+    new IDs and its old chunks can be deleted without touching unchanged pages.
+    """
+    raw = f"{file_name}\x00{page_number}\x00{page_hash}\x00{chunk_index}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class SubjectManifest:
+    """
+    Records what has been ingested into one subject's vector store:
+    for every file its content hash, and for every page its text hash and chunk IDs.
+    `index_version` is bumped whenever the store's contents change.
+    """
+
+    def __init__(self, path: str, data: dict = None):
+        self.path = path
+        self.data = data or {"index_version": 0, "files": {}}
+
+    @classmethod
+    def load(cls, subject_db_path: str):
+        path = get_manifest_path(subject_db_path)
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return cls(path, json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"WARNING: Ignoring unreadable ingest manifest {path}: {e}")
+        return cls(path)
+
+    def save(self):
+        """Writes the manifest atomically so a crash never leaves a half-written file."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f)
+        os.replace(temp_path, self.path)
+
+    @property
+    def index_version(self) -> int:
+        return self.data["index_version"]
+
+    def bump_index_version(self):
+        self.data["index_version"] += 1
+
+    @property
+    def storage(self) -> str:
+        """Either "dedicated" (a private Chroma store) or "shared" (a view onto the shared store)."""
+        return self.data.get("storage", "dedicated")
+
+    def set_storage(self, storage: str):
+        self.data["storage"] = storage
+
+    def file_hashes(self):
+        return [file_record["file_hash"] for file_record in self.data["files"].values()]
+
+    def file_names_by_hash(self) -> dict:
+        """Maps each file hash to the (alphabetically first) file name it was uploaded as."""
+        names = {}
+        for file_name in sorted(self.data["files"]):
+            names.setdefault(self.data["files"][file_name]["file_hash"], file_name)
+        return names
+
+    def get_file(self, file_name: str):
+        return self.data["files"].get(file_name)
+
+    def set_file(self, file_name: str, file_hash: str, pages: dict):
+        """`pages` maps str(page_number) -> {"hash": page_hash, "chunk_ids": [...]}"""
+        self.data["files"][file_name] = {"file_hash": file_hash, "pages": pages}
+
+    def content_key(self) -> str:
+        """
+        Identifies what the subject holds: the same files (by name and content hash) give
+        the same key in every session, and adding, changing or removing one gives a new key.
+        """
+        files = sorted((file_name, file_record["file_hash"]) for file_name, file_record in self.data["files"].items())
+        return hashlib.sha256(json.dumps(files).encode("utf-8")).hexdigest()
+
+    def all_chunk_ids(self):
+        return [
+            chunk_id
+            for file_record in self.data["files"].values()
+            for page_record in file_record["pages"].values()
+            for chunk_id in page_record["chunk_ids"]
+        ]
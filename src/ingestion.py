@@ -0,0 +1,303 @@
+# --- 1. Standard library imports ---
+import os
+
+# --- 2. Third-party imports ---
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+# --- 3. Local application imports ---
+from src import config, document_processor, shared_store, vector_store_manager
+from src.ingest_manifest import SubjectManifest, hash_stream, hash_text, make_chunk_id
+from src.instrumentation import record_count, span
+from src.near_duplicates import APPEARS_IN_KEY, NearDuplicateIndex, get_near_duplicate_index_path
+from src.store_janitor import get_janitor
+
+
+def _iter_changed_chunks(page_docs, file_name, old_pages, new_pages, stats, chunk_size=1000, chunk_overlap=200):
+    """
+    Yields chunks (with deterministic IDs) only for pages whose text changed since the
+    last ingest. Unchanged pages keep their existing chunk IDs in `new_pages`.
+    """
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for page_doc in page_docs:
+        page_key = str(page_doc.metadata["page"])
+        page_hash = hash_text(page_doc.page_content)
+        old_page = old_pages.get(page_key)
+
+        if old_page and old_page["hash"] == page_hash:
+            new_pages[page_key] = old_page
+            stats["pages_skipped"] += 1
+            continue
+
+        with span("split"):
+            chunks = text_splitter.split_documents([page_doc])
+        record_count("chunks_split", len(chunks))
+        for chunk_index, chunk in enumerate(chunks):
+            chunk.id = make_chunk_id(file_name, page_doc.metadata["page"], page_hash, chunk_index)
+        new_pages[page_key] = {"hash": page_hash, "chunk_ids": [chunk.id for chunk in chunks]}
+        stats["pages_embedded"] += 1
+        yield from chunks
+
+
+def _index_lexically(doc_batches, lexical_index):
+    """Passes batches through, adding each one to the BM25 index once it has been stored."""
+    for batch in doc_batches:
+        yield batch
+        with span("lexical_index.add"):
+            for doc in batch:
+                lexical_index.add(doc.id, doc.page_content)
+
+
+class IngestProgress:
+    """
+    Receives progress from ingest_pdf_stream and supplies its resume checkpoint.
+    This base class ignores progress and never resumes; background jobs override it.
+    """
+
+    def on_page_count(self, total_pages: int):
+        pass
+
+    def on_page_done(self):
+        pass
+
+    def stored_chunk_ids(self, file_hash: str):
+        """Chunk IDs an interrupted ingest of this exact file version already stored."""
+        return set()
+
+    def on_batch_stored(self, file_hash: str, chunk_ids):
+        pass
+
+
+def _iter_pages(pdf_stream, file_name, on_page_count):
+    """The PDF's pages. A PDF opened from disk (a staged ingest job) is parsed across processes."""
+    staged_path = getattr(pdf_stream, "name", None)
+    if config.PDF_PARSE_WORKERS > 1 and isinstance(staged_path, str) and os.path.isfile(staged_path):
+        return document_processor.iter_pdf_pages_parallel(
+            staged_path, file_name, on_page_count,
+            max_workers=config.PDF_PARSE_WORKERS,
+            pages_per_task=config.PDF_PARSE_PAGES_PER_TASK
+        )
+    return document_processor.iter_pdf_pages(pdf_stream, file_name, on_page_count)
+
+
+def _track_pages(page_docs, progress):
+    for page_doc in page_docs:
+        yield page_doc
+        progress.on_page_done()
+
+
+def _skip_stored(chunks, stored_ids, lexical_index, stats):
+    """Drops chunks stored by an interrupted run; they only need to be (re)indexed lexically."""
+    for chunk in chunks:
+        if chunk.id in stored_ids:
+            lexical_index.add(chunk.id, chunk.page_content)
+            stats["chunks_resumed"] += 1
+            continue
+        yield chunk
+
+
+def _checkpoint_batches(doc_batches, progress, file_hash):
+    """Passes batches through, checkpointing each one once it has been stored."""
+    for batch in doc_batches:
+        yield batch
+        progress.on_batch_stored(file_hash, [doc.id for doc in batch])
+
+
+def ingest_pdf_stream(subject_name: str, gemini_api_key: str, file_name: str, pdf_stream, embeddings_model=None,
+                      progress: IngestProgress = None):
+    """
+    Streams one PDF from an in-memory buffer into the subject's vector store.
+    Pages are parsed, chunked and embedded one batch at a time, so no temp file is
+    written and peak memory stays proportional to config.INGEST_STREAM_BATCH_SIZE.
+
+    The subject's ingest manifest makes this incremental: an identical file is skipped
+    without parsing, only changed pages are re-chunked and re-embedded, and chunks of
+    pages that changed or disappeared are deleted by ID. The subject's BM25 index is
+    updated in step with the vector store.
+
+    `progress` receives page and batch progress. In dedicated storage mode every stored
+    batch is checkpointed through it, so a re-run after an interruption skips chunks
+    that were already embedded and stored.
+    Returns a dict of ingestion statistics.
+    """
+    subject_db_path = vector_store_manager.get_subject_db_path(subject_name)
+    # The janitor must not reclaim the store while it is being written.
+    with get_janitor().lease(subject_db_path):
+        return _ingest_pdf_stream(
+            subject_name, gemini_api_key, file_name, pdf_stream, subject_db_path, embeddings_model,
+            progress if progress is not None else IngestProgress()
+        )
+
+
+def _ingest_pdf_stream(subject_name, gemini_api_key, file_name, pdf_stream, subject_db_path, embeddings_model, progress):
+    stats = {
+        "file_skipped": False, "pages_skipped": 0, "pages_embedded": 0,
+        "chunks_added": 0, "chunks_deleted": 0, "chunks_deduplicated": 0, "chunks_resumed": 0
+    }
+    manifest = SubjectManifest.load(subject_db_path)
+
+    # A subject keeps the storage mode it was created with.
+    if manifest.storage == "shared" or (config.SHARED_STORAGE_ENABLED and not os.path.exists(subject_db_path)):
+        return _ingest_pdf_stream_shared(
+            subject_name, gemini_api_key, file_name, pdf_stream, manifest, stats, embeddings_model, progress
+        )
+
+    with span("ingest.hash_file"):
+        file_hash = hash_stream(pdf_stream)
+    old_record = manifest.get_file(file_name)
+    if old_record and old_record["file_hash"] == file_hash:
+        stats["file_skipped"] = True
+        return stats
+
+    old_pages = old_record["pages"] if old_record else {}
+    new_pages = {}
+    lexical_index = vector_store_manager.load_lexical_index(subject_name)
+    changed_chunks = _iter_changed_chunks(
+        _track_pages(_iter_pages(pdf_stream, file_name, progress.on_page_count), progress),
+        file_name,
+        old_pages,
+        new_pages,
+        stats
+    )
+    near_duplicates = None
+    if config.NEAR_DUP_ENABLED:
+        # Near-duplicates of stored chunks are dropped here, before they are embedded.
+        near_duplicates = NearDuplicateIndex.load(get_near_duplicate_index_path(subject_db_path))
+        changed_chunks = near_duplicates.filter_chunks(changed_chunks, stats)
+    already_stored = progress.stored_chunk_ids(file_hash)
+    if already_stored:
+        changed_chunks = _skip_stored(changed_chunks, already_stored, lexical_index, stats)
+    vector_store, stats["chunks_added"] = vector_store_manager.add_document_batches(
+        subject_name,
+        gemini_api_key,
+        _checkpoint_batches(
+            _index_lexically(
+                document_processor.iter_batches(changed_chunks, config.INGEST_STREAM_BATCH_SIZE),
+                lexical_index
+            ),
+            progress,
+            file_hash
+        ),
+        embeddings_model=embeddings_model
+    )
+
+    # Delete only after the new chunks are in, so the subject is never left half-empty.
+    kept_ids = {chunk_id for page in new_pages.values() for chunk_id in page["chunk_ids"]}
+    stale_ids = [
+        chunk_id
+        for page in old_pages.values()
+        for chunk_id in page["chunk_ids"]
+        if chunk_id not in kept_ids
+    ]
+    if near_duplicates is not None:
+        # A stored chunk survives while any chunk it stands for still exists.
+        stale_ids = near_duplicates.release(stale_ids)
+        # Stored chunks list every place they stand for, including files ingested later.
+        vector_store_manager.update_chunk_metadata(
+            vector_store,
+            {chunk_id: {APPEARS_IN_KEY: places} for chunk_id, places in near_duplicates.changed_metadata().items()}
+        )
+    if stale_ids:
+        with span("vector_store.delete", chunks=len(stale_ids)):
+            vector_store.delete(ids=stale_ids)
+        for chunk_id in stale_ids:
+            lexical_index.remove(chunk_id)
+        stats["chunks_deleted"] = len(stale_ids)
+
+    with span("lexical_index.save"):
+        lexical_index.save()
+    if near_duplicates is not None:
+        near_duplicates.save()
+    record_count("chunks_deduplicated", stats["chunks_deduplicated"])
+
+    manifest.set_file(file_name, file_hash, new_pages)
+    manifest.bump_index_version()
+    record_count("pages_skipped", stats["pages_skipped"])
+    manifest.save()
+    return stats
+
+
+# --- SHARED STORAGE MODE ---
+
+def _iter_shared_chunks(page_docs, doc_hash, stats, chunk_size=1000, chunk_overlap=200):
+    """Yields content-addressed chunks tagged with the hash of the PDF they came from."""
+    text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    for page_doc in page_docs:
+        with span("split"):
+            chunks = text_splitter.split_documents([page_doc])
+        record_count("chunks_split", len(chunks))
+        for chunk_index, chunk in enumerate(chunks):
+            chunk.id = shared_store.make_shared_chunk_id(doc_hash, page_doc.metadata["page"], chunk_index)
+            chunk.metadata["doc_hash"] = doc_hash
+            # Other sessions may have named this PDF differently; their views show their own name.
+            chunk.metadata["source"] = shared_store.neutral_source_name(doc_hash)
+        stats["pages_embedded"] += 1
+        yield from chunks
+
+
+def _iter_stored_chunk_texts(store, doc_hash):
+    """Pages through one document's chunks in the shared store without embedding anything."""
+    offset = 0
+    while True:
+        page = store.get(
+            where={"doc_hash": doc_hash},
+            include=["documents"],
+            limit=config.INGEST_STREAM_BATCH_SIZE,
+            offset=offset
+        )
+        if not page["ids"]:
+            return
+        yield from zip(page["ids"], page["documents"])
+        offset += len(page["ids"])
+
+
+def _ingest_pdf_stream_shared(subject_name, gemini_api_key, file_name, pdf_stream, manifest, stats, embeddings_model, progress):
+    """
+    Shared-mode ingest: the PDF is embedded into the host-wide store only if no session
+    has stored the same content before; either way the subject's view (its manifest)
+    then references the document by hash.
+    """
+    if embeddings_model is None:
+        embeddings_model = vector_store_manager.get_embeddings_model(gemini_api_key)
+
+    with span("ingest.hash_file"):
+        doc_hash = hash_stream(pdf_stream)
+    old_record = manifest.get_file(file_name)
+    if old_record and old_record["file_hash"] == doc_hash:
+        stats["file_skipped"] = True
+        return stats
+
+    store = shared_store.open_shared_store(embeddings_model)
+    with shared_store.get_document_lock(doc_hash):
+        if not shared_store.is_document_stored(doc_hash):
+            page_docs = _track_pages(_iter_pages(pdf_stream, file_name, progress.on_page_count), progress)
+            chunks = _iter_shared_chunks(page_docs, doc_hash, stats)
+            for batch in document_processor.iter_batches(chunks, config.INGEST_STREAM_BATCH_SIZE):
+                with span("vector_store.add", chunks=len(batch)):
+                    store.add_documents(documents=batch)
+                record_count("chunks_stored", len(batch))
+                stats["chunks_added"] += len(batch)
+            shared_store.mark_document_stored(doc_hash, stats["chunks_added"])
+        else:
+            # Keeps the janitor from collecting the document before this view's manifest lists it.
+            shared_store.reference_document(doc_hash)
+
+    # The view keeps its own BM25 index, built from the stored chunk texts.
+    subject_db_path = vector_store_manager.get_subject_db_path(subject_name)
+    os.makedirs(subject_db_path, exist_ok=True)
+    lexical_index = vector_store_manager.load_lexical_index(subject_name)
+    still_referenced = {record["file_hash"] for name, record in manifest.data["files"].items() if name != file_name}
+    if old_record and old_record["file_hash"] not in still_referenced:
+        for chunk_id, _ in _iter_stored_chunk_texts(store, old_record["file_hash"]):
+            lexical_index.remove(chunk_id)
+            stats["chunks_deleted"] += 1
+    for chunk_id, text in _iter_stored_chunk_texts(store, doc_hash):
+        lexical_index.add(chunk_id, text)
+    with span("lexical_index.save"):
+        lexical_index.save()
+
+    manifest.set_storage("shared")
+    manifest.set_file(file_name, doc_hash, {})
+    manifest.bump_index_version()
+    record_count("pages_skipped", stats["pages_skipped"])
+    manifest.save()
+    return stats
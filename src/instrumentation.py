@@ -0,0 +1,345 @@
+# --- 1. Standard library imports ---
+import contextvars
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- 2. Third-party imports ---
+from langchain_core.callbacks import BaseCallbackHandler
+
+# --- 3. Local application imports ---
+from src import config
+
+# Metric names exported in Prometheus text format.
+STAGE_DURATION_METRIC = "course_companion_stage_duration_seconds"
+CACHE_REQUESTS_METRIC = "course_companion_cache_requests_total"
+ITEMS_METRIC = "course_companion_items_total"
+GATEWAY_REQUESTS_METRIC = "course_companion_gateway_requests_total"
+
+
+def _label_key(labels: dict):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_key, extra=()):
+    pairs = list(label_key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{_escape_label_value(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms, renderable in Prometheus text format."""
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or config.METRICS_DURATION_BUCKETS)
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def cache_hit_rates(self):
+        """Returns {cache name: {"hits", "misses", "hit_rate"}} from the cache request counters."""
+        rates = {}
+        with self._lock:
+            for (name, label_key), value in self._counters.items():
+                if name != CACHE_REQUESTS_METRIC:
+                    continue
+                labels = dict(label_key)
+                entry = rates.setdefault(labels["cache"], {"hits": 0, "misses": 0})
+                entry["hits" if labels["result"] == "hit" else "misses"] += value
+        for entry in rates.values():
+            total = entry["hits"] + entry["misses"]
+            entry["hit_rate"] = entry["hits"] / total if total else 0.0
+        return rates
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, dict(value, buckets=list(value["buckets"]))) for key, value in self._histograms.items())
+
+        typed = set()
+        for (name, label_key), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_format_labels(label_key)} {value}")
+        for (name, label_key), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for upper_bound, count in zip(self.buckets, histogram["buckets"]):
+                lines.append(f"{name}_bucket{_format_labels(label_key, [('le', str(upper_bound))])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(label_key, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(label_key)} {histogram['sum']}")
+            lines.append(f"{name}_count{_format_labels(label_key)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestTrace:
+    """
+    The per-stage breakdown of one user-facing request (an upload, a question, ...).
+    Spans are aggregated by stage, so a stage that runs once per page or per batch
+    shows up as one row with a count.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.time()
+        self.total_seconds = None
+        self.stages = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += seconds
+
+    def add_count(self, name: str, value: float):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "request": self.name,
+                "started_at": self.started_at,
+                "total_seconds": self.total_seconds,
+                "stages": {stage: dict(entry) for stage, entry in self.stages.items()},
+                "counts": dict(self.counts),
+            }
+
+
+_metrics = MetricsRegistry()
+_current_trace = contextvars.ContextVar("course_companion_trace", default=None)
+
+
+def get_metrics() -> MetricsRegistry:
+    """Returns the process-wide metrics registry."""
+    return _metrics
+
+
+def _log_event(event: dict):
+    if config.METRICS_STRUCTURED_LOGS:
+        print(json.dumps(event, default=str))
+
+
+@contextmanager
+def trace_request(name: str):
+    """Collects every span recorded inside the block (in this context) into a RequestTrace."""
+    trace = RequestTrace(name)
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.total_seconds = time.perf_counter() - start
+        _current_trace.reset(token)
+        record_span(f"request.{name}", trace.total_seconds)
+        _log_event({"event": "request", **trace.to_dict()})
+
+
+def record_span(stage: str, seconds: float, **attributes):
+    """Records a finished span in the metrics registry, the current trace and the log."""
+    _metrics.observe(STAGE_DURATION_METRIC, seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(stage, seconds)
+    _log_event({"event": "span", "stage": stage, "seconds": seconds, **attributes})
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """
+    Times the block as one span of `stage`. The yielded dict can be filled with extra
+    attributes (e.g. chunk counts) that are logged with the span.
+    """
+    start = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        record_span(stage, time.perf_counter() - start, **attributes)
+
+
+def timed(stage: str):
+    """Decorator form of span()."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_count(name: str, value: float, **labels):
+    """Counts processed items (pages, chunks, tokens, ...) globally and on the current trace."""
+    if not value:
+        return
+    _metrics.increment(ITEMS_METRIC, value, item=name, **labels)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_count(name, value)
+
+
+def record_cache_access(cache: str, hits: int = 0, misses: int = 0):
+    if hits:
+        _metrics.increment(CACHE_REQUESTS_METRIC, hits, cache=cache, result="hit")
+    if misses:
+        _metrics.increment(CACHE_REQUESTS_METRIC, misses, cache=cache, result="miss")
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_count(f"{cache}_cache_hits", hits)
+        trace.add_count(f"{cache}_cache_misses", misses)
+
+
+# --- LANGCHAIN CALLBACKS ---
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Times retrieval and LLM generation inside any chain it is passed to, including
+    time to first streamed token, and counts retrieved documents and LLM tokens.
+    """
+
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, kind):
+        with self._lock:
+            self._runs[run_id] = {"kind": kind, "start": time.perf_counter(), "first_token": None, "streamed": 0}
+
+    def _finish(self, run_id):
+        with self._lock:
+            return self._runs.pop(run_id, None)
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, "retrieval")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        run = self._finish(run_id)
+        if run:
+            record_span("retrieval", time.perf_counter() - run["start"], documents=len(documents))
+            record_count("retrieved_documents", len(documents))
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "llm")
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return
+            run["streamed"] += 1
+            first_token = run["first_token"] is None
+            if first_token:
+                run["first_token"] = time.perf_counter()
+        if first_token:
+            record_span("llm_first_token", run["first_token"] - run["start"])
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._finish(run_id)
+        if not run:
+            return
+        input_tokens, output_tokens = 0, 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        if not output_tokens:
+            # Not every provider reports usage; fall back to the streamed chunk count.
+            output_tokens = run["streamed"]
+        record_span("llm_generation", time.perf_counter() - run["start"],
+                    input_tokens=input_tokens, output_tokens=output_tokens)
+        record_count("llm_input_tokens", input_tokens)
+        record_count("llm_output_tokens", output_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id)
+        _metrics.increment("course_companion_llm_errors_total", error_type=type(error).__name__)
+
+
+_callback_handler = MetricsCallbackHandler()
+
+
+def get_callback_handler() -> MetricsCallbackHandler:
+    """Returns the process-wide LangChain callback handler (it is stateless between runs)."""
+    return _callback_handler
+
+
+# --- PROMETHEUS ENDPOINT ---
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = _metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the app's output.
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int = None, host: str = None):
+    """Serves /metrics on a daemon thread (idempotent). Does nothing if no port is configured."""
+    global _server
+    port = port or config.METRICS_SERVER_PORT
+    host = host or config.METRICS_SERVER_HOST
+    if not port:
+        return None
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+            except OSError as e:
+                print(f"WARNING: Could not start metrics server on {host}:{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
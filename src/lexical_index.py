@@ -0,0 +1,116 @@
+# --- 1. Standard library imports ---
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+# Keeps engineering tokens such as "r-134a", "6061-t6" or "k_eff" in one piece.
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+# Function words that mark a query as a natural-language question rather than keywords.
+STOP_WORDS = frozenset(
+    "a an and are as at be by can do does explain for from how i in is it of on or the "
+    "to was what when where which who why will with".split()
+)
+
+
+def tokenize(text: str):
+    """Lower-cases text and splits it into BM25 terms."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def get_lexical_index_path(subject_db_path: str) -> str:
+    """The lexical index is persisted next to (not inside) the subject's Chroma directory."""
+    return f"{subject_db_path}_bm25.json"
+
+
+class BM25Index:
+    """
+    A compact in-process inverted index scored with Okapi BM25.
+    Documents are keyed by the same chunk IDs used in the vector store, so results
+    can be fetched from the store without an embedding call. Only per-document term
+    counts are persisted; the postings lists are rebuilt in memory on load.
+    """
+
+    def __init__(self, path: str = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._doc_terms = {}
+        self._doc_lengths = {}
+        self._postings = defaultdict(dict)
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def add(self, doc_id: str, text: str):
+        if doc_id in self._doc_terms:
+            self.remove(doc_id)
+        term_counts = dict(Counter(tokenize(text)))
+        self._index_terms(doc_id, term_counts)
+
+    def _index_terms(self, doc_id, term_counts):
+        self._doc_terms[doc_id] = term_counts
+        self._doc_lengths[doc_id] = sum(term_counts.values())
+        self._total_length += self._doc_lengths[doc_id]
+        for term, count in term_counts.items():
+            self._postings[term][doc_id] = count
+
+    def remove(self, doc_id: str):
+        term_counts = self._doc_terms.pop(doc_id, None)
+        if term_counts is None:
+            return
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        for term in term_counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def has_terms(self, terms) -> bool:
+        """True if every term occurs in at least one indexed document."""
+        return all(term in self._postings for term in terms)
+
+    def search(self, query: str, k: int = 4):
+        """Returns up to k (doc_id, score) pairs, best first."""
+        doc_count = len(self._doc_terms)
+        if doc_count == 0:
+            return []
+        average_length = (self._total_length / doc_count) or 1.0
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, term_frequency in postings.items():
+                doc_length_ratio = self._doc_lengths[doc_id] / average_length
+                norm = term_frequency + self.k1 * (1 - self.b + self.b * doc_length_ratio)
+                scores[doc_id] += idf * term_frequency * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self):
+        """Writes the index atomically to its path."""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "doc_terms": self._doc_terms}, f, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Loads the index at `path`, or returns an empty index bound to it."""
+        if not os.path.exists(path):
+            return cls(path)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Ignoring unreadable lexical index {path}: {e}")
+            return cls(path)
+        index = cls(path, k1=data["k1"], b=data["b"])
+        for doc_id, term_counts in data["doc_terms"].items():
+            index._index_terms(doc_id, term_counts)
+        return index
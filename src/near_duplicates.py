@@ -0,0 +1,224 @@
+# --- 1. Standard library imports ---
+import base64
+import hashlib
+import json
+import os
+import re
+import zlib
+
+# --- 2. Third-party imports ---
+import numpy as np
+
+# --- 3. Local application imports ---
+from src import config
+from src.instrumentation import span
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Metadata key on a stored chunk listing every (source, page) it stands for, as JSON.
+APPEARS_IN_KEY = "appears_in"
+
+
+def get_near_duplicate_index_path(subject_db_path: str) -> str:
+    """The near-duplicate index is persisted next to (not inside) the subject's store."""
+    return f"{subject_db_path}_dedup.json"
+
+
+def _permutations(num_perm: int):
+    # Fixed seed: signatures are persisted, so every process must use the same hash family.
+    rng = np.random.RandomState(1)
+    a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def _shingle_hashes(text: str, size: int) -> np.ndarray:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64)
+
+
+def minhash_signature(text: str, num_perm: int = None, shingle_words: int = None) -> np.ndarray:
+    """
+    MinHash signature of the text's word shingles. The fraction of equal positions in two
+    signatures estimates the Jaccard similarity of the two texts' shingle sets.
+    """
+    num_perm = num_perm or config.NEAR_DUP_NUM_PERM
+    a, b = _permutations(num_perm)
+    hashes = _shingle_hashes(text, shingle_words or config.NEAR_DUP_SHINGLE_WORDS)
+    # a, b and the shingle hashes are all below 2**32, so a * h + b cannot overflow.
+    permuted = ((np.outer(hashes, a) + b) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def appears_in(metadata: dict):
+    """[(source, page)] of every chunk a stored chunk stands for, read from its metadata."""
+    return [tuple(place) for place in json.loads(metadata.get(APPEARS_IN_KEY) or "[]")]
+
+
+class NearDuplicateIndex:
+    """
+    MinHash signatures of a subject's stored chunks, bucketed by LSH bands so a new
+    chunk is compared only with the few stored chunks that share a band with it.
+
+    A chunk whose estimated Jaccard similarity to a stored chunk reaches the threshold is
+    not embedded or stored; it becomes a reference of that stored ("canonical") chunk
+    instead. Every canonical chunk keeps the (chunk ID, source, page) of all chunks it
+    stands for, and is only deleted from the store once none of them is left. Canonical
+    chunks whose references changed are listed by changed_metadata(), so the caller can
+    write the places they appear in into the store.
+    """
+
+    def __init__(self, path: str = None, num_perm: int = None, bands: int = None, threshold: float = None):
+        self.path = path
+        self.num_perm = num_perm or config.NEAR_DUP_NUM_PERM
+        self.bands = bands or config.NEAR_DUP_BANDS
+        self.threshold = threshold or config.NEAR_DUP_THRESHOLD
+        self.rows_per_band = self.num_perm // self.bands
+        self._signatures = {}  # canonical chunk ID -> signature
+        self._references = {}  # canonical chunk ID -> [[chunk ID, source, page]]
+        self._canonical_of = {}  # any referenced chunk ID -> canonical chunk ID
+        self._buckets = [{} for _ in range(self.bands)]
+        self._changed = set()  # canonical chunk IDs whose references changed since loading
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            rows = signature[band * self.rows_per_band:(band + 1) * self.rows_per_band]
+            yield band, hashlib.blake2b(rows.tobytes(), digest_size=8).hexdigest()
+
+    def _index_signature(self, chunk_id: str, signature: np.ndarray):
+        self._signatures[chunk_id] = signature
+        for band, key in self._band_keys(signature):
+            self._buckets[band].setdefault(key, set()).add(chunk_id)
+
+    def _unindex_signature(self, chunk_id: str):
+        signature = self._signatures.pop(chunk_id)
+        for band, key in self._band_keys(signature):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(chunk_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def find_duplicate(self, signature: np.ndarray):
+        """The canonical chunk ID most similar to `signature` at or above the threshold, or None."""
+        candidates = set()
+        for band, key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(key, ()))
+        best_id, best_similarity = None, self.threshold
+        for candidate_id in candidates:
+            similarity = float(np.mean(self._signatures[candidate_id] == signature))
+            if similarity >= best_similarity:
+                best_id, best_similarity = candidate_id, similarity
+        return best_id
+
+    def canonical_id(self, chunk_id: str) -> str:
+        """The ID of the stored chunk that stands for `chunk_id` (itself if it was not merged)."""
+        return self._canonical_of.get(chunk_id, chunk_id)
+
+    def references(self, chunk_id: str):
+        """[(chunk ID, source, page)] of every chunk the stored chunk `chunk_id` stands for."""
+        canonical_id = self.canonical_id(chunk_id)
+        return [tuple(reference) for reference in self._references.get(canonical_id, [])]
+
+    def _add_reference(self, canonical_id: str, chunk_id: str, source, page):
+        self._references.setdefault(canonical_id, []).append([chunk_id, source, page])
+        self._canonical_of[chunk_id] = canonical_id
+
+    def filter_chunks(self, chunks, stats):
+        """
+        Passes through chunks that need to be stored and absorbs near-duplicates of chunks
+        already stored (or passed through earlier in the same ingest) as references.
+        """
+        for chunk in chunks:
+            source, page = os.path.basename(chunk.metadata.get("source", "Unknown")), chunk.metadata.get("page")
+            canonical_id = self._canonical_of.get(chunk.id)
+            if canonical_id == chunk.id:
+                yield chunk  # Already stored under this ID; re-adding is an upsert.
+                continue
+            if canonical_id is not None:
+                continue  # Already recorded as a near-duplicate.
+
+            with span("near_duplicates.check"):
+                signature = minhash_signature(chunk.page_content, self.num_perm)
+                duplicate_of = self.find_duplicate(signature)
+            if duplicate_of is not None:
+                self._add_reference(duplicate_of, chunk.id, source, page)
+                self._changed.add(duplicate_of)
+                stats["chunks_deduplicated"] += 1
+                continue
+            self._index_signature(chunk.id, signature)
+            self._add_reference(chunk.id, chunk.id, source, page)
+            yield chunk
+
+    def release(self, chunk_ids):
+        """
+        Drops references to chunks that no longer exist in their document and returns the
+        IDs to delete from the store: canonical chunks left with no references, plus
+        chunks this index never tracked (stored before deduplication was enabled).
+        """
+        to_delete = []
+        for chunk_id in chunk_ids:
+            canonical_id = self._canonical_of.pop(chunk_id, None)
+            if canonical_id is None:
+                to_delete.append(chunk_id)
+                continue
+            remaining = [ref for ref in self._references[canonical_id] if ref[0] != chunk_id]
+            if remaining:
+                self._references[canonical_id] = remaining
+                self._changed.add(canonical_id)
+            else:
+                del self._references[canonical_id]
+                self._unindex_signature(canonical_id)
+                self._changed.discard(canonical_id)
+                to_delete.append(canonical_id)
+        return to_delete
+
+    def changed_metadata(self):
+        """{canonical chunk ID: APPEARS_IN_KEY value} for every stored chunk whose references changed."""
+        return {
+            chunk_id: json.dumps([[source, page] for _, source, page in self._references[chunk_id]])
+            for chunk_id in sorted(self._changed)
+        }
+
+    def save(self):
+        """Writes the index atomically to its path."""
+        entries = {
+            chunk_id: {
+                "signature": base64.b64encode(signature.tobytes()).decode("ascii"),
+                "references": self._references.get(chunk_id, []),
+            }
+            for chunk_id, signature in self._signatures.items()
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"num_perm": self.num_perm, "bands": self.bands, "entries": entries}, f, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    @classmethod
+    def load(cls, path: str):
+        """Loads the index at `path`, or returns an empty index bound to it."""
+        index = cls(path)
+        if not os.path.exists(path):
+            return index
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Ignoring unreadable near-duplicate index {path}: {e}")
+            return index
+        if data["num_perm"] != index.num_perm or data["bands"] != index.bands:
+            print(f"WARNING: Near-duplicate index {path} uses other MinHash settings; starting a new one.")
+            return index
+        for chunk_id, entry in data["entries"].items():
+            index._index_signature(chunk_id, np.frombuffer(base64.b64decode(entry["signature"]), dtype=np.uint32))
+            for reference_id, source, page in entry["references"]:
+                index._add_reference(chunk_id, reference_id, source, page)
+        return index
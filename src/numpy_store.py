@@ -0,0 +1,450 @@
+# --- 1. Standard library imports ---
+import json
+import os
+import tempfile
+import threading
+import uuid
+
+# --- 2. Third-party imports ---
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+# --- 3. Local application imports ---
+from src import config
+
+CHUNKS_FILE_NAME = "chunks.json"
+SEGMENT_PREFIX = "segment-"
+
+
+def is_numpy_store(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, CHUNKS_FILE_NAME))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _matches(metadata: dict, where: dict) -> bool:
+    """Chroma-style metadata filter supporting equality, $in and $and."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(_matches(metadata, sub_filter) for sub_filter in condition):
+                return False
+        elif isinstance(condition, dict) and "$in" in condition:
+            if metadata.get(key) not in condition["$in"]:
+                return False
+        elif isinstance(condition, dict) and "$eq" in condition:
+            if metadata.get(key) != condition["$eq"]:
+                return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+class _Segment:
+    """
+    One immutable block of rows, written once and never modified: its embedding matrix
+    (plus per-row scales for int8) in .npy files and its chunk IDs, texts and metadata
+    in a JSON file. Rows are deleted by listing them in the store manifest, not here.
+    """
+
+    def __init__(self, directory: str, name: str, dtype: str):
+        self.name = name
+        with open(os.path.join(directory, f"{name}.json"), "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        self.ids = chunks["ids"]
+        self.texts = chunks["texts"]
+        self.metadatas = chunks["metadatas"]
+        # Memory-mapped, so opening a subject reads nothing until it is searched.
+        self.vectors = np.load(os.path.join(directory, f"{name}.vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(directory, f"{name}.scales.npy"), mmap_mode="r") if dtype == "int8" else None
+        self._float32_rows = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _dequantize(self, block: np.ndarray, scales) -> np.ndarray:
+        block = np.asarray(block, dtype=np.float32)
+        if scales is not None:
+            block *= np.asarray(scales, dtype=np.float32)[:, None]
+        return block
+
+    def rows_as_float32(self, start: int, end: int) -> np.ndarray:
+        return self._dequantize(self.vectors[start:end], None if self.scales is None else self.scales[start:end])
+
+    def take_rows_as_float32(self, rows) -> np.ndarray:
+        return self._dequantize(self.vectors[rows], None if self.scales is None else self.scales[rows])
+
+    def cached_float32_rows(self) -> np.ndarray:
+        if self._float32_rows is None:
+            self._float32_rows = self.rows_as_float32(0, len(self))
+        return self._float32_rows
+
+
+class _Snapshot:
+    """
+    One immutable version of the store: the segments listed in the manifest, minus the
+    rows it marks deleted. Rows are numbered across segments in manifest order.
+    Segments already loaded by `previous` are reused, so picking up a write only reads
+    the segments it added.
+    """
+
+    def __init__(self, directory: str, previous=None):
+        manifest_path = os.path.join(directory, CHUNKS_FILE_NAME)
+        self.mtime_ns = os.stat(manifest_path).st_mtime_ns
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.dtype = manifest["dtype"]
+        self.entries = manifest["segments"]
+        loaded = {segment.name: segment for segment in previous.segments} if previous is not None else {}
+        self.segments = [loaded.get(entry["name"]) or _Segment(directory, entry["name"], self.dtype) for entry in self.entries]
+
+        self.offsets = []
+        self.ids, self.texts, self.metadatas = [], [], []
+        deleted_rows = []
+        for entry, segment in zip(self.entries, self.segments):
+            offset = len(self.ids)
+            self.offsets.append(offset)
+            self.ids.extend(segment.ids)
+            self.texts.extend(segment.texts)
+            self.metadatas.extend(segment.metadatas)
+            deleted_rows.extend(offset + row for row in entry["deleted"])
+        self.live = np.ones(len(self.ids), dtype=bool)
+        self.live[deleted_rows] = False
+        self.live_rows = np.flatnonzero(self.live).tolist()
+        self.row_of = {self.ids[row]: row for row in self.live_rows}
+
+    def __len__(self):
+        return len(self.live_rows)
+
+    def segment_rows(self, rows):
+        """Yields (segment index, positions in `rows`, rows within that segment) for global row numbers."""
+        rows = np.asarray(rows, dtype=np.int64)
+        segment_of = np.searchsorted(self.offsets, rows, side="right") - 1
+        for index, offset in enumerate(self.offsets):
+            positions = np.flatnonzero(segment_of == index)
+            if len(positions):
+                yield index, positions, rows[positions] - offset
+
+    def take_rows_as_float32(self, rows) -> np.ndarray:
+        dimension = self.segments[0].vectors.shape[1] if self.segments else 0
+        block = np.empty((len(rows), dimension), dtype=np.float32)
+        for index, positions, segment_rows in self.segment_rows(rows):
+            block[positions] = self.segments[index].take_rows_as_float32(segment_rows)
+        return block
+
+    def scores(self, query_vector: np.ndarray) -> np.ndarray:
+        """
+        Cosine scores of every row (-inf for deleted ones). Segments keep a dequantized
+        float32 copy while the whole store fits config.NUMPY_SEARCH_CACHE_MB, since
+        dequantizing per query costs far more than the dot product itself; larger stores
+        are scanned block by block.
+        """
+        scores = np.full(len(self.ids), -np.inf, dtype=np.float32)
+        cache_rows = sum(segment.vectors.size for segment in self.segments) * 4 <= config.NUMPY_SEARCH_CACHE_MB * 1024 * 1024
+        block_rows = config.NUMPY_SEARCH_BLOCK_ROWS
+        for offset, segment in zip(self.offsets, self.segments):
+            if cache_rows:
+                scores[offset:offset + len(segment)] = segment.cached_float32_rows() @ query_vector
+                continue
+            for start in range(0, len(segment), block_rows):
+                end = min(start + block_rows, len(segment))
+                scores[offset + start:offset + end] = segment.rows_as_float32(start, end) @ query_vector
+        scores[~self.live] = -np.inf
+        return scores
+
+    def document(self, row: int) -> Document:
+        return Document(id=self.ids[row], page_content=self.texts[row], metadata=dict(self.metadatas[row]))
+
+
+def _open_snapshot(directory: str, previous=None) -> _Snapshot:
+    # A writer may delete a merged-away segment between reading the manifest and loading
+    # it; the manifest then already names the new segments, so simply retry.
+    for _ in range(2):
+        try:
+            return _Snapshot(directory, previous)
+        except FileNotFoundError:
+            continue
+    return _Snapshot(directory, previous)
+
+
+def _quantize(vectors: np.ndarray, dtype: str):
+    """Unit-normalized float32 rows as stored: (float16 rows, None) or (int8 rows, per-row scales)."""
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors.astype(np.float16), None
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    A dependency-light exact-search vector store for one subject.
+    Unit-normalized embeddings are kept as float16 (or int8 plus per-row scale) matrices
+    in .npy files that are memory-mapped on open; chunk IDs, texts and metadata live in
+    JSON beside them. Search is a blocked, vectorized dot product over every row, so
+    results are exact cosine top-k. Every score this store returns is a cosine
+    similarity (higher is better), unlike Chroma's distances (lower is better).
+
+    The store is log-structured: each write adds one immutable segment, and deletes (and
+    the old rows of re-added IDs) are only marked in the manifest. A write therefore
+    costs time proportional to its own batch, not to the store. Whenever the newest
+    segment holds at least half as many live rows as the one before it, the two are
+    merged, so a store has O(log N) segments and every row is rewritten O(log N) times
+    over a batched ingest. Segments that are more than half deleted are rewritten.
+    """
+
+    def __init__(self, persist_directory: str, embedding_function, dtype: str = None):
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        self._write_lock = threading.Lock()
+        os.makedirs(persist_directory, exist_ok=True)
+        if not is_numpy_store(persist_directory):
+            self._write_manifest(dtype or config.NUMPY_STORE_DTYPE, [])
+        self._loaded_snapshot = _open_snapshot(persist_directory)
+
+    @property
+    def _snapshot(self) -> _Snapshot:
+        """The latest version on disk; picks up writes made through other instances (e.g. an ingest)."""
+        snapshot = self._loaded_snapshot
+        try:
+            changed = os.stat(os.path.join(self.persist_directory, CHUNKS_FILE_NAME)).st_mtime_ns != snapshot.mtime_ns
+        except OSError:
+            return snapshot
+        if changed:
+            snapshot = self._loaded_snapshot = _open_snapshot(self.persist_directory, snapshot)
+        return snapshot
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    # --- persistence ---
+
+    def _write_segment(self, ids, texts, metadatas, vectors: np.ndarray, scales) -> dict:
+        """Writes a new segment's files and returns its manifest entry."""
+        name = f"{SEGMENT_PREFIX}{uuid.uuid4().hex}"
+        np.save(os.path.join(self.persist_directory, f"{name}.vectors.npy"), vectors)
+        if scales is not None:
+            np.save(os.path.join(self.persist_directory, f"{name}.scales.npy"), scales)
+        with open(os.path.join(self.persist_directory, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump({"ids": list(ids), "texts": list(texts), "metadatas": list(metadatas)}, f)
+        return {"name": name, "rows": len(ids), "deleted": []}
+
+    def _rewrite_segments(self, segments, entries) -> dict:
+        """Copies the live rows of several segments, still quantized, into one new segment."""
+        ids, texts, metadatas, vector_parts, scale_parts = [], [], [], [], []
+        for segment, entry in zip(segments, entries):
+            deleted = set(entry["deleted"])
+            rows = [row for row in range(len(segment)) if row not in deleted]
+            ids.extend(segment.ids[row] for row in rows)
+            texts.extend(segment.texts[row] for row in rows)
+            metadatas.extend(segment.metadatas[row] for row in rows)
+            vector_parts.append(np.asarray(segment.vectors[rows]))
+            if segment.scales is not None:
+                scale_parts.append(np.asarray(segment.scales[rows]))
+        scales = np.concatenate(scale_parts) if scale_parts else None
+        return self._write_segment(ids, texts, metadatas, np.concatenate(vector_parts), scales)
+
+    def _write_manifest(self, dtype: str, entries, obsolete=()):
+        """
+        Swaps in a new version. Segment files are written first and the manifest is
+        replaced last, so that swap is the single commit point. Then the files of the
+        `obsolete` segments (the ones this commit merged or dropped) are deleted; segments
+        another instance may be writing right now are never touched.
+        """
+        descriptor, temp_manifest_path = tempfile.mkstemp(
+            dir=self.persist_directory, prefix=f"{CHUNKS_FILE_NAME}.", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+                json.dump({"dtype": dtype, "segments": entries}, f)
+            os.replace(temp_manifest_path, os.path.join(self.persist_directory, CHUNKS_FILE_NAME))
+        except BaseException:
+            try:
+                os.remove(temp_manifest_path)
+            except OSError:
+                pass
+            raise
+
+        # Open memory maps of deleted segments keep working on POSIX.
+        for name in obsolete:
+            for suffix in (".vectors.npy", ".scales.npy", ".json"):
+                try:
+                    os.remove(os.path.join(self.persist_directory, name + suffix))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"WARNING: Could not remove merged segment file {name}{suffix}: {e}")
+
+    def _commit(self, snapshot: _Snapshot, entries, segments):
+        """Compacts the given segment list (parallel to `entries`), writes it and reloads."""
+        entries, segments = list(entries), list(segments)
+        obsolete = []
+
+        def live(entry):
+            return entry["rows"] - len(entry["deleted"])
+
+        # Fully deleted segments are dropped; mostly deleted ones are rewritten.
+        for i in reversed(range(len(entries))):
+            if not live(entries[i]):
+                obsolete.append(entries[i]["name"])
+                del entries[i], segments[i]
+            elif len(entries[i]["deleted"]) * 2 > entries[i]["rows"]:
+                obsolete.append(entries[i]["name"])
+                entries[i] = self._rewrite_segments([segments[i]], [entries[i]])
+                segments[i] = _Segment(self.persist_directory, entries[i]["name"], snapshot.dtype)
+        # Size-tiered merging keeps segments growing geometrically from newest to oldest.
+        while len(entries) > 1 and live(entries[-1]) * 2 >= live(entries[-2]):
+            obsolete.extend(entry["name"] for entry in entries[-2:])
+            merged = self._rewrite_segments(segments[-2:], entries[-2:])
+            entries[-2:] = [merged]
+            segments[-2:] = [_Segment(self.persist_directory, merged["name"], snapshot.dtype)]
+
+        self._write_manifest(snapshot.dtype, entries, obsolete)
+        self._loaded_snapshot = _open_snapshot(self.persist_directory, snapshot)
+
+    def _entries_without(self, snapshot: _Snapshot, removed_ids):
+        """Manifest entries with every live row of `removed_ids` marked deleted."""
+        entries = [dict(entry, deleted=list(entry["deleted"])) for entry in snapshot.entries]
+        removed_rows = [snapshot.row_of[chunk_id] for chunk_id in removed_ids if chunk_id in snapshot.row_of]
+        for index, _, segment_rows in snapshot.segment_rows(removed_rows):
+            entries[index]["deleted"].extend(segment_rows.tolist())
+        return entries, len(removed_rows)
+
+    # --- writes ---
+
+    def add_texts(self, texts, metadatas=None, *, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        return self.add_embeddings(texts, self.embedding_function.embed_documents(texts), metadatas, ids=ids)
+
+    def add_embeddings(self, texts, embeddings, metadatas=None, *, ids=None):
+        """Adds texts with precomputed embeddings (e.g. from a subject snapshot); nothing is embedded."""
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = [dict(m or {}) for m in metadatas] if metadatas else [{} for _ in texts]
+        ids = [chunk_id or str(uuid.uuid4()) for chunk_id in ids] if ids else [str(uuid.uuid4()) for _ in texts]
+        # Within one call the last occurrence of an ID wins, like an upsert.
+        last_row = {chunk_id: row for row, chunk_id in enumerate(ids)}
+        rows = sorted(last_row.values())
+        vectors = _normalize_rows(np.asarray(embeddings, dtype=np.float32)[rows])
+
+        with self._write_lock:
+            snapshot = self._snapshot
+            # Re-adding an ID replaces the old row, like an upsert.
+            entries, _ = self._entries_without(snapshot, last_row)
+            quantized, scales = _quantize(vectors, snapshot.dtype)
+            new_entry = self._write_segment(
+                [ids[row] for row in rows], [texts[row] for row in rows], [metadatas[row] for row in rows],
+                quantized, scales
+            )
+            new_segment = _Segment(self.persist_directory, new_entry["name"], snapshot.dtype)
+            self._commit(snapshot, entries + [new_entry], snapshot.segments + [new_segment])
+        return ids
+
+    def delete(self, ids=None, **kwargs):
+        if not ids:
+            return False
+        with self._write_lock:
+            snapshot = self._snapshot
+            entries, removed = self._entries_without(snapshot, set(ids))
+            if removed:
+                self._commit(snapshot, entries, snapshot.segments)
+        return True
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, *, ids=None, persist_directory=None, **kwargs):
+        store = cls(persist_directory, embedding, dtype=kwargs.get("dtype"))
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
+
+    # --- reads ---
+
+    def get_by_ids(self, ids, /):
+        snapshot = self._snapshot
+        return [snapshot.document(snapshot.row_of[chunk_id]) for chunk_id in ids if chunk_id in snapshot.row_of]
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas"), **kwargs):
+        """Chroma-style get(), so code that pages through a subject's chunks works with either backend."""
+        snapshot = self._snapshot
+        if ids is not None:
+            rows = [snapshot.row_of[chunk_id] for chunk_id in ids if chunk_id in snapshot.row_of]
+        else:
+            rows = snapshot.live_rows
+        if where:
+            rows = [row for row in rows if _matches(snapshot.metadatas[row], where)]
+        rows = list(rows)[offset or 0:]
+        if limit is not None:
+            rows = rows[:limit]
+        return {
+            "ids": [snapshot.ids[row] for row in rows],
+            "documents": [snapshot.texts[row] for row in rows] if "documents" in include else None,
+            "metadatas": [snapshot.metadatas[row] for row in rows] if "metadatas" in include else None,
+            "embeddings": snapshot.take_rows_as_float32(rows) if "embeddings" in include and rows else None,
+        }
+
+    def _top_rows(self, embedding, k: int, filter=None):
+        snapshot = self._snapshot
+        if not len(snapshot):
+            return snapshot, [], None
+        query_vector = _normalize_rows(np.asarray([embedding], dtype=np.float32))[0]
+        scores = snapshot.scores(query_vector)
+        if filter:
+            mask = np.array([_matches(metadata, filter) for metadata in snapshot.metadatas])
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return snapshot, [], scores
+        top = np.argpartition(-scores, k - 1)[:k]
+        return snapshot, top[np.argsort(-scores[top])].tolist(), scores
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        snapshot, rows, scores = self._top_rows(embedding, k, filter)
+        return [(snapshot.document(row), float(scores[row])) for row in rows]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None, **kwargs):
+        """
+        Returns [(document, cosine similarity)], best first: HIGHER scores are better.
+        This is the opposite convention to Chroma, whose method of the same name returns
+        squared L2 distances (lower is better); callers mixing backends must normalize
+        (see cross_subject_retriever._cosine_relevance_fn).
+        """
+        return self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        return self.similarity_search_with_score_by_vector(self.embedding_function.embed_query(query), k=k, filter=filter)
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are cosine similarities in [-1, 1]; map them onto [0, 1].
+        return lambda score: (score + 1.0) / 2.0
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k=4, fetch_k=20, lambda_mult=0.5, filter=None, **kwargs):
+        snapshot, rows, _ = self._top_rows(embedding, fetch_k, filter)
+        if not rows:
+            return []
+        candidates = snapshot.take_rows_as_float32(rows)
+        selected = maximal_marginal_relevance(
+            np.asarray(embedding, dtype=np.float32), candidates, lambda_mult=lambda_mult, k=k
+        )
+        return [snapshot.document(rows[i]) for i in selected]
+
+    def max_marginal_relevance_search(self, query, k=4, fetch_k=20, lambda_mult=0.5, filter=None, **kwargs):
+        return self.max_marginal_relevance_search_by_vector(
+            self.embedding_function.embed_query(query), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter
+        )
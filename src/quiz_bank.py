@@ -0,0 +1,175 @@
+# --- 1. Standard library imports ---
+import json
+import os
+import re
+import threading
+
+# --- 2. Local application imports ---
+from src import config
+from src.ingest_manifest import hash_text
+
+_OPTION_PATTERN = re.compile(r"^\s*([A-D])\)\s*(.+?)\s*$")
+_ANSWER_PATTERN = re.compile(r"Answer:\s*\[?([A-D])\]?")
+_SOURCE_PATTERN = re.compile(r"\[?SOURCE (\d+)\]?")
+
+
+def get_question_bank_path(subject_db_path: str) -> str:
+    """The question bank is persisted next to (not inside) the subject's Chroma directory."""
+    return f"{subject_db_path}_quiz_bank.json"
+
+
+def get_chunk_key(doc) -> str:
+    """The bank key for a source chunk: its store ID, or a content hash for chunks stored without one."""
+    return doc.id or hash_text(doc.page_content)[:32]
+
+
+def make_snippet(text: str, num_words: int = 20) -> str:
+    cleaned_content = re.sub(r'[^a-zA-Z0-9\s.,()-]+', '', text)
+    snippet_words = re.sub(r'\s+', ' ', cleaned_content).strip().split()[:num_words]
+    return " ".join(snippet_words) + "..." if snippet_words else ""
+
+
+def parse_quiz_text(quiz_text: str, source_docs):
+    """
+    Parses LLM output in rag_chain_builder.QUIZ_PROMPT_TEMPLATE's format into question records.
+    Each record is tied to the chunk its "Source: [SOURCE n]" line cites; malformed
+    questions and questions citing an unknown source are dropped.
+    """
+    questions = []
+    for block in quiz_text.split("Q:")[1:]:
+        lines = [line for line in block.strip().splitlines() if line.strip()]
+        if not lines:
+            continue
+        options = {}
+        for line in lines[1:]:
+            match = _OPTION_PATTERN.match(line)
+            if match:
+                options[match.group(1)] = match.group(2)
+        answer = _ANSWER_PATTERN.search(block)
+        source = _SOURCE_PATTERN.search(block)
+        if len(options) != 4 or not answer or not source:
+            continue
+        source_number = int(source.group(1))
+        if not 1 <= source_number <= len(source_docs):
+            continue
+        doc = source_docs[source_number - 1]
+        questions.append({
+            "question": lines[0].strip(),
+            "options": options,
+            "answer": answer.group(1),
+            "source_chunk_id": get_chunk_key(doc),
+            "source": os.path.basename(doc.metadata.get("source", "Unknown")),
+            "page": doc.metadata.get("page", "N/A"),
+            "snippet": make_snippet(doc.page_content),
+            "times_served": 0,
+        })
+    return questions
+
+
+def cluster_documents(docs, max_chunks: int = None):
+    """
+    Groups retrieved chunks into clusters of related material: chunks from the same
+    source on the same or adjacent pages, at most `max_chunks` per cluster.
+    Clusters keep the relevance order of their first chunk.
+    """
+    max_chunks = max_chunks or config.QUIZ_CLUSTER_MAX_CHUNKS
+    clusters = []
+    for doc in docs:
+        source, page = doc.metadata.get("source"), doc.metadata.get("page")
+        for cluster in clusters:
+            anchor = cluster[0]
+            same_area = (
+                anchor.metadata.get("source") == source
+                and isinstance(page, int) and isinstance(anchor.metadata.get("page"), int)
+                and abs(anchor.metadata["page"] - page) <= 1
+            )
+            if same_area and len(cluster) < max_chunks:
+                cluster.append(doc)
+                break
+        else:
+            clusters.append([doc])
+    return clusters
+
+
+class QuestionBank:
+    """
+    A subject's persisted quiz questions, grouped by the chunk each one was written
+    from. Every question counts how often it was served, so repeated quizzes rotate
+    through the bank instead of repeating the same questions.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.questions = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.questions = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"WARNING: Ignoring unreadable question bank {path}: {e}")
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(chunk_questions) for chunk_questions in self.questions.values())
+
+    def count_for(self, chunk_key: str) -> int:
+        with self.lock:
+            return len(self.questions.get(chunk_key, []))
+
+    def add(self, questions):
+        """Adds question records, skipping any whose text is already banked for the same chunk."""
+        added = 0
+        with self.lock:
+            for question in questions:
+                chunk_questions = self.questions.setdefault(question["source_chunk_id"], [])
+                if any(existing["question"] == question["question"] for existing in chunk_questions):
+                    continue
+                chunk_questions.append(question)
+                added += 1
+        return added
+
+    def existing_questions(self, chunk_keys):
+        with self.lock:
+            return [q["question"] for key in chunk_keys for q in self.questions.get(key, [])]
+
+    def take(self, chunk_keys, count: int):
+        """Returns up to `count` banked questions for these chunks, least served first, and marks them served."""
+        with self.lock:
+            candidates = [
+                (question["times_served"], rank, question)
+                for rank, key in enumerate(chunk_keys)
+                for question in self.questions.get(key, [])
+            ]
+            candidates.sort(key=lambda item: (item[0], item[1]))
+            chosen = [question for _, _, question in candidates[:count]]
+            for question in chosen:
+                question["times_served"] += 1
+            return [dict(question) for question in chosen]
+
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.questions, f)
+            os.replace(temp_path, self.path)
+
+
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_question_bank(subject_db_path: str) -> QuestionBank:
+    """Returns the process-wide QuestionBank for a subject, so every user of it shares one lock."""
+    with _banks_lock:
+        bank = _banks.get(subject_db_path)
+        if bank is None:
+            bank = _banks[subject_db_path] = QuestionBank(get_question_bank_path(subject_db_path))
+        return bank
+
+
+def forget_question_bank(subject_db_path: str):
+    """Drops the in-memory bank, e.g. after its subject store was deleted."""
+    with _banks_lock:
+        _banks.pop(subject_db_path, None)
@@ -0,0 +1,160 @@
+# --- 1. Standard library imports ---
+import contextvars
+import math
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 2. Third-party imports ---
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+# --- 3. Local application imports ---
+from src import config
+from src.instrumentation import get_callback_handler, record_count, span
+from src.quiz_bank import cluster_documents, get_chunk_key, get_question_bank, parse_quiz_text
+from src.rag_chain_builder import QUIZ_PROMPT_TEMPLATE, build_context_retriever, format_docs_with_sources, get_llm
+
+
+# Prefill jobs run one at a time so they never compete with interactive requests for the API quota.
+_prefill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="quiz-prefill")
+_prefill_pending = set()
+_prefill_lock = threading.Lock()
+
+# Generates the clusters of a quiz that are not streamed while the first one streams.
+_generation_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="quiz-generate")
+
+
+class QuizEngine:
+    """Serves quizzes for one subject from its question bank, generating only what is missing."""
+
+    def __init__(self, vector_store, subject_db_path: str, gemini_api_key: str, lexical_index=None, llm=None):
+        self.vector_store = vector_store
+        self.subject_db_path = subject_db_path
+        self.bank = get_question_bank(subject_db_path)
+        self.retriever = build_context_retriever(vector_store, lexical_index, k=config.QUIZ_RETRIEVAL_K)
+        self.quiz_chain = PromptTemplate.from_template(QUIZ_PROMPT_TEMPLATE) | (llm or get_llm(gemini_api_key)) | StrOutputParser()
+
+    def _cluster_input(self, cluster, num_questions: int) -> dict:
+        context = format_docs_with_sources(cluster)
+        existing = self.bank.existing_questions([get_chunk_key(doc) for doc in cluster])
+        if existing:
+            context += "\n\nAlready asked (write different questions):\n" + "\n".join(f"- {q}" for q in existing)
+        return {"context": context, "num_questions": num_questions}
+
+    def _bank_output(self, cluster, output) -> int:
+        if isinstance(output, Exception):
+            print(f"WARNING: Quiz generation failed for one source cluster: {output}")
+            return 0
+        return self.bank.add(parse_quiz_text(output, cluster))
+
+    def generate_for_clusters(self, clusters) -> int:
+        """Generates questions for every cluster in parallel, banks them, and returns how many were added."""
+        if not clusters:
+            return 0
+        per_cluster = config.QUIZ_QUESTIONS_PER_CLUSTER
+        with span("quiz.generate", clusters=len(clusters)):
+            outputs = self.quiz_chain.batch(
+                [self._cluster_input(cluster, per_cluster) for cluster in clusters],
+                config={"max_concurrency": config.QUIZ_MAX_CONCURRENCY},
+                return_exceptions=True
+            )
+        added = sum(self._bank_output(cluster, output) for cluster, output in zip(clusters, outputs))
+        record_count("quiz_questions_generated", added)
+        return added
+
+    def _stream_cluster(self, cluster):
+        """Generates one cluster's questions token by token, then banks them."""
+        text_parts = []
+        try:
+            with span("quiz.generate_streamed"):
+                for token in self.quiz_chain.stream(
+                    self._cluster_input(cluster, config.QUIZ_QUESTIONS_PER_CLUSTER),
+                    config={"callbacks": [get_callback_handler()]}
+                ):
+                    text_parts.append(token)
+                    yield token
+            output = "".join(text_parts)
+        except Exception as e:
+            output = e
+        record_count("quiz_questions_generated", self._bank_output(cluster, output))
+
+    def stream_quiz(self, topic: str, num_questions: int):
+        """
+        Streams a quiz as (kind, value) events, like rag_chain_builder.stream_chain_events:
+        ("sources", docs) once retrieval finishes, then on a bank shortfall ("token", text)
+        while the first missing cluster's questions are generated (any other missing
+        clusters are generated in parallel meanwhile), and finally ("questions", records).
+        Banked questions for the retrieved chunks are used first; the LLM is only called
+        for the shortfall.
+        """
+        docs = self.retriever.invoke(topic)
+        yield ("sources", docs)
+        chunk_keys = [get_chunk_key(doc) for doc in docs]
+        available = sum(self.bank.count_for(key) for key in chunk_keys)
+        if available < num_questions and docs:
+            clusters = cluster_documents(docs)
+            # Top up the clusters with the fewest banked questions first.
+            clusters.sort(key=lambda cluster: sum(self.bank.count_for(get_chunk_key(doc)) for doc in cluster))
+            needed_clusters = clusters[:math.ceil((num_questions - available) / config.QUIZ_QUESTIONS_PER_CLUSTER)]
+            background = None
+            if len(needed_clusters) > 1:
+                # Copied so spans of the background batch land on the current request's trace.
+                background = _generation_executor.submit(
+                    contextvars.copy_context().run, self.generate_for_clusters, needed_clusters[1:]
+                )
+            for token in self._stream_cluster(needed_clusters[0]):
+                yield ("token", token)
+            if background is not None:
+                background.result()
+        record_count("quiz_questions_from_bank", min(available, num_questions))
+
+        questions = self.bank.take(chunk_keys, num_questions)
+        self.bank.save()
+        yield ("questions", questions)
+
+    def get_quiz(self, topic: str, num_questions: int):
+        """Returns `num_questions` question records for the topic (see stream_quiz)."""
+        for kind, value in self.stream_quiz(topic, num_questions):
+            if kind == "questions":
+                return value
+        return []
+
+    def prefill(self, max_clusters: int = None) -> int:
+        """Generates questions for a random sample of chunks that have none yet."""
+        max_clusters = max_clusters or config.QUIZ_PREFILL_MAX_CLUSTERS
+        all_ids = self.vector_store.get(include=[])["ids"]
+        unbanked_ids = [chunk_id for chunk_id in all_ids if not self.bank.count_for(chunk_id)]
+        sample_ids = random.sample(unbanked_ids, min(len(unbanked_ids), max_clusters * config.QUIZ_CLUSTER_MAX_CHUNKS))
+        if not sample_ids:
+            return 0
+        result = self.vector_store.get(ids=sample_ids, include=["documents", "metadatas"])
+        docs = [
+            Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+        docs.sort(key=lambda doc: (str(doc.metadata.get("source")), doc.metadata.get("page", 0)))
+        added = self.generate_for_clusters(cluster_documents(docs)[:max_clusters])
+        if os.path.exists(self.subject_db_path):  # The subject may have been deleted meanwhile.
+            self.bank.save()
+        return added
+
+    def prefill_in_background(self):
+        """Queues prefill() on the background worker (at most one queued job per subject)."""
+        with _prefill_lock:
+            if self.subject_db_path in _prefill_pending:
+                return
+            _prefill_pending.add(self.subject_db_path)
+
+        def run():
+            try:
+                self.prefill()
+            except Exception as e:
+                print(f"WARNING: Background quiz prefill failed for {self.subject_db_path}: {e}")
+            finally:
+                with _prefill_lock:
+                    _prefill_pending.discard(self.subject_db_path)
+
+        _prefill_executor.submit(run)
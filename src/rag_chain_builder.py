@@ -9,38 +9,186 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 
 # --- 3. Local application imports ---
 from src import config
+from src.context_packer import pack_documents
+from src.cross_subject_retriever import CrossSubjectRetriever
+from src.gemini_gateway import GatewayChatModel, get_gateway
+from src.hybrid_retriever import HybridRetriever
+from src.instrumentation import get_callback_handler, span
 
 # --- SHARED HELPER FUNCTIONS ---
 
 def get_llm(gemini_api_key: str):
-    """Initializes and returns the Gemini LLM using a provided API key."""
+    """
+    Initializes and returns the Gemini LLM using a provided API key. Its requests go
+    through the key's Gemini gateway (coalescing, concurrency cap, retries, circuit breaker).
+    """
     # CHANGE THIS CHECK
     if not gemini_api_key:
         raise ValueError("CRITICAL: A valid Gemini API Key must be provided.")
 
     try:
         llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash-latest",
+            model=config.LLM_MODEL_NAME,
             # CHANGE THIS LINE
             google_api_key=gemini_api_key,
-            temperature=0.2
+            temperature=config.LLM_TEMPERATURE
         )
-        return llm
+        return GatewayChatModel(underlying=llm, gateway=get_gateway(gemini_api_key, "chat"))
     except Exception as e:
         print(f"ERROR: Failed to initialize ChatGoogleGenerativeAI: {e}")
         raise
 
+def build_retriever(vector_store, lexical_index=None, k: int = 4):
+    """
+    Returns a hybrid BM25 + vector retriever when the subject has a lexical index,
+    otherwise plain dense retrieval from the vector store.
+    """
+    if lexical_index is not None and len(lexical_index) > 0:
+        return HybridRetriever(
+            vector_store=vector_store,
+            lexical_index=lexical_index,
+            k=k,
+            fetch_k=max(k, config.HYBRID_FETCH_K)
+        )
+    return vector_store.as_retriever(search_kwargs={"k": k})
+
+def build_context_retriever(vector_store, lexical_index=None, k: int = 4):
+    """
+    build_retriever() followed by the context packer, so every chain sends merged,
+    de-duplicated passages within config.CONTEXT_TOKEN_BUDGET to the LLM.
+    """
+    return build_retriever(vector_store, lexical_index, k=k) | RunnableLambda(pack_documents)
+
 def format_docs(docs):
-    """Joins the page_content of multiple documents into a single string."""
-    return "\n\n".join(doc.page_content for doc in docs)  
+    """Joins the page_content of multiple documents into a single string (prefixed with their subject, if tagged)."""
+    return "\n\n".join(
+        f"[Subject: {doc.metadata['subject']}]\n{doc.page_content}" if "subject" in doc.metadata else doc.page_content
+        for doc in docs
+    )
+
+def format_docs_with_sources(docs):
+    """Formats docs and adds a "[SOURCE X]" identifier to each, for prompts that cite sources."""
+    formatted_docs = []
+    for i, doc in enumerate(docs):
+        source_header = f"[SOURCE {i+1}]"
+        formatted_docs.append(f"{source_header}\n{doc.page_content}")
+    return "\n\n".join(formatted_docs)
+
+def stream_chain_events(chain, chain_input):
+    """
+    Streams any chain built in this module as a sequence of (kind, value) events:
+    ("sources", docs) as soon as retrieval finishes, then ("token", text) for each
+    piece of generated text as it arrives from the LLM. A ("cached", True) event
+    marks a response served from the answer cache, and a ("query", text) event the
+    standalone question a Q&A follow-up was rewritten into for retrieval. Retrieval
+    and generation are timed by the instrumentation callback handler.
+    """
+    for chunk in chain.stream(chain_input, config={"callbacks": [get_callback_handler()]}):
+        if isinstance(chunk, str):
+            # The summarization chain streams plain text.
+            yield ("token", chunk)
+            continue
+        for key, value in chunk.items():
+            if key in ("context", "context_docs"):
+                yield ("sources", value)
+            elif key in ("answer", "quiz_text"):
+                yield ("token", value)
+            elif key == "cached":
+                yield ("cached", value)
+            elif key == "standalone_question":
+                yield ("query", value)
 
 # --- CHAIN CREATION FUNCTIONS ---
 
-def create_rag_qa_chain(vector_store, gemini_api_key: str):
-    """Creates a RAG chain for question-answering."""
-    llm = get_llm(gemini_api_key) 
-    retriever = vector_store.as_retriever()
+# Also used by src.quiz_bank, which generates questions per source cluster.
+QUIZ_PROMPT_TEMPLATE = """You are an expert engineering professor creating a quiz.
+    Use the following research notes to generate {num_questions} multiple-choice questions. Your goal is to create a helpful study tool, even if the notes are slightly imperfect.
+
+    **CRITICAL RULES:**
+    1.  Prioritize creating questions from any substantive technical concepts, equations, or definitions you can find in the notes.
+    2.  The text of the question (the 'Q:' line) MUST NOT contain the words "Source", "note", "context", or "document".
 
+    If the notes are suitable, format each question EXACTLY as follows:
+    Q: [Question text]
+    A) [Option A]
+    B) [Option B]
+    C) [Option C]
+    D) [Option D]
+    Answer: [Correct Letter]
+    Source: [The exact source identifier, e.g., "[SOURCE 1]"]
+
+    ---
+    Research Notes:
+    {context}
+    ---
+
+    Quiz Questions:"""
+
+
+CONDENSE_QUESTION_PROMPT_TEMPLATE = """Given the conversation so far and a follow-up question from a student, rewrite the follow-up as a standalone question that can be understood, and searched for in the course notes, without the conversation.
+    Keep every technical term, symbol and number. If the follow-up is already a standalone question, return it unchanged. Return only the question.
+
+    ---
+    Conversation so far:
+    {chat_history}
+    ---
+
+    Follow-up question: {question}
+
+    Standalone question:"""
+
+
+def as_qa_input(chain_input):
+    """
+    Q&A chains accept a question string, or a dict with "question" and optionally
+    "chat_history" (see src.chat_memory) and an already condensed "standalone_question".
+    """
+    if isinstance(chain_input, str):
+        return {"question": chain_input, "chat_history": ""}
+    return {"chat_history": "", **chain_input}
+
+def create_question_condenser(llm):
+    """
+    Returns a runnable that turns a Q&A input into the question to retrieve with: a
+    follow-up is rewritten into a standalone question using the conversation; a question
+    without history is returned as is, without calling the LLM.
+    """
+    condense_chain = PromptTemplate.from_template(CONDENSE_QUESTION_PROMPT_TEMPLATE) | llm | StrOutputParser()
+
+    def condense(chain_input):
+        inputs = as_qa_input(chain_input)
+        if inputs.get("standalone_question"):
+            return inputs["standalone_question"]
+        if not inputs["chat_history"]:
+            return inputs["question"]
+        with span("condense_question"):
+            return condense_chain.invoke(inputs).strip() or inputs["question"]
+
+    return RunnableLambda(condense)
+
+def create_rag_qa_chain(vector_store, gemini_api_key: str, lexical_index=None, llm=None):
+    """
+    Creates a RAG chain for question-answering. With conversation memory in the input
+    (see as_qa_input), follow-up questions are condensed into standalone ones first.
+    """
+    llm = llm or get_llm(gemini_api_key)
+    return _build_qa_chain(build_context_retriever(vector_store, lexical_index), llm)
+
+def create_cross_subject_qa_chain(subject_stores, embeddings_model, gemini_api_key: str, llm=None):
+    """
+    Creates the Q&A chain over several subjects at once. `subject_stores` is a list of
+    (subject name, vector store); each source document is tagged with its subject.
+    """
+    llm = llm or get_llm(gemini_api_key)
+    retriever = CrossSubjectRetriever(
+        subject_stores=subject_stores,
+        embeddings=embeddings_model,
+        k=config.CROSS_SUBJECT_K,
+        fetch_k=config.CROSS_SUBJECT_FETCH_K
+    ) | RunnableLambda(pack_documents)
+    return _build_qa_chain(retriever, llm)
+
+def _build_qa_chain(retriever, llm):
     rag_prompt_template = """You are an expert Mechanical Engineering Professor and a world-class technical writer. Your goal is to provide a comprehensive, in-depth, and pedagogical answer to the student's question, using the provided context as your primary source.
 
     **Instructions for Generating the Answer:**
@@ -73,25 +221,32 @@ def create_rag_qa_chain(vector_store, gemini_api_key: str):
     rag_prompt = PromptTemplate.from_template(rag_prompt_template)
 
     rag_chain_from_docs = (
-        RunnablePassthrough.assign(context=(lambda x: format_docs(x["context"])))
+        # The standalone question is answered, so follow-ups get self-contained answers.
+        RunnablePassthrough.assign(context=(lambda x: format_docs(x["context"])), question=itemgetter("standalone_question"))
         | rag_prompt
         | llm
         | StrOutputParser()
     )
 
-    rag_chain_with_source = RunnableParallel(
-        {"context": retriever, "question": RunnablePassthrough()}
+    rag_chain_with_source = (
+        RunnableLambda(as_qa_input)
+        | RunnablePassthrough.assign(standalone_question=create_question_condenser(llm))
+        | RunnableParallel({
+            "context": itemgetter("standalone_question") | retriever,
+            "question": itemgetter("question"),
+            "standalone_question": itemgetter("standalone_question"),
+        })
     ).assign(answer=rag_chain_from_docs)
 
-    return rag_chain_with_source # Returns dict with 'question', 'context' (docs), 'answer'
+    return rag_chain_with_source # Returns dict with 'question', 'standalone_question', 'context' (docs), 'answer'
 
-def create_summarization_chain(vector_store, gemini_api_key: str):
+def create_summarization_chain(vector_store, gemini_api_key: str, lexical_index=None, llm=None):
     """
     Creates a RAG chain for generating a comprehensive, multi-part summary using a simple retriever.
     """
-    llm = get_llm(gemini_api_key) 
+    llm = llm or get_llm(gemini_api_key)
 
-    retriever = vector_store.as_retriever(search_kwargs={"k": 5})
+    retriever = build_context_retriever(vector_store, lexical_index, k=5)
 
     summary_prompt_template = """You are an expert academic assistant tasked with creating a comprehensive study guide from the provided text.
 
@@ -125,45 +280,14 @@ def create_summarization_chain(vector_store, gemini_api_key: str):
     )
     return summarization_chain
 
-def create_quiz_chain(vector_store, gemini_api_key: str):
+def create_quiz_chain(vector_store, gemini_api_key: str, lexical_index=None, llm=None):
     """
     Creates a chain for generating a quiz with cited sources from the vector store.
     The chain returns a dictionary with 'quiz_text' and 'context_docs'.
     """
-    llm = get_llm(gemini_api_key) 
-    retriever = vector_store.as_retriever()
-    quiz_prompt_template = """You are an expert engineering professor creating a quiz.
-    Use the following research notes to generate {num_questions} multiple-choice questions. Your goal is to create a helpful study tool, even if the notes are slightly imperfect.
-
-    **CRITICAL RULES:**
-    1.  Prioritize creating questions from any substantive technical concepts, equations, or definitions you can find in the notes.
-    2.  The text of the question (the 'Q:' line) MUST NOT contain the words "Source", "note", "context", or "document".
-
-    If the notes are suitable, format each question EXACTLY as follows:
-    Q: [Question text]
-    A) [Option A]
-    B) [Option B]
-    C) [Option C]
-    D) [Option D]
-    Answer: [Correct Letter]
-    Source: [The exact source identifier, e.g., "[SOURCE 1]"]
-
-    ---
-    Research Notes:
-    {context}
-    ---
-
-    Quiz Questions:"""
-    quiz_prompt = PromptTemplate.from_template(quiz_prompt_template)
-
-    # This helper function adds "[SOURCE X]" to each document chunk. It's perfect as is.
-    def format_docs_with_sources(docs):
-        """Formats docs and adds a source identifier to each."""
-        formatted_docs = []
-        for i, doc in enumerate(docs):
-            source_header = f"[SOURCE {i+1}]"
-            formatted_docs.append(f"{source_header}\n{doc.page_content}")
-        return "\n\n".join(formatted_docs)
+    llm = llm or get_llm(gemini_api_key)
+    retriever = build_context_retriever(vector_store, lexical_index)
+    quiz_prompt = PromptTemplate.from_template(QUIZ_PROMPT_TEMPLATE)
 
     # This function retrieves docs and prepares them. It also works perfectly as is.
     def retrieve_and_prepare_context(input_dict):
@@ -0,0 +1,157 @@
+# --- 1. Standard library imports ---
+import hashlib
+import random
+import re
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. `rate_per_minute` tokens are refilled evenly over
+    each minute, up to `capacity` tokens that can be spent in a burst.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 60.0)
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_second)
+        self._last_refill = now
+
+    def acquire(self, tokens: float = 1.0):
+        """Blocks until `tokens` are available, then spends them."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_seconds = (tokens - self._tokens) / self.rate_per_second
+            time.sleep(wait_seconds)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the provider while a gateway's circuit breaker is open."""
+
+
+# Provider errors are classified by their status code, gRPC status name or exception type.
+# The LangChain Google wrappers re-raise them as generic errors, so when no structured status
+# is available the message is searched for whole status tokens only (never e.g. "1500 tokens").
+_RATE_LIMIT_STATUSES = {429, "RESOURCE_EXHAUSTED", "TOO_MANY_REQUESTS"}
+_TRANSIENT_STATUSES = {500, 502, 503, 504, "INTERNAL", "UNAVAILABLE", "DEADLINE_EXCEEDED"}
+_RATE_LIMIT_TYPES = {"ResourceExhausted", "TooManyRequests"}
+_TRANSIENT_TYPES = {"InternalServerError", "ServiceUnavailable", "BadGateway", "GatewayTimeout",
+                    "DeadlineExceeded", "ServerError"}
+_RATE_LIMIT_MESSAGE = re.compile(r"\b(?:429|RESOURCE_EXHAUSTED)\b|Resource has been exhausted")
+_TRANSIENT_MESSAGE = re.compile(r"\b(?:50[0-4]|UNAVAILABLE|DEADLINE_EXCEEDED)\b")
+
+
+def _error_chain(error: BaseException):
+    """The error and the errors it was raised from, outermost first."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _statuses(error: BaseException) -> set:
+    """The HTTP status codes and gRPC status names the error carries."""
+    statuses = set()
+    for attribute in ("code", "status_code", "status", "grpc_status_code"):
+        value = getattr(error, attribute, None)
+        if callable(value):
+            try:
+                value = value()
+            except Exception:
+                continue
+        value = getattr(value, "name", value)  # grpc.StatusCode members
+        if isinstance(value, bool) or value is None:
+            continue
+        if isinstance(value, int):
+            statuses.add(value)
+        elif isinstance(value, str):
+            statuses.add(int(value) if value.isdigit() else value.upper())
+    return statuses
+
+
+def _matches(error: BaseException, statuses: set, type_names: set, message_pattern) -> bool:
+    for cause in _error_chain(error):
+        if isinstance(cause, CircuitOpenError):
+            return False
+        if type(cause).__name__ in type_names:
+            return True
+        found = _statuses(cause)
+        if found:
+            if found & statuses:
+                return True
+            continue
+        if message_pattern.search(str(cause)):
+            return True
+    return False
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Returns True for provider quota errors (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    return _matches(error, _RATE_LIMIT_STATUSES, _RATE_LIMIT_TYPES, _RATE_LIMIT_MESSAGE)
+
+
+def is_transient_error(error: Exception) -> bool:
+    """
+    Returns True for errors worth retrying: quota errors, provider-side failures
+    (HTTP 5xx / UNAVAILABLE / DEADLINE_EXCEEDED) and timeouts. An open circuit
+    breaker is never retried.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if is_rate_limit_error(error) or isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return _matches(error, _TRANSIENT_STATUSES, _TRANSIENT_TYPES, _TRANSIENT_MESSAGE)
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """Exponential backoff with full jitter: a random delay up to base_delay * 2**attempt."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def call_with_backoff(func, *args, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                      should_retry=is_rate_limit_error, delay_for=None, **kwargs):
+    """
+    Calls `func`, retrying errors accepted by `should_retry` with exponential
+    backoff and full jitter (or `delay_for(attempt)` seconds, if given). Any other
+    error (or the last failed attempt) is re-raised.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_retries or not should_retry(e):
+                raise
+            delay = delay_for(attempt) if delay_for else backoff_delay(attempt, base_delay, max_delay)
+            print(f"WARNING: Provider request failed: {e} (attempt {attempt + 1}/{max_retries + 1}); retrying in {delay:.1f}s.")
+            time.sleep(delay)
+
+
+# --- PROCESS-WIDE LIMITERS ---
+# One bucket per (API key, purpose), because provider quotas are enforced per key.
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_token_bucket(api_key: str, purpose: str, rate_per_minute: float) -> TokenBucket:
+    """Returns the shared TokenBucket for this API key and purpose, creating it on first use."""
+    key_hash = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    with _buckets_lock:
+        bucket = _buckets.get((key_hash, purpose))
+        if bucket is None:
+            bucket = TokenBucket(rate_per_minute)
+            _buckets[(key_hash, purpose)] = bucket
+        return bucket
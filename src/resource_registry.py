@@ -0,0 +1,214 @@
+# --- 1. Standard library imports ---
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+# --- 2. Local application imports ---
+from src import config, rag_chain_builder, vector_store_manager
+from src.answer_cache import CachedQAChain
+from src.ingest_manifest import SubjectManifest
+from src.instrumentation import record_cache_access
+from src.quiz_bank import forget_question_bank
+from src.quiz_engine import QuizEngine
+from src.store_janitor import get_janitor
+from src.subject_summarizer import create_subject_summary_chain
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries also expire after `ttl_seconds` without use.
+    Values are built by a factory on a miss; concurrent misses on the same key are
+    built once, the other callers wait for the result.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, name: str = "ttl_cache"):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def _evict_expired(self, now):
+        while self._entries:
+            key, (_, last_used) = next(iter(self._entries.items()))
+            if now - last_used < self.ttl_seconds:
+                break
+            del self._entries[key]
+
+    def get_or_create(self, key, factory):
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+            if key in self._entries:
+                value, _ = self._entries.pop(key)
+                self._entries[key] = (value, now)
+                record_cache_access(self.name, hits=1)
+                return value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    record_cache_access(self.name, hits=1)
+                    return self._entries[key][0]
+            record_cache_access(self.name, misses=1)
+            try:
+                value = factory()
+                with self._lock:
+                    self._entries[key] = (value, time.monotonic())
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+            return value
+
+    def invalidate(self, predicate):
+        """Removes every entry whose key satisfies `predicate`."""
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SubjectResources(NamedTuple):
+    """Everything the UI needs for one subject, built once per index version."""
+    vector_store: Any
+    lexical_index: Any
+    rag_qa_chain: Any
+    summarization_chain: Any
+    subject_summary_chain: Any
+    quiz_engine: Any
+    index_version: int
+
+
+def _hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+# --- PROCESS-WIDE POOLS ---
+
+_client_pool = TTLCache(config.CLIENT_POOL_TTL_SECONDS, config.CLIENT_POOL_MAX_ENTRIES, name="client_pool")
+_subject_pool = TTLCache(config.SUBJECT_RESOURCES_TTL_SECONDS, config.SUBJECT_RESOURCES_MAX_ENTRIES, name="subject_resources")
+
+
+def get_llm(gemini_api_key: str):
+    """Returns the shared Gemini chat client for this API key and model."""
+    key = ("llm", _hash_api_key(gemini_api_key), config.LLM_MODEL_NAME)
+    return _client_pool.get_or_create(key, lambda: rag_chain_builder.get_llm(gemini_api_key))
+
+
+def get_embeddings_model(gemini_api_key: str):
+    """Returns the shared (cached, batched) Gemini embeddings client for this API key and model."""
+    key = ("embeddings", _hash_api_key(gemini_api_key), config.EMBEDDING_MODEL_NAME)
+    return _client_pool.get_or_create(key, lambda: vector_store_manager.get_embeddings_model(gemini_api_key))
+
+
+def _build_subject_resources(subject_name: str, gemini_api_key: str, index_version: int):
+    embeddings_model = get_embeddings_model(gemini_api_key)
+    vector_store = vector_store_manager.create_or_load_subject_vector_store(
+        subject_name,
+        gemini_api_key,
+        embeddings_model=embeddings_model
+    )
+    if vector_store is None:
+        return None
+
+    llm = get_llm(gemini_api_key)
+    lexical_index = vector_store_manager.load_lexical_index(subject_name)
+    subject_db_path = vector_store_manager.get_subject_db_path(subject_name)
+    # Near-duplicate questions are answered from the semantic cache, shared by every
+    # session whose subject holds the same documents.
+    rag_qa_chain = CachedQAChain(
+        rag_chain_builder.create_rag_qa_chain(vector_store, gemini_api_key, lexical_index=lexical_index, llm=llm),
+        embeddings_model,
+        subject_key=SubjectManifest.load(subject_db_path).content_key(),
+        condenser=rag_chain_builder.create_question_condenser(llm)
+    )
+    return SubjectResources(
+        vector_store=vector_store,
+        lexical_index=lexical_index,
+        rag_qa_chain=rag_qa_chain,
+        summarization_chain=rag_chain_builder.create_summarization_chain(
+            vector_store, gemini_api_key, lexical_index=lexical_index, llm=llm
+        ),
+        subject_summary_chain=create_subject_summary_chain(vector_store, subject_db_path, gemini_api_key, llm=llm),
+        quiz_engine=QuizEngine(vector_store, subject_db_path, gemini_api_key, lexical_index=lexical_index, llm=llm),
+        index_version=index_version
+    )
+
+
+def get_subject_resources(subject_name: str, gemini_api_key: str):
+    """
+    Returns the vector store and chains for a subject in the current session, or None
+    if the subject has no store yet. Results are cached per (store path, index version,
+    API key), so switching back to a subject is a dictionary lookup and any
+    ingest (which bumps the index version) naturally produces a fresh entry.
+    """
+    index_version = vector_store_manager.get_subject_index_version(subject_name)
+    # The store path already identifies both the session and the subject.
+    key = (
+        vector_store_manager.get_subject_db_path(subject_name),
+        index_version,
+        _hash_api_key(gemini_api_key)
+    )
+    resources = _subject_pool.get_or_create(
+        key, lambda: _build_subject_resources(subject_name, gemini_api_key, index_version)
+    )
+    if resources is None:
+        # Don't remember "no store yet"; the next upload will create one.
+        _subject_pool.invalidate(lambda cached_key: cached_key == key)
+    return resources
+
+
+def get_cross_subject_qa_chain(subject_names, gemini_api_key: str):
+    """
+    Returns a Q&A chain that searches all the given subjects at once, or None if none
+    of them has a store yet. Built from each subject's cached resources and cached per
+    (subjects, index versions, API key) like a single subject's chains.
+    """
+    subject_stores = []
+    for subject_name in subject_names:
+        resources = get_subject_resources(subject_name, gemini_api_key)
+        if resources is not None:
+            subject_stores.append((subject_name, resources.vector_store, resources.index_version))
+    if not subject_stores:
+        return None
+
+    key = (
+        "cross_subject",
+        tuple((vector_store_manager.get_subject_db_path(name), version) for name, _, version in subject_stores),
+        _hash_api_key(gemini_api_key)
+    )
+    return _subject_pool.get_or_create(key, lambda: rag_chain_builder.create_cross_subject_qa_chain(
+        [(name, vector_store) for name, vector_store, _ in subject_stores],
+        get_embeddings_model(gemini_api_key),
+        gemini_api_key,
+        llm=get_llm(gemini_api_key)
+    ))
+
+
+def invalidate_store_path(subject_db_path: str):
+    """
+    Drops every cached resource for the subject stored at this path. Cached answers are
+    keyed by content and may serve other sessions, so they are left to age out.
+    """
+    _subject_pool.invalidate(
+        lambda key: key[0] == subject_db_path
+        or (key[0] == "cross_subject" and any(path == subject_db_path for path, _ in key[1]))
+    )
+    forget_question_bank(subject_db_path)
+
+
+def invalidate_subject(subject_name: str):
+    """Drops every cached resource for a subject in the current session (e.g. after deletion)."""
+    invalidate_store_path(vector_store_manager.get_subject_db_path(subject_name))
+
+
+# Stores reclaimed by the janitor must not be served from the cache afterwards.
+get_janitor().on_evict.append(invalidate_store_path)
@@ -0,0 +1,244 @@
+# --- 1. Standard library imports ---
+import json
+import os
+import threading
+import time
+
+# --- 2. Third-party imports ---
+from filelock import FileLock, Timeout
+from langchain_chroma import Chroma
+from langchain_core.vectorstores import VectorStore
+
+# --- 3. Local application imports ---
+from src import config
+
+# In shared mode every chunk lives once in a single Chroma collection, tagged with the
+# SHA-256 of the PDF it came from. A session's subject is only a list of document
+# hashes (kept in its ingest manifest), and every query is filtered to that list.
+# The registry of stored documents and per-document ingestion are guarded by file locks,
+# but Chroma itself is not safe to write and read from several processes, so the store is
+# owned by one server process per host (see _claim_store).
+
+_SHARED_COLLECTION_NAME = "shared_chunks"
+_owner_locks = {}
+_owner_locks_lock = threading.Lock()
+
+
+def get_documents_registry_path() -> str:
+    return os.path.join(config.SHARED_VECTOR_DB_PATH, "documents.json")
+
+
+def _load_registry() -> dict:
+    path = get_documents_registry_path()
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _registry_lock() -> FileLock:
+    os.makedirs(config.SHARED_VECTOR_DB_PATH, exist_ok=True)
+    return FileLock(f"{get_documents_registry_path()}.lock")
+
+
+def _update_registry(update):
+    """Applies `update(registry)` as one read-modify-write, exclusive across processes."""
+    with _registry_lock():
+        registry = _load_registry()
+        update(registry)
+        temp_path = f"{get_documents_registry_path()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(registry, f)
+        os.replace(temp_path, get_documents_registry_path())
+
+
+def is_document_stored(doc_hash: str) -> bool:
+    """True once every chunk of the document has been embedded into the shared store."""
+    return doc_hash in _load_registry()
+
+
+def mark_document_stored(doc_hash: str, chunk_count: int):
+    def update(registry):
+        registry[doc_hash] = {"chunk_count": chunk_count, "referenced_at": time.time()}
+    _update_registry(update)
+
+
+def reference_document(doc_hash: str):
+    """Records that a subject view has just (re)referenced a stored document."""
+    def update(registry):
+        if doc_hash in registry:
+            registry[doc_hash]["referenced_at"] = time.time()
+    _update_registry(update)
+
+
+def get_document_lock(doc_hash: str) -> FileLock:
+    """Serializes ingestion (and garbage collection) of the same document across sessions and processes."""
+    lock_dir = os.path.join(config.SHARED_VECTOR_DB_PATH, "locks")
+    os.makedirs(lock_dir, exist_ok=True)
+    return FileLock(os.path.join(lock_dir, f"{doc_hash}.lock"))
+
+
+def neutral_source_name(doc_hash: str) -> str:
+    """
+    The `source` stored with shared chunks. Uploaders name the same PDF differently, so
+    the shared store keeps no file name; each SubjectView shows its own instead.
+    """
+    return f"document-{doc_hash[:12]}.pdf"
+
+
+def make_shared_chunk_id(doc_hash: str, page_number: int, chunk_index: int) -> str:
+    """Content-addressed chunk ID: identical PDFs always produce identical IDs."""
+    return f"{doc_hash[:32]}-{page_number}-{chunk_index}"
+
+
+def _claim_store():
+    """
+    Takes the shared store's owner lock for the rest of this process's life. Raises
+    RuntimeError if another server process on this host already owns the store.
+    """
+    path = config.SHARED_VECTOR_DB_PATH
+    owner_key = (os.getpid(), path)  # a forked child does not inherit ownership
+    with _owner_locks_lock:
+        if owner_key in _owner_locks:
+            return
+        os.makedirs(path, exist_ok=True)
+        owner_lock = FileLock(os.path.join(path, "owner.lock"))
+        try:
+            owner_lock.acquire(timeout=0)
+        except Timeout:
+            raise RuntimeError(
+                f"The shared store at {path} is in use by another server process. Shared storage "
+                f"supports one server process per host; give other processes their own "
+                f"SHARED_VECTOR_DB_PATH or disable shared storage."
+            ) from None
+        _owner_locks[owner_key] = owner_lock
+
+
+def open_shared_store(embeddings_model) -> Chroma:
+    """Opens the host-wide content-addressed chunk store, which this process then owns."""
+    _claim_store()
+    return Chroma(
+        collection_name=_SHARED_COLLECTION_NAME,
+        persist_directory=config.SHARED_VECTOR_DB_PATH,
+        embedding_function=embeddings_model
+    )
+
+
+def collect_garbage(referenced_hashes, min_idle_seconds: float) -> int:
+    """
+    Deletes the chunks of stored documents that no subject view references any more.
+    Documents referenced within `min_idle_seconds` are kept, so a view that is being
+    created right now never loses its chunks. Returns the number of documents removed.
+    """
+    if not os.path.exists(get_documents_registry_path()):
+        return 0
+    now = time.time()
+    orphans = [
+        doc_hash for doc_hash, record in _load_registry().items()
+        if doc_hash not in referenced_hashes and now - record.get("referenced_at", 0) >= min_idle_seconds
+    ]
+    if not orphans:
+        return 0
+    _claim_store()
+    store = Chroma(collection_name=_SHARED_COLLECTION_NAME, persist_directory=config.SHARED_VECTOR_DB_PATH)
+    removed = 0
+    for doc_hash in orphans:
+        with get_document_lock(doc_hash):
+            # Re-checked under the document lock: an ingest may have referenced it meanwhile.
+            record = _load_registry().get(doc_hash)
+            if record is None or time.time() - record.get("referenced_at", 0) < min_idle_seconds:
+                continue
+            store.delete(where={"doc_hash": doc_hash})
+            _update_registry(lambda registry: registry.pop(doc_hash, None))
+            removed += 1
+    return removed
+
+
+class SubjectView(VectorStore):
+    """
+    A read-only vector store for one session's subject in shared mode.
+    It searches the shared store but only ever returns chunks whose `doc_hash` belongs
+    to this subject, so sessions never see each other's documents. `doc_sources` maps
+    each document hash to this subject's file name for it, which returned chunks show
+    as their `source`.
+    """
+
+    def __init__(self, shared_store: Chroma, doc_sources: dict):
+        self.shared_store = shared_store
+        self.doc_sources = dict(doc_sources)
+        self.doc_hashes = sorted(self.doc_sources)
+
+    def _with_source(self, doc):
+        source = self.doc_sources.get(doc.metadata.get("doc_hash"))
+        if source is not None:
+            doc.metadata["source"] = source
+        return doc
+
+    @property
+    def embeddings(self):
+        return self.shared_store.embeddings
+
+    def _view_filter(self, extra_filter=None):
+        view_filter = {"doc_hash": {"$in": self.doc_hashes}}
+        return {"$and": [view_filter, extra_filter]} if extra_filter else view_filter
+
+    def similarity_search(self, query, k=4, filter=None, **kwargs):
+        if not self.doc_hashes:
+            return []
+        docs = self.shared_store.similarity_search(query, k=k, filter=self._view_filter(filter), **kwargs)
+        return [self._with_source(doc) for doc in docs]
+
+    def similarity_search_with_score(self, query, k=4, filter=None, **kwargs):
+        if not self.doc_hashes:
+            return []
+        results = self.shared_store.similarity_search_with_score(query, k=k, filter=self._view_filter(filter), **kwargs)
+        return [(self._with_source(doc), score) for doc, score in results]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        if not self.doc_hashes:
+            return []
+        docs = self.shared_store.similarity_search_by_vector(embedding, k=k, filter=self._view_filter(filter), **kwargs)
+        return [self._with_source(doc) for doc in docs]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4, filter=None, **kwargs):
+        if not self.doc_hashes:
+            return []
+        results = self.shared_store.similarity_search_by_vector_with_relevance_scores(
+            embedding, k=k, filter=self._view_filter(filter), **kwargs
+        )
+        return [(self._with_source(doc), score) for doc, score in results]
+
+    def max_marginal_relevance_search(self, query, k=4, fetch_k=20, lambda_mult=0.5, filter=None, **kwargs):
+        if not self.doc_hashes:
+            return []
+        docs = self.shared_store.max_marginal_relevance_search(
+            query, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=self._view_filter(filter), **kwargs
+        )
+        return [self._with_source(doc) for doc in docs]
+
+    def _select_relevance_score_fn(self):
+        return self.shared_store._select_relevance_score_fn()
+
+    def get_by_ids(self, ids):
+        return [
+            self._with_source(doc)
+            for doc in self.shared_store.get_by_ids(ids)
+            if doc.metadata.get("doc_hash") in self.doc_sources
+        ]
+
+    def get(self, where=None, **kwargs):
+        """Chroma-style get() restricted to this subject's documents."""
+        if not self.doc_hashes:
+            return {"ids": [], "documents": [], "metadatas": [], "embeddings": None}
+        result = self.shared_store.get(where=self._view_filter(where), **kwargs)
+        for metadata in result.get("metadatas") or []:
+            if metadata and metadata.get("doc_hash") in self.doc_sources:
+                metadata["source"] = self.doc_sources[metadata["doc_hash"]]
+        return result
+
+    def add_texts(self, texts, metadatas=None, **kwargs):
+        raise NotImplementedError("Subject views are read-only; add documents through src.ingestion.")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Subject views are created from the shared store, not from texts.")
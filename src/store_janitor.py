@@ -0,0 +1,367 @@
+# --- 1. Standard library imports ---
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+# --- 2. Third-party imports ---
+from filelock import FileLock
+
+# --- 3. Local application imports ---
+from src import config
+from src.ingest_manifest import SubjectManifest, get_manifest_path
+from src.lexical_index import get_lexical_index_path
+from src.near_duplicates import get_near_duplicate_index_path
+from src.quiz_bank import get_question_bank_path
+from src.summary_cache import get_summary_cache_path
+
+# Every file kept beside a subject's directory, as a function of that directory's path.
+SUBJECT_SIDECAR_PATH_BUILDERS = [
+    get_manifest_path,
+    get_lexical_index_path,
+    get_summary_cache_path,
+    get_question_bank_path,
+    get_near_duplicate_index_path,
+]
+
+
+def _path_size(path: str) -> int:
+    """Total size in bytes of a file or directory tree."""
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                total += os.path.getsize(os.path.join(dir_path, file_name))
+            except OSError:
+                pass
+    return total
+
+
+def _path_mtime(path: str) -> float:
+    """Most recent modification time of a file or anywhere inside a directory tree."""
+    latest = os.path.getmtime(path)
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                latest = max(latest, os.path.getmtime(os.path.join(dir_path, file_name)))
+            except OSError:
+                pass
+    return latest
+
+
+def get_subject_sidecar_paths(subject_db_path: str):
+    """Existing files stored next to a subject's directory (manifest, lexical index, ...)."""
+    candidates = (build_path(subject_db_path) for build_path in SUBJECT_SIDECAR_PATH_BUILDERS)
+    return [path for path in candidates if os.path.exists(path)]
+
+
+def remove_subject_store(subject_db_path: str) -> int:
+    """Deletes a subject's directory and its sidecar files. Returns the bytes reclaimed."""
+    reclaimed = 0
+    if os.path.exists(subject_db_path):
+        reclaimed += _path_size(subject_db_path)
+        shutil.rmtree(subject_db_path)
+    for sidecar_path in get_subject_sidecar_paths(subject_db_path):
+        reclaimed += _path_size(sidecar_path)
+        os.remove(sidecar_path)
+    return reclaimed
+
+
+# A lease is a file "<leased path>.lease-<pid>" next to the leased directory, so every
+# server process sees it. Leases of processes that died without releasing them are ignored.
+LEASE_SUFFIX = ".lease-"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_subject_dir_name(name: str) -> bool:
+    return name.startswith("subject_") and name.endswith("_db")
+
+
+class StoreJanitor:
+    """
+    Reclaims disk used by per-session subject stores under config.SESSIONS_ROOT.
+
+    - Sessions not accessed for `session_ttl_seconds` are deleted entirely.
+    - If the remaining subject stores exceed `disk_quota_bytes`, the least recently
+      used subjects are deleted until usage is back under the quota.
+    - Documents in the shared store that no remaining subject view references are deleted.
+    Stores that are leased (e.g. with ingestion jobs queued or running) or were accessed
+    within `active_window_seconds` are never deleted, nor is the session holding them.
+    Leases are files beside the store and touch() also bumps the store's modification
+    time, so both are seen by the janitor of every server process on the host. Each
+    eviction re-checks them under a host-wide lock that lease acquisition also takes.
+    """
+
+    def __init__(self, root: str = None, session_ttl_seconds: float = None, disk_quota_bytes: int = None,
+                 active_window_seconds: float = None, interval_seconds: float = None):
+        self.root = root or config.SESSIONS_ROOT
+        self.session_ttl_seconds = session_ttl_seconds or config.JANITOR_SESSION_TTL_SECONDS
+        self.disk_quota_bytes = disk_quota_bytes or config.JANITOR_DISK_QUOTA_BYTES
+        self.active_window_seconds = active_window_seconds or config.JANITOR_ACTIVE_WINDOW_SECONDS
+        self.interval_seconds = interval_seconds or config.JANITOR_INTERVAL_SECONDS
+        self.on_evict = []
+        self.last_report = None
+        self._last_access = {}
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    # --- access tracking ---
+
+    def _guard(self) -> FileLock:
+        """Host-wide lock that makes "is it in use?" and "delete it" one step for evictions."""
+        os.makedirs(os.path.dirname(self.root) or ".", exist_ok=True)
+        return FileLock(f"{self.root}.lock")
+
+    def touch(self, path: str):
+        """Records that a session or subject directory was just used."""
+        now = time.time()
+        with self._lock:
+            self._last_access[path] = now
+            # Using a subject also counts as using its session.
+            self._last_access[os.path.dirname(path)] = now
+        for used_path in (path, os.path.dirname(path)):
+            try:
+                os.utime(used_path, (now, now))
+            except OSError:
+                pass  # Not created yet.
+
+    def acquire_lease(self, path: str):
+        """Protects a subject directory (and its session) from eviction until release_lease()."""
+        with self._guard():
+            with self._lock:
+                first_lease = path not in self._leases
+                self._leases[path] = self._leases.get(path, 0) + 1
+            if first_lease:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(f"{path}{LEASE_SUFFIX}{os.getpid()}", "a").close()
+        self.touch(path)
+
+    def release_lease(self, path: str):
+        self.touch(path)
+        with self._lock:
+            self._leases[path] -= 1
+            last_lease = not self._leases[path]
+            if last_lease:
+                del self._leases[path]
+        if last_lease:
+            try:
+                os.remove(f"{path}{LEASE_SUFFIX}{os.getpid()}")
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def lease(self, path: str):
+        """Protects a subject directory from eviction for the duration of the block."""
+        self.acquire_lease(path)
+        try:
+            yield
+        finally:
+            self.release_lease(path)
+
+    def _last_used(self, path: str) -> float:
+        with self._lock:
+            tracked = self._last_access.get(path, 0.0)
+        try:
+            return max(tracked, _path_mtime(path))
+        except OSError:
+            return tracked
+
+    def _is_leased(self, path: str) -> bool:
+        """True if a live process holds a lease on `path` or on a store directly inside it."""
+        parent, name = os.path.split(path)
+        lease_paths = []
+        for directory, prefix in ((parent, name + LEASE_SUFFIX), (path, "")):
+            try:
+                lease_paths += [
+                    os.path.join(directory, entry)
+                    for entry in os.listdir(directory)
+                    if entry.startswith(prefix) and LEASE_SUFFIX in entry
+                ]
+            except OSError:
+                continue
+        leased = False
+        for lease_path in lease_paths:
+            try:
+                pid = int(lease_path.rsplit(LEASE_SUFFIX, 1)[1])
+            except ValueError:
+                continue
+            if _pid_alive(pid):
+                leased = True
+            else:
+                try:
+                    os.remove(lease_path)
+                except OSError:
+                    pass
+        return leased
+
+    def _is_protected(self, path: str, now: float) -> bool:
+        return self._is_leased(path) or now - self._last_used(path) < self.active_window_seconds
+
+    # --- discovery ---
+
+    def _list_session_dirs(self):
+        if not os.path.isdir(self.root):
+            return []
+        return [entry.path for entry in os.scandir(self.root) if entry.is_dir(follow_symlinks=False)]
+
+    def _list_subject_dirs(self, session_dir: str):
+        return [
+            entry.path
+            for entry in os.scandir(session_dir)
+            if entry.is_dir() and _is_subject_dir_name(entry.name)
+        ]
+
+    # --- eviction ---
+
+    def _evict(self, subject_db_path: str, reason: str, report: dict):
+        with self._guard():
+            # Re-checked under the lock: a lease or access may have come in since the scan.
+            if self._is_protected(subject_db_path, time.time()):
+                return 0
+            try:
+                reclaimed = remove_subject_store(subject_db_path)
+            except OSError as e:
+                print(f"WARNING: Janitor could not remove {subject_db_path}: {e}")
+                return 0
+        with self._lock:
+            self._last_access.pop(subject_db_path, None)
+        report["evicted"].append({"path": subject_db_path, "reason": reason, "bytes": reclaimed})
+        report["bytes_reclaimed"] += reclaimed
+        for callback in self.on_evict:
+            try:
+                callback(subject_db_path)
+            except Exception as e:
+                print(f"WARNING: Janitor eviction callback failed for {subject_db_path}: {e}")
+        return reclaimed
+
+    def _remove_session_dir(self, session_dir: str, scanned_at: float) -> bool:
+        """
+        Deletes an expired session's remains, unless it came back into use since `scanned_at`.
+        (Its modification time is no guide here: evicting its subjects just changed it.)
+        """
+        with self._guard():
+            with self._lock:
+                touched = self._last_access.get(session_dir, 0.0) > scanned_at
+            if touched or self._is_leased(session_dir) or self._list_subject_dirs(session_dir):
+                return False
+            # Staged uploads and state of the session's ingestion jobs go with it.
+            shutil.rmtree(os.path.join(session_dir, config.INGEST_JOBS_DIR_NAME), ignore_errors=True)
+            try:
+                os.rmdir(session_dir)
+            except OSError:
+                pass  # Not empty: something else lives there; leave it alone.
+        return True
+
+    def sweep(self) -> dict:
+        """Runs one TTL + quota pass and returns a report of what was reclaimed."""
+        now = time.time()
+        report = {"started_at": now, "evicted": [], "bytes_reclaimed": 0, "bytes_in_use": 0}
+
+        # 1. Expire whole sessions that have been idle past the TTL.
+        live_subjects = []
+        for session_dir in self._list_session_dirs():
+            subject_dirs = self._list_subject_dirs(session_dir)
+            session_idle = now - self._last_used(session_dir) >= self.session_ttl_seconds
+            session_protected = self._is_protected(session_dir, now) or any(
+                self._is_protected(path, now) for path in subject_dirs
+            )
+            if session_idle and not session_protected:
+                for subject_db_path in subject_dirs:
+                    self._evict(subject_db_path, "session_ttl", report)
+                if self._remove_session_dir(session_dir, now):
+                    continue
+                subject_dirs = self._list_subject_dirs(session_dir)
+            live_subjects.extend(subject_dirs)
+
+        # 2. Enforce the global quota, least recently used subjects first.
+        usage = {
+            path: _path_size(path) + sum(_path_size(p) for p in get_subject_sidecar_paths(path))
+            for path in live_subjects
+        }
+        total_bytes = sum(usage.values())
+        for subject_db_path in sorted(live_subjects, key=self._last_used):
+            if total_bytes <= self.disk_quota_bytes:
+                break
+            if self._is_protected(subject_db_path, now):
+                continue
+            total_bytes -= self._evict(subject_db_path, "disk_quota", report)
+
+        report["bytes_in_use"] = total_bytes
+
+        # 3. Collect shared-store documents that no subject view references any more.
+        report["shared_documents_removed"] = self._collect_shared_documents(
+            [path for path in live_subjects if os.path.exists(path)]
+        )
+        self.last_report = report
+        if report["evicted"]:
+            print(
+                f"Janitor reclaimed {report['bytes_reclaimed'] / 1e6:.1f} MB from "
+                f"{len(report['evicted'])} subject store(s); {total_bytes / 1e6:.1f} MB in use."
+            )
+        return report
+
+    def _collect_shared_documents(self, subject_dirs) -> int:
+        if not os.path.exists(config.SHARED_VECTOR_DB_PATH):
+            return 0
+        referenced = set()
+        for subject_db_path in subject_dirs:
+            manifest = SubjectManifest.load(subject_db_path)
+            if manifest.storage == "shared":
+                referenced.update(manifest.file_hashes())
+        # Imported here: opening the shared store loads Chroma, which most sweeps never need.
+        from src import shared_store
+        try:
+            return shared_store.collect_garbage(referenced, min_idle_seconds=self.active_window_seconds)
+        except Exception as e:
+            print(f"WARNING: Janitor could not collect unreferenced shared documents: {e}")
+            return 0
+
+    # --- background thread ---
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval_seconds):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"ERROR: Janitor sweep failed: {e}")
+
+    def start(self):
+        """Starts the background sweep thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="store-janitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+# --- PROCESS-WIDE JANITOR ---
+
+_janitor = None
+_janitor_lock = threading.Lock()
+
+
+def get_janitor() -> StoreJanitor:
+    """Returns the process-wide StoreJanitor (not started until start() is called)."""
+    global _janitor
+    with _janitor_lock:
+        if _janitor is None:
+            _janitor = StoreJanitor()
+        return _janitor
@@ -0,0 +1,141 @@
+# --- 1. Standard library imports ---
+import contextvars
+import os
+import re
+import threading
+import uuid
+from contextlib import contextmanager
+
+# --- 2. Third-party imports ---
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# --- 3. Local application imports ---
+from src import config
+from src.store_janitor import get_janitor
+
+# Session and subject naming only, so app.py can list subjects without importing the
+# LangChain, Chroma and Gemini modules behind vector_store_manager.
+
+# Background work (e.g. ingestion jobs) runs outside any script thread and names the
+# session it works for explicitly.
+_session_override = contextvars.ContextVar("session_override", default=None)
+
+# Workspace IDs become directory names, so only IDs this module could have made are accepted.
+_WORKSPACE_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+@contextmanager
+def session_scope(session_id: str):
+    """Makes get_session_id() return `session_id` inside the block (in this thread/context)."""
+    token = _session_override.set(session_id)
+    try:
+        yield
+    finally:
+        _session_override.reset(token)
+
+
+def _get_workspace_id():
+    """The valid workspace ID in the page URL, or None. Never changes the URL."""
+    workspace_id = st.query_params.get(config.WORKSPACE_QUERY_PARAM, "")
+    return workspace_id if _WORKSPACE_ID_PATTERN.fullmatch(workspace_id) else None
+
+
+def ensure_workspace_id() -> str:
+    """
+    Called once at the top of every app run: returns the workspace ID in the page URL,
+    creating one and adding it to the URL if it is missing or invalid.
+    """
+    workspace_id = _get_workspace_id()
+    if workspace_id is None:
+        workspace_id = uuid.uuid4().hex
+        st.query_params[config.WORKSPACE_QUERY_PARAM] = workspace_id
+    return workspace_id
+
+
+# --- NEW HELPER FUNCTION TO GET A UNIQUE SESSION ID ---
+def get_session_id():
+    """
+    Returns the ID naming the current user's session directory: the workspace ID in the
+    page URL, so the same URL finds the same subjects after a reload or server restart.
+    Only reads the URL; app.py creates the workspace ID with ensure_workspace_id().
+    """
+    override = _session_override.get()
+    if override is not None:
+        return override
+    try:
+        ctx = get_script_run_ctx()
+    except Exception:
+        # Fallback if get_script_run_ctx is not available
+        return "fallback_session_id"
+    if ctx is None:
+        # This can happen in a non-Streamlit context (like local testing or the
+        # batch Q&A CLI). We'll return a static, overridable ID for that case.
+        return os.environ.get("COURSE_COMPANION_SESSION_ID", "local_test_session")
+    workspace_id = _get_workspace_id()
+    if workspace_id is None:
+        # Never fall back to a shared ID: it would show one user's subjects to another.
+        raise RuntimeError("The page URL has no workspace ID; ensure_workspace_id() must run first.")
+    return workspace_id
+
+
+def get_session_base_path() -> str:
+    """The directory holding every subject store of the current session."""
+    return os.path.join(config.SESSIONS_ROOT, get_session_id())
+
+
+# --- MODIFIED FUNCTION TO CREATE A SESSION-SPECIFIC PATH ---
+def get_subject_db_path(subject_name: str) -> str:
+    """Generates a session-specific, unique path for a subject's vector store."""
+    sanitized_subject_name = "".join(c if c.isalnum() else "_" for c in subject_name.lower())
+    return os.path.join(get_session_base_path(), f"subject_{sanitized_subject_name}_db")
+
+
+# Subject lists keyed by session directory, valid while the directory's mtime is unchanged
+# (creating or deleting a subject store adds or removes an entry, which bumps it).
+_listing_cache = {}
+_listing_lock = threading.Lock()
+
+
+def _scan_subjects(session_base_path: str):
+    subjects = []
+    for item in os.listdir(session_base_path):
+        item_path = os.path.join(session_base_path, item)
+        # Check if it's a directory with the expected naming convention
+        if os.path.isdir(item_path) and item.startswith("subject_") and item.endswith("_db"):
+            subject_name_part = item[len("subject_"):-len("_db")]
+            readable_name = subject_name_part.replace("_", " ").title()
+            subjects.append(readable_name)
+    return sorted(list(set(subjects)))
+
+
+# --- MODIFIED FUNCTION TO LIST SUBJECTS FROM THE SESSION-SPECIFIC PATH ---
+def list_available_subjects():
+    """
+    Lists subject names based ONLY on the current session's database directories.
+    The directory is only re-scanned after it changed.
+    """
+    session_base_path = get_session_base_path()
+    get_janitor().touch(session_base_path)
+
+    try:
+        mtime_ns = os.stat(session_base_path).st_mtime_ns
+    except OSError:
+        return []
+    with _listing_lock:
+        cached = _listing_cache.get(session_base_path)
+        if cached and cached[0] == mtime_ns:
+            return list(cached[1])
+    subjects = _scan_subjects(session_base_path)
+    with _listing_lock:
+        _listing_cache[session_base_path] = (mtime_ns, subjects)
+    return list(subjects)
+
+
+def invalidate_subject_listing(session_base_path: str = None):
+    """Forgets the cached subject list (of one session directory, or of all)."""
+    with _listing_lock:
+        if session_base_path is None:
+            _listing_cache.clear()
+        else:
+            _listing_cache.pop(session_base_path, None)
@@ -0,0 +1,97 @@
+# --- 1. Standard library imports ---
+import io
+import json
+import time
+import zipfile
+
+# --- 2. Third-party imports ---
+import numpy as np
+
+# --- 3. Local application imports ---
+from src import config
+
+SNAPSHOT_FORMAT = "course-companion-subject-snapshot"
+HEADER_FILE_NAME = "snapshot.json"
+VECTORS_FILE_NAME = "vectors.npy"
+CHUNKS_FILE_NAME = "chunks.json"
+SIDECAR_PREFIX = "sidecars/"
+
+
+class SubjectSnapshot:
+    """
+    A portable copy of one subject: its chunk embeddings as a float16 .npy matrix, chunk
+    IDs, texts and metadata as compressed JSON, its sidecar files (manifest, BM25 index,
+    summaries, ...) and the embedding model the vectors came from, in one zip archive.
+    Importing a snapshot needs no embedding calls.
+    """
+
+    def __init__(self, header: dict, ids, texts, metadatas, vectors: np.ndarray, sidecars: dict):
+        self.header = header
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.vectors = vectors
+        self.sidecars = sidecars  # sidecar file suffix (e.g. "_manifest.json") -> bytes
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def create(cls, subject_name: str, ids, texts, metadatas, vectors: np.ndarray, sidecars: dict):
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "version": config.SNAPSHOT_FORMAT_VERSION,
+            "subject_name": subject_name,
+            "embedding_model": config.EMBEDDING_MODEL_NAME,
+            "embedding_task_type": config.EMBEDDING_TASK_TYPE,
+            "dimensions": int(vectors.shape[1]) if len(ids) else 0,
+            "chunk_count": len(ids),
+            "created_at": time.time(),
+        }
+        return cls(header, ids, texts, metadatas, vectors, sidecars)
+
+    def check_compatible(self):
+        """Raises ValueError unless this app can search the snapshot's vectors."""
+        header = self.header
+        model = (header["embedding_model"], header["embedding_task_type"])
+        if model != (config.EMBEDDING_MODEL_NAME, config.EMBEDDING_TASK_TYPE):
+            raise ValueError(
+                f"This snapshot was embedded with {model[0]} ({model[1]}), but this app uses "
+                f"{config.EMBEDDING_MODEL_NAME} ({config.EMBEDDING_TASK_TYPE}); re-upload the PDFs instead."
+            )
+
+    def write(self, binary_stream):
+        vectors_buffer = io.BytesIO()
+        np.save(vectors_buffer, self.vectors.astype(np.float16), allow_pickle=False)
+        with zipfile.ZipFile(binary_stream, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(HEADER_FILE_NAME, json.dumps(self.header))
+            # float16 embeddings barely compress; storing them keeps export and import fast.
+            archive.writestr(VECTORS_FILE_NAME, vectors_buffer.getvalue(), compress_type=zipfile.ZIP_STORED)
+            archive.writestr(CHUNKS_FILE_NAME, json.dumps(
+                {"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, separators=(",", ":")
+            ))
+            for suffix, content in self.sidecars.items():
+                archive.writestr(SIDECAR_PREFIX + suffix, content)
+
+    @classmethod
+    def read(cls, binary_stream):
+        """Reads a snapshot archive. Raises ValueError if it is not one this app can read."""
+        try:
+            with zipfile.ZipFile(binary_stream) as archive:
+                header = json.loads(archive.read(HEADER_FILE_NAME))
+                if header.get("format") != SNAPSHOT_FORMAT:
+                    raise ValueError("Not a subject snapshot.")
+                if header["version"] > config.SNAPSHOT_FORMAT_VERSION:
+                    raise ValueError(f"Snapshot format version {header['version']} is newer than this app supports.")
+                chunks = json.loads(archive.read(CHUNKS_FILE_NAME))
+                vectors = np.load(io.BytesIO(archive.read(VECTORS_FILE_NAME)), allow_pickle=False)
+                sidecars = {
+                    name[len(SIDECAR_PREFIX):]: archive.read(name)
+                    for name in archive.namelist()
+                    if name.startswith(SIDECAR_PREFIX)
+                }
+        except (zipfile.BadZipFile, KeyError) as e:
+            raise ValueError(f"Unreadable subject snapshot: {e}") from e
+        if len(vectors) != len(chunks["ids"]):
+            raise ValueError("Corrupt subject snapshot: vector and chunk counts differ.")
+        return cls(header, chunks["ids"], chunks["texts"], chunks["metadatas"], vectors, sidecars)
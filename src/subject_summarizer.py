@@ -0,0 +1,221 @@
+# --- 1. Standard library imports ---
+import hashlib
+
+# --- 2. Third-party imports ---
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+# --- 3. Local application imports ---
+from src import config
+from src.context_packer import estimate_tokens
+from src.ingest_manifest import SubjectManifest
+from src.instrumentation import record_count, span
+from src.near_duplicates import NearDuplicateIndex, get_near_duplicate_index_path
+from src.rag_chain_builder import get_llm
+from src.summary_cache import PartialSummaryCache
+
+MAP_PROMPT_TEMPLATE = """You are an expert academic assistant building a study guide for an engineering course.
+Summarize the following excerpt from the course document "{document}".
+
+- List every key concept, definition, equation and worked method it covers, as concise bullet points.
+- Keep equations and numerical values exactly as written.
+- Do not add information that is not in the excerpt.
+
+---
+Excerpt:
+{text}
+---
+
+Summary of the excerpt:"""
+
+COMBINE_PROMPT_TEMPLATE = """You are an expert academic assistant building a study guide for an engineering course.
+The following are partial summaries of {scope}. Combine them into a single summary as concise bullet points.
+Keep every distinct concept, definition and equation, and remove repetition.
+
+---
+Partial summaries:
+{text}
+---
+
+Combined summary:"""
+
+FINAL_PROMPT_TEMPLATE = """You are an expert academic assistant tasked with creating a comprehensive study guide for the subject "{subject}".
+
+Below are summaries of every document in the subject. Based on them, generate a detailed, multi-section summary of the whole subject. The summary should be easy to read and well-structured.
+
+### High-Level Overview
+A single paragraph that concisely summarizes the main subject matter across all documents.
+
+### Key Topics & Concepts
+- Identify the most important topics covered across the documents (typically 5-10).
+- For each topic, provide a short, clear explanation and mention which document(s) cover it.
+
+### Concluding Summary
+A final paragraph that ties the key topics together and reiterates the overall importance of the subject matter.
+
+---
+Document Summaries:
+{context}
+---
+
+Comprehensive Summary:"""
+
+
+def _hash_texts(texts) -> str:
+    return hashlib.sha256("\x00".join(texts).encode("utf-8")).hexdigest()
+
+
+def _get_chunks(vector_store, **get_kwargs):
+    result = vector_store.get(include=["documents", "metadatas"], **get_kwargs)
+    return list(zip(result["ids"], result["documents"], result["metadatas"]))
+
+
+def _collect_documents(vector_store, manifest: SubjectManifest, near_duplicates: NearDuplicateIndex):
+    """
+    Returns [(document name, content hash, chunk texts in reading order)] for every
+    document in the subject. The content hash is the file hash from the ingest manifest,
+    or a hash of the stored text for stores ingested before manifests existed. A chunk
+    merged into a near-duplicate at ingest is read from the stored chunk standing for it.
+    """
+    documents = []
+    for file_name, record in sorted(manifest.data["files"].items()):
+        if manifest.storage == "shared":
+            chunks = _get_chunks(vector_store, where={"doc_hash": record["file_hash"]})
+            # Shared chunk IDs end in "-<page>-<chunk index>".
+            chunks.sort(key=lambda chunk: tuple(int(part) for part in chunk[0].rsplit("-", 2)[1:]))
+            texts = [text for _, text, _ in chunks]
+        else:
+            chunk_ids = [
+                chunk_id
+                for _, page in sorted(record["pages"].items(), key=lambda item: int(item[0]))
+                for chunk_id in page["chunk_ids"]
+            ]
+            stored_ids = [near_duplicates.canonical_id(chunk_id) for chunk_id in chunk_ids]
+            unique_ids = list(dict.fromkeys(stored_ids))
+            text_of = {}
+            for start in range(0, len(unique_ids), 500):
+                text_of.update(
+                    (chunk_id, text) for chunk_id, text, _ in _get_chunks(vector_store, ids=unique_ids[start:start + 500])
+                )
+            texts = [text_of[chunk_id] for chunk_id in stored_ids if chunk_id in text_of]
+        if texts:
+            documents.append((file_name, record["file_hash"], texts))
+
+    if not manifest.data["files"]:
+        by_source = {}
+        for _, text, metadata in _get_chunks(vector_store):
+            by_source.setdefault(metadata.get("source", "Unknown"), []).append((metadata.get("page", 0), text))
+        for source, page_texts in sorted(by_source.items()):
+            texts = [text for _, text in sorted(page_texts, key=lambda item: item[0])]
+            documents.append((source, _hash_texts(texts), texts))
+    return documents
+
+
+def _group_by_budget(texts, max_tokens: int):
+    """Greedily groups consecutive texts so each group stays within `max_tokens`."""
+    groups, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+class SubjectSummarizer:
+    """
+    Map-reduce summarization of every document in one subject.
+    Map: each document (or each section of a long document) is summarized, all in
+    parallel. Reduce: partial summaries are combined in parallel rounds until they fit
+    SUMMARY_REDUCE_MAX_TOKENS. Per-document summaries are cached by content hash.
+    """
+
+    def __init__(self, vector_store, subject_db_path: str, llm):
+        self.vector_store = vector_store
+        self.subject_db_path = subject_db_path
+        self.llm = llm
+        self.model_name = getattr(llm, "model", None) or config.LLM_MODEL_NAME
+        self.map_chain = PromptTemplate.from_template(MAP_PROMPT_TEMPLATE) | llm | StrOutputParser()
+        self.combine_chain = PromptTemplate.from_template(COMBINE_PROMPT_TEMPLATE) | llm | StrOutputParser()
+
+    def _batch(self, chain, inputs):
+        return chain.batch(inputs, config={"max_concurrency": config.SUMMARY_MAX_CONCURRENCY})
+
+    def _reduce(self, summaries, scope: str, max_tokens: int):
+        """Combines summaries in parallel rounds until they fit `max_tokens` (or cannot shrink further)."""
+        while len(summaries) > 1 and sum(estimate_tokens(s) for s in summaries) > max_tokens:
+            groups = _group_by_budget(summaries, max_tokens)
+            if len(groups) == len(summaries):
+                break  # Every summary is too large to pair with another; nothing left to combine.
+            with span("summary.reduce", groups=len(groups)):
+                combined = self._batch(
+                    self.combine_chain,
+                    [{"scope": scope, "text": "\n\n".join(group)} for group in groups if len(group) > 1]
+                )
+            combined_iter = iter(combined)
+            summaries = [next(combined_iter) if len(group) > 1 else group[0] for group in groups]
+        return summaries
+
+    def summarize_documents(self):
+        """Returns [(document name, summary)], calling the LLM only for uncached documents."""
+        manifest = SubjectManifest.load(self.subject_db_path)
+        near_duplicates = NearDuplicateIndex.load(get_near_duplicate_index_path(self.subject_db_path))
+        documents = _collect_documents(self.vector_store, manifest, near_duplicates)
+        cache = PartialSummaryCache.load(self.subject_db_path)
+        keys = [
+            PartialSummaryCache.make_key(content_hash, self.model_name, config.SUMMARY_PROMPT_VERSION)
+            for _, content_hash, _ in documents
+        ]
+
+        pending = [i for i, key in enumerate(keys) if cache.get(key) is None]
+        record_count("summary_documents_cached", len(documents) - len(pending))
+        if pending:
+            section_budget = config.SUMMARY_MAP_SECTION_TOKENS
+            sections = [
+                (i, "\n\n".join(group))
+                for i in pending
+                for group in _group_by_budget(documents[i][2], section_budget)
+            ]
+            with span("summary.map", sections=len(sections)):
+                section_summaries = self._batch(
+                    self.map_chain,
+                    [{"document": documents[i][0], "text": text} for i, text in sections]
+                )
+            record_count("summary_map_calls", len(sections))
+
+            for i in pending:
+                summaries = [summary for (doc_i, _), summary in zip(sections, section_summaries) if doc_i == i]
+                if len(summaries) > 1:
+                    summaries = self._reduce(summaries, f'the document "{documents[i][0]}"', section_budget)
+                cache.put(keys[i], documents[i][0], "\n\n".join(summaries))
+            cache.save(keep_keys=keys)
+
+        return [(name, cache.get(key)) for (name, _, _), key in zip(documents, keys)]
+
+    def prepare_final_input(self, subject_label: str) -> dict:
+        """Runs the map and intermediate reduce steps; returns the input for the final prompt."""
+        partials = [f"#### {name}\n{summary}" for name, summary in self.summarize_documents()]
+        if not partials:
+            return {"subject": subject_label, "context": "(No documents have been processed for this subject yet.)"}
+        partials = self._reduce(partials, f'the subject "{subject_label}"', config.SUMMARY_REDUCE_MAX_TOKENS)
+        return {"subject": subject_label, "context": "\n\n".join(partials)}
+
+
+def create_subject_summary_chain(vector_store, subject_db_path: str, gemini_api_key: str, llm=None):
+    """
+    Creates a chain that summarizes the whole subject. Its input is the subject's display
+    name; the final summary streams like create_summarization_chain's output.
+    """
+    llm = llm or get_llm(gemini_api_key)
+    summarizer = SubjectSummarizer(vector_store, subject_db_path, llm)
+    return (
+        RunnableLambda(summarizer.prepare_final_input)
+        | PromptTemplate.from_template(FINAL_PROMPT_TEMPLATE)
+        | llm
+        | StrOutputParser()
+    )
@@ -0,0 +1,57 @@
+# --- 1. Standard library imports ---
+import json
+import os
+import threading
+
+
+def get_summary_cache_path(subject_db_path: str) -> str:
+    """Partial summaries are persisted next to (not inside) the subject's Chroma directory."""
+    return f"{subject_db_path}_summaries.json"
+
+
+class PartialSummaryCache:
+    """
+    Per-document summaries for one subject, keyed by the document's content hash plus
+    the model and prompt version that produced them. Entries for documents no longer in
+    the subject are pruned on save.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, path: str, entries: dict = None):
+        self.path = path
+        self.entries = entries or {}
+
+    @staticmethod
+    def make_key(content_hash: str, model_name: str, prompt_version: int) -> str:
+        return f"{model_name}:{prompt_version}:{content_hash}"
+
+    @classmethod
+    def load(cls, subject_db_path: str):
+        path = get_summary_cache_path(subject_db_path)
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return cls(path, json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"WARNING: Ignoring unreadable summary cache {path}: {e}")
+        return cls(path)
+
+    def get(self, key: str):
+        entry = self.entries.get(key)
+        return entry["summary"] if entry else None
+
+    def put(self, key: str, document_name: str, summary: str):
+        self.entries[key] = {"document": document_name, "summary": summary}
+
+    def save(self, keep_keys=None):
+        """Writes the cache atomically, keeping only `keep_keys` if given."""
+        if keep_keys is not None:
+            keep_keys = set(keep_keys)
+            self.entries = {key: entry for key, entry in self.entries.items() if key in keep_keys}
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(temp_path, self.path)
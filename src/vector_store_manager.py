@@ -1,106 +1,284 @@
 import os
-import shutil
-import tempfile
+import numpy as np
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_chroma import Chroma
-from streamlit.runtime.scriptrunner import get_script_run_ctx # <<< ADD THIS IMPORT
-
-# --- NEW HELPER FUNCTION TO GET A UNIQUE SESSION ID ---
-def get_session_id():
-    """Returns the unique ID for the current user's browser session."""
-    try:
-        ctx = get_script_run_ctx()
-        if ctx is None:
-            # This can happen in a non-Streamlit context (like local testing).
-            # We'll return a static ID for that case.
-            return "local_test_session"
-        return ctx.session_id
-    except Exception:
-        # Fallback if get_script_run_ctx is not available
-        return "fallback_session_id"
-
-
-# --- MODIFIED FUNCTION TO CREATE A SESSION-SPECIFIC PATH ---
-def get_subject_db_path(subject_name: str) -> str:
-    """Generates a session-specific, unique path for a subject's vector store."""
-    session_id = get_session_id()
-    # Create a unique base path for this session inside the system's temp directory
-    session_base_path = os.path.join(tempfile.gettempdir(), session_id)
-    
-    sanitized_subject_name = "".join(c if c.isalnum() else "_" for c in subject_name.lower())
-    return os.path.join(session_base_path, f"subject_{sanitized_subject_name}_db")
-
-
-# --- MODIFIED FUNCTION TO LIST SUBJECTS FROM THE SESSION-SPECIFIC PATH ---
-def list_available_subjects():
-    """Lists subject names based ONLY on the current session's database directories."""
-    session_id = get_session_id()
-    session_base_path = os.path.join(tempfile.gettempdir(), session_id)
-    
-    subjects = []
-    if os.path.exists(session_base_path):
-        for item in os.listdir(session_base_path):
-            item_path = os.path.join(session_base_path, item)
-            # Check if it's a directory with the expected naming convention
-            if os.path.isdir(item_path) and item.startswith("subject_") and item.endswith("_db"):
-                subject_name_part = item[len("subject_"):-len("_db")]
-                readable_name = subject_name_part.replace("_", " ").title()
-                subjects.append(readable_name)
-    return sorted(list(set(subjects)))
+from src import config
+from src.embedding_cache import CachedEmbeddings
+from src.embedding_pipeline import ConcurrentBatchEmbeddings
+from src.gemini_gateway import GatewayEmbeddings, get_gateway
+from src.ingest_manifest import SubjectManifest
+from src.instrumentation import record_count, span
+from src.lexical_index import BM25Index, get_lexical_index_path
+from src.numpy_store import NumpyVectorStore, is_numpy_store
+from src.shared_store import SubjectView, open_shared_store
+from src.subject_snapshot import SubjectSnapshot
+from src.store_janitor import SUBJECT_SIDECAR_PATH_BUILDERS, get_janitor, get_subject_sidecar_paths, remove_subject_store
+# Re-exported: callers keep using vector_store_manager for session and subject paths.
+from src.subject_catalog import get_session_id, get_subject_db_path, invalidate_subject_listing, list_available_subjects
+
+
+def get_embeddings_model(gemini_api_key: str):
+    """
+    Builds the Gemini embeddings model wrapped in the shared on-disk embedding cache,
+    so only chunks that have never been embedded before are sent to the API. Cache misses
+    are embedded in concurrent, rate-limited batches through the key's Gemini gateway.
+    """
+    if not gemini_api_key:
+        raise ValueError("CRITICAL: A Gemini API Key must be provided to create the embeddings model.")
+
+    gemini_embeddings = GoogleGenerativeAIEmbeddings(
+        model=config.EMBEDDING_MODEL_NAME,
+        task_type=config.EMBEDDING_TASK_TYPE,
+        google_api_key=gemini_api_key
+    )
+    batched_embeddings = ConcurrentBatchEmbeddings(
+        GatewayEmbeddings(
+            gemini_embeddings,
+            get_gateway(gemini_api_key, "embeddings", requests_per_minute=config.EMBEDDING_REQUESTS_PER_MINUTE),
+            model_name=f"{config.EMBEDDING_MODEL_NAME}:{config.EMBEDDING_TASK_TYPE}"
+        )
+    )
+    return CachedEmbeddings(
+        batched_embeddings,
+        model_name=config.EMBEDDING_MODEL_NAME,
+        task_type=config.EMBEDDING_TASK_TYPE
+    )
+
+
+def get_subject_backend(subject_db_path: str) -> str:
+    """The backend of an existing dedicated store, or config.VECTOR_BACKEND for a new one."""
+    if is_numpy_store(subject_db_path):
+        return "numpy"
+    if os.path.isdir(subject_db_path) and os.listdir(subject_db_path):
+        return "chroma"
+    return config.VECTOR_BACKEND
+
+
+def open_dedicated_store(subject_db_path: str, embeddings_model, backend: str = None):
+    """Opens (creating if needed) a subject's own store with the given or detected backend."""
+    backend = backend or get_subject_backend(subject_db_path)
+    if backend == "numpy":
+        return NumpyVectorStore(subject_db_path, embeddings_model)
+    return Chroma(
+        persist_directory=subject_db_path,
+        embedding_function=embeddings_model
+    )
 
 
 # --- This function is now PERFECT because it uses the new get_subject_db_path ---
-def create_or_load_subject_vector_store(subject_name: str, gemini_api_key: str, docs_to_add=None, embeddings_model=None):
+def create_or_load_subject_vector_store(subject_name: str, gemini_api_key: str, docs_to_add=None, embeddings_model=None, backend=None):
     """
     Creates or loads a vector store in a session-specific directory.
+    `backend` ("chroma" or "numpy") only applies to new stores; existing stores keep theirs.
     """
     if embeddings_model is None:
-        if not gemini_api_key:
-            raise ValueError("CRITICAL: A Gemini API Key must be provided to create the embeddings model.")
-        
-        embeddings_model = GoogleGenerativeAIEmbeddings(
-            model="models/embedding-001",
-            task_type="retrieval_document",
-            google_api_key=gemini_api_key
-        )
-        
+        embeddings_model = get_embeddings_model(gemini_api_key)
+
     subject_db_path = get_subject_db_path(subject_name)
+    get_janitor().touch(subject_db_path)
+
+    if not docs_to_add:
+        manifest = SubjectManifest.load(subject_db_path)
+        if manifest.storage == "shared":
+            # The subject is a view onto the host-wide content-addressed store.
+            return SubjectView(open_shared_store(embeddings_model), manifest.file_names_by_hash())
 
     if docs_to_add:
         if not os.path.exists(subject_db_path):
             os.makedirs(subject_db_path, exist_ok=True)
-            vector_store = Chroma.from_documents(
-                documents=docs_to_add,
-                embedding=embeddings_model,
-                persist_directory=subject_db_path
-            )
+            vector_store = open_dedicated_store(subject_db_path, embeddings_model, backend)
+            vector_store.add_documents(documents=docs_to_add)
         else:
-            vector_store = Chroma(
-                persist_directory=subject_db_path,
-                embedding_function=embeddings_model
-            )
+            vector_store = open_dedicated_store(subject_db_path, embeddings_model)
             vector_store.add_documents(documents=docs_to_add)
     else:
         if os.path.exists(subject_db_path):
-            vector_store = Chroma(
-                persist_directory=subject_db_path,
-                embedding_function=embeddings_model
-            )
+            vector_store = open_dedicated_store(subject_db_path, embeddings_model)
         else:
             return None
     return vector_store
 
 
+def get_subject_index_version(subject_name: str) -> int:
+    """Returns a counter that increases every time the subject's stored documents change."""
+    return SubjectManifest.load(get_subject_db_path(subject_name)).index_version
+
+
+def load_lexical_index(subject_name: str) -> BM25Index:
+    """Loads the subject's BM25 index (empty if nothing has been indexed yet)."""
+    return BM25Index.load(get_lexical_index_path(get_subject_db_path(subject_name)))
+
+
+def add_document_batches(subject_name: str, gemini_api_key: str, doc_batches, embeddings_model=None, backend=None):
+    """
+    Adds a stream of document batches to the subject's vector store, creating it if needed
+    (with `backend`, or config.VECTOR_BACKEND, if it does not exist yet).
+    Each batch is embedded and persisted before the next one is pulled from the stream.
+    Returns the vector store and the number of chunks added.
+    """
+    if embeddings_model is None:
+        embeddings_model = get_embeddings_model(gemini_api_key)
+
+    subject_db_path = get_subject_db_path(subject_name)
+    backend = backend or get_subject_backend(subject_db_path)
+    os.makedirs(subject_db_path, exist_ok=True)
+    vector_store = open_dedicated_store(subject_db_path, embeddings_model, backend)
+
+    chunks_added = 0
+    for batch in doc_batches:
+        # Includes embedding the batch; the embedding.* spans break that part out.
+        with span("vector_store.add", chunks=len(batch)):
+            vector_store.add_documents(documents=batch)
+        record_count("chunks_stored", len(batch))
+        chunks_added += len(batch)
+    return vector_store, chunks_added
+
+
+def update_chunk_metadata(vector_store, updates: dict):
+    """Merges `updates` ({chunk ID: metadata fields}) into stored chunks' metadata; nothing is re-embedded."""
+    if not updates:
+        return
+    result = vector_store.get(ids=list(updates), include=["documents", "metadatas", "embeddings"])
+    if not result["ids"]:
+        return
+    metadatas = [
+        dict(metadata or {}, **updates[chunk_id]) for chunk_id, metadata in zip(result["ids"], result["metadatas"])
+    ]
+    with span("vector_store.update_metadata", chunks=len(metadatas)):
+        if isinstance(vector_store, NumpyVectorStore):
+            vector_store.add_embeddings(result["documents"], result["embeddings"], metadatas, ids=result["ids"])
+        else:
+            vector_store._collection.update(ids=result["ids"], metadatas=metadatas)
+
+
 # --- This function is also PERFECT because it uses the new get_subject_db_path ---
 def delete_subject_vector_store(subject_name: str):
     """Deletes the vector store directory for a given subject from the session's storage."""
     subject_db_path = get_subject_db_path(subject_name)
     if os.path.exists(subject_db_path):
         try:
-            shutil.rmtree(subject_db_path)
+            remove_subject_store(subject_db_path)
+            invalidate_subject_listing(os.path.dirname(subject_db_path))
             return True
         except Exception as e:
             print(f"Error deleting session-specific vector store: {e}")
             return False
     else:
-        return False
\ No newline at end of file
+        return False
+
+# --- SUBJECT SNAPSHOTS ---
+
+def _add_embedded_chunks(vector_store, ids, texts, metadatas, vectors):
+    """Bulk-loads chunks with precomputed embeddings into a dedicated store."""
+    if isinstance(vector_store, NumpyVectorStore):
+        vector_store.add_embeddings(texts, vectors, metadatas, ids=ids)
+    else:
+        vector_store._collection.upsert(
+            ids=ids,
+            embeddings=np.asarray(vectors, dtype=np.float32),
+            documents=texts,
+            metadatas=metadatas
+        )
+
+
+def export_subject_snapshot(subject_name: str, binary_stream, gemini_api_key: str = None, embeddings_model=None) -> int:
+    """
+    Writes a portable snapshot of the subject (embeddings, chunks, sidecar files) to a
+    binary stream, so it can be imported into another session without re-embedding.
+    Returns the number of chunks exported.
+    """
+    vector_store = create_or_load_subject_vector_store(subject_name, gemini_api_key, embeddings_model=embeddings_model)
+    if vector_store is None:
+        raise ValueError(f"Subject '{subject_name}' has no stored documents to export.")
+
+    subject_db_path = get_subject_db_path(subject_name)
+    ids, texts, metadatas, vector_pages = [], [], [], []
+    with get_janitor().lease(subject_db_path), span("snapshot.export") as attributes:
+        offset = 0
+        while True:
+            page = vector_store.get(
+                include=["documents", "metadatas", "embeddings"],
+                limit=config.SNAPSHOT_BATCH_SIZE,
+                offset=offset
+            )
+            if not page["ids"]:
+                break
+            ids.extend(page["ids"])
+            texts.extend(page["documents"])
+            metadatas.extend(page["metadatas"])
+            vector_pages.append(np.asarray(page["embeddings"], dtype=np.float32))
+            offset += len(page["ids"])
+
+        sidecars = {}
+        for sidecar_path in get_subject_sidecar_paths(subject_db_path):
+            with open(sidecar_path, "rb") as f:
+                sidecars[sidecar_path[len(subject_db_path):]] = f.read()
+        vectors = np.concatenate(vector_pages) if vector_pages else np.zeros((0, 0), dtype=np.float32)
+        SubjectSnapshot.create(subject_name, ids, texts, metadatas, vectors, sidecars).write(binary_stream)
+        attributes["chunks"] = len(ids)
+    return len(ids)
+
+
+def _adopt_snapshot_manifest(subject_db_path: str, snapshot: SubjectSnapshot):
+    manifest = SubjectManifest.load(subject_db_path)
+    if manifest.storage == "shared":
+        # An exported view onto the shared store comes back as a dedicated store. Its page
+        # hashes are unknown, so re-uploading a file replaces that file's imported chunks.
+        pages_by_file = {}
+        for chunk_id, metadata in zip(snapshot.ids, snapshot.metadatas):
+            pages = pages_by_file.setdefault(metadata.get("doc_hash"), {})
+            pages.setdefault(str(metadata.get("page")), {"hash": None, "chunk_ids": []})["chunk_ids"].append(chunk_id)
+        for file_name, file_record in list(manifest.data["files"].items()):
+            manifest.set_file(file_name, file_record["file_hash"], pages_by_file.get(file_record["file_hash"], {}))
+        manifest.set_storage("dedicated")
+    manifest.bump_index_version()
+    manifest.save()
+
+
+def import_subject_snapshot(subject_name: str, binary_stream, gemini_api_key: str = None, embeddings_model=None,
+                            backend=None) -> dict:
+    """
+    Creates a subject from a snapshot written by export_subject_snapshot(). Vectors are
+    bulk-loaded as they are; nothing is sent to the embeddings API. `subject_name`
+    defaults to the exported subject's name, which must not exist yet in this session.
+    Returns the subject name and the number of chunks imported.
+    """
+    snapshot = SubjectSnapshot.read(binary_stream)
+    snapshot.check_compatible()
+    subject_name = subject_name or snapshot.header["subject_name"]
+    subject_db_path = get_subject_db_path(subject_name)
+    if os.path.exists(subject_db_path):
+        raise ValueError(f"Subject '{subject_name}' already exists; import the snapshot under another name.")
+    if embeddings_model is None:
+        embeddings_model = get_embeddings_model(gemini_api_key)
+
+    # Only the sidecar files this app knows about are restored, and only next to this subject.
+    known_suffixes = {build_path(subject_db_path)[len(subject_db_path):] for build_path in SUBJECT_SIDECAR_PATH_BUILDERS}
+    with get_janitor().lease(subject_db_path), span("snapshot.import", chunks=len(snapshot)):
+        os.makedirs(subject_db_path, exist_ok=True)
+        vector_store = open_dedicated_store(subject_db_path, embeddings_model, backend)
+        for start in range(0, len(snapshot), config.SNAPSHOT_BATCH_SIZE):
+            end = start + config.SNAPSHOT_BATCH_SIZE
+            _add_embedded_chunks(
+                vector_store,
+                snapshot.ids[start:end],
+                snapshot.texts[start:end],
+                snapshot.metadatas[start:end],
+                snapshot.vectors[start:end]
+            )
+        for suffix, content in snapshot.sidecars.items():
+            if suffix in known_suffixes:
+                with open(subject_db_path + suffix, "wb") as f:
+                    f.write(content)
+        _adopt_snapshot_manifest(subject_db_path, snapshot)
+
+        lexical_index_path = get_lexical_index_path(subject_db_path)
+        if not os.path.exists(lexical_index_path):
+            lexical_index = BM25Index(lexical_index_path)
+            for chunk_id, text in zip(snapshot.ids, snapshot.texts):
+                lexical_index.add(chunk_id, text)
+            lexical_index.save()
+
+    record_count("chunks_imported", len(snapshot))
+    invalidate_subject_listing(os.path.dirname(subject_db_path))
+    return {"subject_name": subject_name, "chunks_imported": len(snapshot)}
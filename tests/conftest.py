@@ -0,0 +1,41 @@
+# --- 1. Standard library imports ---
+import os
+import tempfile
+
+# --- 2. Third-party imports ---
+import pytest
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiEmbeddings
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from src import config
+from src.subject_catalog import get_session_base_path, invalidate_subject_listing
+
+
+@pytest.fixture
+def session_dir(tmp_path, monkeypatch):
+    """Points session, subject and shared stores at a fresh temp directory; returns the session directory."""
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    monkeypatch.setattr(config, "SESSIONS_ROOT", str(tmp_path / "sessions"))
+    monkeypatch.setenv("COURSE_COMPANION_SESSION_ID", "test_session")
+    monkeypatch.setattr(config, "SHARED_VECTOR_DB_PATH", str(tmp_path / "shared_store"))
+    invalidate_subject_listing()
+    yield get_session_base_path()
+    invalidate_subject_listing()
+
+
+@pytest.fixture
+def embeddings():
+    return FakeGeminiEmbeddings(size=16)
+
+
+@pytest.fixture
+def make_pdf(tmp_path):
+    """Returns a function that writes a synthetic PDF and returns its bytes."""
+    def make(num_pages: int, seed: int = 0) -> bytes:
+        path = write_synthetic_pdf(str(tmp_path / f"synthetic_{num_pages}_{seed}.pdf"), num_pages, seed=seed)
+        with open(path, "rb") as f:
+            data = f.read()
+        os.remove(path)
+        return data
+    return make
@@ -0,0 +1,77 @@
+# --- 1. Standard library imports ---
+import io
+
+# --- 3. Local application imports ---
+from src import ingestion, vector_store_manager
+from src.answer_cache import CachedQAChain, SemanticAnswerCache
+from src.ingest_manifest import SubjectManifest
+from src.subject_catalog import session_scope
+
+
+class CountingChain:
+    """Stands in for the Q&A chain and counts how often it really answers."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, inputs, config=None):
+        self.calls += 1
+        return {"question": inputs["question"], "context": [], "answer": f"answer {self.calls}"}
+
+
+def test_similar_questions_hit_and_different_ones_miss():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    cache.store("subject", "What is entropy?", [1.0, 0.0], {"answer": "cached"})
+
+    assert cache.lookup("subject", [0.99, 0.05]) == {"answer": "cached"}
+    assert cache.lookup("subject", [0.6, 0.8]) is None
+    assert cache.lookup("other subject", [1.0, 0.0]) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_entries_and_subjects_are_evicted():
+    cache = SemanticAnswerCache(similarity_threshold=0.99, max_entries_per_subject=2, max_subjects=2)
+    cache.store("a", "q1", [1.0, 0.0, 0.0], {"answer": "1"})
+    cache.store("a", "q2", [0.0, 1.0, 0.0], {"answer": "2"})
+    cache.lookup("a", [1.0, 0.0, 0.0])  # q2 is now the least recently used entry
+    cache.store("a", "q3", [0.0, 0.0, 1.0], {"answer": "3"})
+
+    assert cache.lookup("a", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("a", [1.0, 0.0, 0.0]) == {"answer": "1"}
+
+    cache.store("b", "q", [1.0, 0.0, 0.0], {"answer": "b"})
+    cache.store("c", "q", [1.0, 0.0, 0.0], {"answer": "c"})  # "a" was used before "b"
+    assert cache.lookup("b", [1.0, 0.0, 0.0]) == {"answer": "b"}
+    assert cache.lookup("a", [1.0, 0.0, 0.0]) is None
+
+
+def _qa_chain(embeddings, cache, chain):
+    content_key = SubjectManifest.load(vector_store_manager.get_subject_db_path("Thermo")).content_key()
+    return CachedQAChain(chain, embeddings, subject_key=content_key, cache=cache)
+
+
+def _ingest(pdf_bytes, embeddings):
+    ingestion.ingest_pdf_stream("Thermo", None, "notes.pdf", io.BytesIO(pdf_bytes), embeddings_model=embeddings)
+
+
+def test_sessions_with_the_same_documents_share_answers(session_dir, embeddings, make_pdf):
+    cache, chain = SemanticAnswerCache(), CountingChain()
+    for session_id in ("student_a", "student_b"):
+        with session_scope(session_id):
+            _ingest(make_pdf(2), embeddings)
+            response = _qa_chain(embeddings, cache, chain).invoke("What is a Carnot cycle?")
+
+    assert chain.calls == 1
+    assert response["cached"] and response["answer"] == "answer 1"
+
+
+def test_reingesting_changed_documents_stops_serving_old_answers(session_dir, embeddings, make_pdf):
+    cache, chain = SemanticAnswerCache(), CountingChain()
+    _ingest(make_pdf(2), embeddings)
+    _qa_chain(embeddings, cache, chain).invoke("What is a Carnot cycle?")
+
+    _ingest(make_pdf(2, seed=1), embeddings)
+    response = _qa_chain(embeddings, cache, chain).invoke("What is a Carnot cycle?")
+
+    assert chain.calls == 2
+    assert "cached" not in response
@@ -0,0 +1,67 @@
+# --- 1. Standard library imports ---
+import io
+import json
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiChat, FakeProviderError
+from src import ingestion
+from src.batch_qa import load_answered_ids, run_batch_qa
+
+QUESTIONS = ["What is entropy?", "What is the Carnot cycle?", "Define enthalpy."]
+
+
+class FailingChat(FakeGeminiChat):
+    """Fails every prompt that mentions `failing_text`."""
+
+    failing_text: str = ""
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.failing_text in "\n".join(str(message.content) for message in messages):
+            raise FakeProviderError()
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def _write_questions(path):
+    with open(path, "w", encoding="utf-8") as f:
+        for question_id, question in enumerate(QUESTIONS):
+            f.write(json.dumps({"id": f"q{question_id}", "question": question}) + "\n")
+        f.write("\n")
+
+
+def _read_records(path):
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def test_a_rerun_only_retries_failed_questions(session_dir, embeddings, make_pdf, tmp_path):
+    ingestion.ingest_pdf_stream("Thermo", None, "notes.pdf", io.BytesIO(make_pdf(2)), embeddings_model=embeddings)
+    input_path, output_path = str(tmp_path / "questions.jsonl"), str(tmp_path / "answers.jsonl")
+    _write_questions(input_path)
+
+    first = run_batch_qa(
+        "Thermo", None, input_path, output_path, max_concurrency=2,
+        embeddings_model=embeddings, llm=FailingChat(response_tokens=5, failing_text="Carnot")
+    )
+    assert first == {"total": 3, "skipped": 0, "answered": 2, "failed": 1}
+    [failed] = [record for record in _read_records(output_path) if "error" in record]
+    assert failed["id"] == "q1"
+
+    # A line cut short by a killed run is ignored.
+    with open(output_path, "a", encoding="utf-8") as f:
+        f.write('{"id": "q1", "answ')
+    assert load_answered_ids(output_path) == {"q0", "q2"}
+
+    llm = FakeGeminiChat(response_tokens=5)
+    second = run_batch_qa("Thermo", None, input_path, output_path, embeddings_model=embeddings, llm=llm)
+    assert second == {"total": 3, "skipped": 2, "answered": 1, "failed": 0}
+    assert llm.request_count == 1
+    assert load_answered_ids(output_path) == {"q0", "q1", "q2"}
+    # The retried answer starts on a line of its own, after the cut-short one.
+    [retried] = [record for record in _read_records(output_path) if record.get("id") == "q1" and "answer" in record]
+    assert retried["sources"]
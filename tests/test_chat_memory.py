@@ -0,0 +1,69 @@
+# --- 1. Standard library imports ---
+import time
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiChat
+from src import rag_chain_builder
+from src.chat_memory import ChatMemory
+from src.numpy_store import NumpyVectorStore
+
+
+def _wait_for_summary(memory):
+    deadline = time.time() + 10
+    while memory._summarizing and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def _fill(memory, turns):
+    for turn in range(turns):
+        memory.add_turn(f"Question {turn}?", f"Answer {turn} " + "x" * 500)
+
+
+def test_older_turns_are_kept_verbatim_until_summarized():
+    memory = ChatMemory(window_turns=2, turn_max_chars=50, summary_max_words=10)
+    _fill(memory, 5)
+
+    history = memory.as_prompt_text()
+    # Turns that left the window wait for the summary, but at most one window's worth.
+    assert [f"Question {turn}?" in history for turn in range(5)] == [False, True, True, True, True]
+    assert "x" * 60 not in history and "Answer 4 " in history
+
+    memory.summarize_in_background(FakeGeminiChat(response_tokens=400))
+    _wait_for_summary(memory)
+
+    history = memory.as_prompt_text()
+    assert history.startswith("Summary of the earlier conversation: ")
+    assert len(memory.summary.split()) <= 11  # at most summary_max_words, plus "..."
+    assert [f"Question {turn}?" in history for turn in range(5)] == [False, False, False, True, True]
+
+
+def test_a_failed_summary_keeps_the_turns_for_the_next_attempt(capsys):
+    memory = ChatMemory(window_turns=1)
+    _fill(memory, 3)
+
+    memory.summarize_in_background(FakeGeminiChat(failure_rate=1.0))
+    _wait_for_summary(memory)
+
+    assert "WARNING: Could not summarize" in capsys.readouterr().out
+    assert memory.summary == "" and "Question 1?" in memory.as_prompt_text()
+    memory.summarize_in_background(FakeGeminiChat(response_tokens=5))
+    _wait_for_summary(memory)
+    assert memory.summary and "Question 1?" not in memory.as_prompt_text()
+
+
+def test_only_follow_ups_are_condensed_before_retrieval(tmp_path, embeddings):
+    store = NumpyVectorStore(str(tmp_path / "subject_db"), embeddings)
+    store.add_texts(["The Carnot cycle bounds heat engine efficiency."], metadatas=[{"source": "notes.pdf", "page": 1}])
+    llm = FakeGeminiChat(response_tokens=8)
+    chain = rag_chain_builder.create_rag_qa_chain(store, None, llm=llm)
+    memory = ChatMemory()
+
+    first = chain.invoke(memory.qa_input("What is the Carnot cycle?"))
+    assert llm.request_count == 1
+    assert first["standalone_question"] == "What is the Carnot cycle?"
+    memory.add_turn("What is the Carnot cycle?", first["answer"])
+
+    follow_up = chain.invoke(memory.qa_input("Why is it the most efficient?"))
+    assert llm.request_count == 3  # one condense call, one answer
+    assert follow_up["standalone_question"] != "Why is it the most efficient?"
+    assert follow_up["context"]
@@ -0,0 +1,52 @@
+# --- 2. Third-party imports ---
+from langchain_core.documents import Document
+
+# --- 3. Local application imports ---
+from src.context_packer import estimate_tokens, pack_documents
+
+TEXT = " ".join(f"word{i}" for i in range(200))
+
+
+def _doc(doc_id, text, page=1, source="notes.pdf"):
+    return Document(id=doc_id, page_content=text, metadata={"source": source, "page": page})
+
+
+def test_overlapping_chunks_of_a_page_are_merged_in_rank_order():
+    first, second = TEXT[:600], TEXT[500:]
+
+    packed = pack_documents([_doc("b", second), _doc("a", first)], token_budget=10_000)
+
+    assert len(packed) == 1
+    assert packed[0].id == "b"
+    assert packed[0].page_content == TEXT
+    assert packed[0].metadata["merged_chunks"] == 2
+
+
+def test_chunks_of_other_pages_are_never_merged():
+    packed = pack_documents([_doc("a", TEXT[:600]), _doc("b", TEXT[500:], page=2)], token_budget=10_000)
+
+    assert [doc.id for doc in packed] == ["a", "b"]
+
+
+def test_exact_and_near_duplicates_from_other_sources_are_dropped():
+    near_copy = TEXT.replace("word199", "word-last")
+    docs = [_doc("a", TEXT), _doc("b", TEXT.upper(), source="copy.pdf"), _doc("c", near_copy, source="other.pdf")]
+
+    assert [doc.id for doc in pack_documents(docs, token_budget=10_000)] == ["a"]
+
+
+def test_budget_skips_passages_that_do_not_fit_but_keeps_smaller_ones():
+    large, small = _doc("large", "x " * 400, page=1), _doc("small", "short passage", page=2)
+    best = _doc("best", "y " * 100, page=3)
+
+    packed = pack_documents([best, large, small], token_budget=100)
+
+    assert [doc.id for doc in packed] == ["best", "small"]
+    assert sum(estimate_tokens(doc.page_content) for doc in packed) <= 100
+
+
+def test_the_best_passage_is_trimmed_rather_than_sending_no_context():
+    packed = pack_documents([_doc("a", "z" * 1000)], token_budget=10)
+
+    assert len(packed) == 1
+    assert estimate_tokens(packed[0].page_content) <= 11
@@ -0,0 +1,76 @@
+# --- 2. Third-party imports ---
+import pytest
+from langchain_chroma import Chroma
+
+# --- 3. Local application imports ---
+from src.cross_subject_retriever import CrossSubjectRetriever, _search_subject
+from src.instrumentation import trace_request
+from src.numpy_store import NumpyVectorStore
+from src.subject_catalog import get_session_id, session_scope
+
+THERMO = ["The Carnot cycle bounds heat engine efficiency.", "Entropy of an isolated system never decreases."]
+FLUIDS = ["Laminar flow becomes turbulent above a critical Reynolds number.", "Bernoulli's equation relates pressure and speed."]
+
+
+@pytest.fixture
+def subject_stores(tmp_path, embeddings):
+    thermo = Chroma(collection_name="thermo", persist_directory=str(tmp_path / "thermo"), embedding_function=embeddings)
+    thermo.add_texts(THERMO, metadatas=[{"source": "thermo.pdf"}] * len(THERMO))
+    fluids = NumpyVectorStore(str(tmp_path / "fluids"), embeddings)
+    fluids.add_texts(FLUIDS, metadatas=[{"source": "fluids.pdf"}] * len(FLUIDS))
+    return [("Thermo", thermo), ("Fluids", fluids)]
+
+
+def test_backends_score_an_exact_match_on_the_same_scale(subject_stores, embeddings):
+    for (subject_name, store), text in zip(subject_stores, (THERMO[0], FLUIDS[0])):
+        [(doc, relevance)] = _search_subject(subject_name, store, embeddings.embed_query(text), k=1)
+        assert doc.page_content == text and doc.metadata["subject"] == subject_name
+        assert relevance == pytest.approx(1.0, abs=0.01)
+
+
+def test_results_are_merged_across_subjects_by_relevance(subject_stores, embeddings):
+    retriever = CrossSubjectRetriever(subject_stores=subject_stores, embeddings=embeddings, k=3, fetch_k=2)
+
+    docs = retriever.invoke(FLUIDS[1])
+
+    assert len(docs) == 3
+    assert docs[0].page_content == FLUIDS[1] and docs[0].metadata["subject"] == "Fluids"
+    assert {doc.metadata["subject"] for doc in docs} <= {"Thermo", "Fluids"}
+
+
+class SessionRecordingStore:
+    def __init__(self):
+        self.sessions = []
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4):
+        self.sessions.append(get_session_id())
+        return []
+
+
+def test_worker_searches_run_in_the_callers_context(subject_stores, embeddings):
+    recording_store = SessionRecordingStore()
+    retriever = CrossSubjectRetriever(
+        subject_stores=subject_stores + [("Recorded", recording_store)], embeddings=embeddings, k=2, fetch_k=2
+    )
+
+    with session_scope("student_a"), trace_request("question") as trace:
+        retriever.invoke(THERMO[0])
+
+    assert trace.to_dict()["stages"]["cross_subject.search"]["count"] == 3
+    assert recording_store.sessions == ["student_a"]
+
+
+class BrokenStore:
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k=4):
+        raise RuntimeError("store is gone")
+
+
+def test_a_broken_subject_does_not_fail_the_search(subject_stores, embeddings):
+    retriever = CrossSubjectRetriever(
+        subject_stores=subject_stores + [("Broken", BrokenStore())], embeddings=embeddings, k=4, fetch_k=2
+    )
+
+    docs = retriever.invoke(THERMO[1])
+
+    assert docs[0].page_content == THERMO[1]
+    assert "Broken" not in {doc.metadata["subject"] for doc in docs}
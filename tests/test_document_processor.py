@@ -0,0 +1,77 @@
+# --- 1. Standard library imports ---
+import io
+
+# --- 2. Third-party imports ---
+import pytest
+
+# --- 3. Local application imports ---
+from benchmarks.synthetic_pdf import write_synthetic_pdf
+from src import config, document_processor, ingestion
+
+
+@pytest.fixture(scope="module")
+def pdf_path(tmp_path_factory):
+    return write_synthetic_pdf(str(tmp_path_factory.mktemp("pdfs") / "notes.pdf"), num_pages=5)
+
+
+def _chunk_records(chunks):
+    return [(chunk.page_content, chunk.metadata["page"]) for chunk in chunks]
+
+
+def test_parallel_loader_matches_the_sequential_loader(pdf_path):
+    sequential = document_processor.split_documents(document_processor.load_pdf(pdf_path))
+
+    parallel = document_processor.load_and_split_pdfs_parallel([pdf_path], max_workers=2, pages_per_task=2)
+
+    assert _chunk_records(parallel) == _chunk_records(sequential)
+    assert {chunk.metadata["source"] for chunk in parallel} == {pdf_path}
+
+
+def test_stream_yields_bounded_batches_of_every_chunk(pdf_path):
+    expected = document_processor.load_and_split_pdfs_parallel([pdf_path], max_workers=1)
+
+    with open(pdf_path, "rb") as f:
+        batches = list(document_processor.stream_pdf_chunk_batches(f, "notes.pdf", batch_size=7))
+
+    assert all(len(batch) <= 7 for batch in batches)
+    streamed = [chunk for batch in batches for chunk in batch]
+    assert _chunk_records(streamed) == _chunk_records(expected)
+    assert {chunk.metadata["source"] for chunk in streamed} == {"notes.pdf"}
+
+
+def test_iter_batches_groups_any_iterable():
+    assert list(document_processor.iter_batches(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(document_processor.iter_batches([], 2)) == []
+
+
+def test_parallel_pages_arrive_in_order_with_the_page_count_first(pdf_path):
+    with open(pdf_path, "rb") as f:
+        expected = [(page.page_content, page.metadata) for page in document_processor.iter_pdf_pages(f, "notes.pdf")]
+    page_counts = []
+
+    pages = document_processor.iter_pdf_pages_parallel(
+        pdf_path, "notes.pdf", page_counts.append, max_workers=2, pages_per_task=2
+    )
+
+    assert [(page.page_content, page.metadata) for page in pages] == expected
+    assert page_counts == [5]
+
+
+def test_staged_uploads_are_parsed_across_processes(session_dir, embeddings, pdf_path, monkeypatch):
+    calls = []
+    parse_in_parallel = document_processor.iter_pdf_pages_parallel
+
+    def recording_parse(file_path, *args, **kwargs):
+        calls.append(file_path)
+        return parse_in_parallel(file_path, *args, **kwargs)
+
+    monkeypatch.setattr(config, "PDF_PARSE_WORKERS", 2)
+    monkeypatch.setattr(config, "PDF_PARSE_PAGES_PER_TASK", 2)
+    monkeypatch.setattr(document_processor, "iter_pdf_pages_parallel", recording_parse)
+    with open(pdf_path, "rb") as f:
+        staged = ingestion.ingest_pdf_stream("Thermo", None, "notes.pdf", f, embeddings_model=embeddings)
+    with open(pdf_path, "rb") as f:
+        in_memory = ingestion.ingest_pdf_stream("Fluids", None, "notes.pdf", io.BytesIO(f.read()), embeddings_model=embeddings)
+
+    assert calls == [pdf_path]
+    assert staged["chunks_added"] == in_memory["chunks_added"] > 0
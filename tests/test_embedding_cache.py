@@ -0,0 +1,57 @@
+# --- 2. Third-party imports ---
+import numpy as np
+import pytest
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiEmbeddings
+from src.embedding_cache import CachedEmbeddings, EmbeddingCache, hash_text
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(db_path=str(tmp_path / "cache.sqlite3"), max_entries=3)
+
+
+def test_vectors_round_trip_per_model_and_task_type(cache):
+    cache.put_many("model-a", "doc", [(hash_text("x"), [0.5, -1.0])])
+
+    assert cache.get_many("model-a", "doc", [hash_text("x")]) == {hash_text("x"): [0.5, -1.0]}
+    assert cache.get_many("model-b", "doc", [hash_text("x")]) == {}
+    assert cache.get_many("model-a", "doc:query", [hash_text("x")]) == {}
+
+
+def test_least_recently_used_rows_are_evicted_past_the_cap(cache, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr("src.embedding_cache.time.time", lambda: next(clock))
+    for name in ("a", "b", "c"):
+        cache.put_many("m", "doc", [(name, [1.0])])
+    cache.get_many("m", "doc", ["a"])  # "b" is now the least recently used
+    cache.put_many("m", "doc", [("d", [1.0])])
+
+    assert len(cache) == 3
+    assert set(cache.get_many("m", "doc", ["a", "b", "c", "d"])) == {"a", "c", "d"}
+
+
+def test_only_uncached_texts_reach_the_provider(cache):
+    fake = FakeGeminiEmbeddings(size=8)
+    embeddings = CachedEmbeddings(fake, "m", "doc", cache=cache)
+
+    first = embeddings.embed_documents(["alpha", "beta", "alpha"])
+    assert fake.texts_embedded == 2  # the repeated chunk is embedded once
+    assert first[0] == first[2]
+
+    second = embeddings.embed_documents(["beta", "alpha"])
+    assert fake.texts_embedded == 2
+    assert np.allclose(second, [first[1], first[0]], atol=1e-6)
+    assert (embeddings.hits, embeddings.misses) == (3, 2)
+
+
+def test_cache_persists_across_instances(tmp_path):
+    db_path = str(tmp_path / "cache.sqlite3")
+    CachedEmbeddings(FakeGeminiEmbeddings(size=8), "m", "doc", cache=EmbeddingCache(db_path)).embed_query("q")
+
+    fake = FakeGeminiEmbeddings(size=8)
+    vector = CachedEmbeddings(fake, "m", "doc", cache=EmbeddingCache(db_path)).embed_query("q")
+
+    assert fake.request_count == 0
+    assert vector == pytest.approx(fake._vector("q"))
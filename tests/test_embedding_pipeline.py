@@ -0,0 +1,58 @@
+# --- 1. Standard library imports ---
+import threading
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiEmbeddings, FakeProviderError
+from src.embedding_pipeline import ConcurrentBatchEmbeddings
+from src.gemini_gateway import GatewayEmbeddings, GeminiGateway
+from src.rate_limiter import TokenBucket
+
+
+class CountingBucket(TokenBucket):
+    def __init__(self):
+        super().__init__(rate_per_minute=60_000, capacity=1_000)
+        self.acquired = 0
+
+    def acquire(self, tokens: float = 1.0):
+        self.acquired += tokens
+        super().acquire(tokens)
+
+
+class FlakyEmbeddings(FakeGeminiEmbeddings):
+    """Fails the first `failures` requests with a transient provider error."""
+
+    def __init__(self, failures: int, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.failures -= 1
+            if self.failures >= 0:
+                self.request_count += 1
+                raise FakeProviderError()
+        return super().embed_documents(texts)
+
+
+def test_batches_keep_the_input_order():
+    fake = FakeGeminiEmbeddings(size=4, batch_size=3)
+    texts = [f"chunk {i}" for i in range(10)]
+
+    vectors = ConcurrentBatchEmbeddings(fake, batch_size=3, max_workers=4).embed_documents(texts)
+
+    assert vectors == [fake._vector(text) for text in texts]
+    assert fake.request_count == 4
+
+
+def test_every_provider_attempt_spends_a_token():
+    bucket = CountingBucket()
+    provider = FlakyEmbeddings(failures=2, size=4)
+    gateway = GeminiGateway("test", max_retries=3, retry_base_delay=0.001, rate_limiter=bucket)
+    embeddings = ConcurrentBatchEmbeddings(GatewayEmbeddings(provider, gateway), batch_size=2)
+
+    embeddings.embed_documents(["a", "b", "c"])
+
+    # Two batches plus two attempts that failed with a 503 and were retried.
+    assert provider.request_count == 4
+    assert bucket.acquired == 4
@@ -0,0 +1,157 @@
+# --- 1. Standard library imports ---
+import enum
+import threading
+import time
+from typing import Any
+
+# --- 2. Third-party imports ---
+import pytest
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiChat, FakeProviderError
+from src.gemini_gateway import CircuitBreaker, CircuitOpenError, GatewayChatModel, GeminiGateway
+from src.rate_limiter import is_rate_limit_error, is_transient_error
+
+
+class FlakyChat(FakeGeminiChat):
+    """Fails its first `failures_left` requests with a transient provider error."""
+
+    failures_left: int = 0
+    error: Any = None
+
+    def _fail(self):
+        if self.failures_left:
+            self.failures_left -= 1
+            self.request_count += 1
+            raise self.error or FakeProviderError()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self._fail()
+        return super()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self._fail()
+        yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def _gateway(monkeypatch, **kwargs):
+    gateway = GeminiGateway("test", **kwargs)
+    monkeypatch.setattr(gateway, "_backoff_delay", lambda attempt: 0.0)
+    return gateway
+
+
+def test_identical_concurrent_requests_reach_the_provider_once(monkeypatch):
+    chat = FakeGeminiChat(first_token_latency_seconds=0.2, response_tokens=5)
+    model = GatewayChatModel(underlying=chat, gateway=_gateway(monkeypatch))
+    answers = []
+
+    def ask():
+        answers.append(model.invoke("What is entropy?").content)
+
+    threads = [threading.Thread(target=ask) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert chat.request_count == 1
+    assert len(answers) == 5 and len(set(answers)) == 1
+    model.invoke("What is entropy?")
+    assert chat.request_count == 2
+
+
+def test_breaker_opens_lets_one_trial_through_and_closes(monkeypatch):
+    chat = FlakyChat(response_tokens=5, failures_left=3)
+    breaker = CircuitBreaker("test", failure_threshold=2, cooldown_seconds=0.05)
+    model = GatewayChatModel(underlying=chat, gateway=_gateway(monkeypatch, max_retries=0, breaker=breaker))
+
+    for _ in range(2):
+        with pytest.raises(FakeProviderError):
+            model.invoke("hello")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        model.invoke("hello")
+    assert chat.request_count == 2
+
+    # After the cooldown one trial is let through; it fails, so the circuit opens again.
+    time.sleep(0.06)
+    with pytest.raises(FakeProviderError):
+        model.invoke("hello")
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        model.invoke("hello")
+
+    time.sleep(0.06)
+    assert model.invoke("hello").content
+    assert breaker.state == "closed" and chat.request_count == 4
+
+
+def test_only_transient_errors_are_retried(monkeypatch):
+    flaky = FlakyChat(response_tokens=5, failures_left=2)
+    assert GatewayChatModel(underlying=flaky, gateway=_gateway(monkeypatch, max_retries=3)).invoke("hi").content
+    assert flaky.request_count == 3
+
+    streamed = FlakyChat(response_tokens=5, failures_left=2)
+    model = GatewayChatModel(underlying=streamed, gateway=_gateway(monkeypatch, max_retries=3))
+    assert len(list(model.stream("hi"))) == 5
+    assert streamed.request_count == 3
+
+    invalid = FlakyChat(response_tokens=5, failures_left=1, error=ValueError("400 INVALID_ARGUMENT: 1500 tokens"))
+    with pytest.raises(ValueError):
+        GatewayChatModel(underlying=invalid, gateway=_gateway(monkeypatch, max_retries=3)).invoke("hi")
+    assert invalid.request_count == 1
+
+
+def test_retry_warnings_count_every_attempt(monkeypatch, capsys):
+    flaky = FlakyChat(response_tokens=5, failures_left=2)
+    GatewayChatModel(underlying=flaky, gateway=_gateway(monkeypatch, max_retries=2)).invoke("hi")
+    streamed = FlakyChat(response_tokens=5, failures_left=2)
+    list(GatewayChatModel(underlying=streamed, gateway=_gateway(monkeypatch, max_retries=2)).stream("hi"))
+
+    warnings = [line for line in capsys.readouterr().out.splitlines() if line.startswith("WARNING")]
+    assert [line.split("(attempt ")[1].split(")")[0] for line in warnings] == ["1/3", "2/3"] * 2
+
+
+class StatusError(Exception):
+    def __init__(self, message="", **attributes):
+        super().__init__(message)
+        self.__dict__.update(attributes)
+
+
+class StatusCode(enum.Enum):
+    UNAVAILABLE = 14
+
+
+def _raised_from(cause):
+    try:
+        raise RuntimeError("Error calling model") from cause
+    except RuntimeError as e:
+        return e
+
+
+@pytest.mark.parametrize("error, rate_limited, transient", [
+    (FakeProviderError(), False, True),
+    (Exception("429 Resource has been exhausted (e.g. check quota)."), True, True),
+    (StatusError(status_code=429), True, True),
+    (StatusError("503 in the message", code=400), False, False),
+    (StatusError(code=lambda: StatusCode.UNAVAILABLE), False, True),
+    (StatusError(code=503, status="UNAVAILABLE"), False, True),
+    (_raised_from(StatusError(status_code=429)), True, True),
+    (Exception("Batch of 1500 texts took 5000 ms"), False, False),
+    (Exception("SERVICE_UNAVAILABLEISH"), False, False),
+    (TimeoutError("read timed out"), False, True),
+    (CircuitOpenError("503 UNAVAILABLE"), False, False),
+])
+def test_errors_are_classified_by_status_not_by_substring(error, rate_limited, transient):
+    assert is_rate_limit_error(error) == rate_limited
+    assert is_transient_error(error) == transient
+
+
+def test_an_open_circuit_is_never_retried(monkeypatch):
+    breaker = CircuitBreaker("test", failure_threshold=1, cooldown_seconds=60)
+    chat = FlakyChat(response_tokens=5, failures_left=1)
+    model = GatewayChatModel(underlying=chat, gateway=_gateway(monkeypatch, max_retries=5, breaker=breaker))
+
+    with pytest.raises(CircuitOpenError):
+        model.invoke("hi")
+    assert chat.request_count == 1 and breaker.state == "open"
@@ -0,0 +1,76 @@
+# --- 3. Local application imports ---
+from src.hybrid_retriever import HybridRetriever, reciprocal_rank_fusion
+from src.lexical_index import BM25Index, tokenize
+from src.numpy_store import NumpyVectorStore
+
+TEXTS = {
+    "c1": "Refrigerant R-134a is used in vapor compression refrigeration cycles.",
+    "c2": "The Rankine cycle models a steam power plant with a turbine and a pump.",
+    "c3": "Aluminium 6061-T6 has a yield strength of about 276 MPa.",
+    "c4": "Heat conduction follows Fourier's law.",
+}
+
+
+def test_engineering_tokens_stay_in_one_piece():
+    assert tokenize("R-134a and 6061-T6, k_eff!") == ["r-134a", "and", "6061-t6", "k_eff"]
+
+
+def test_bm25_ranks_matching_chunks_and_forgets_removed_ones(tmp_path):
+    index = BM25Index(str(tmp_path / "bm25.json"))
+    for doc_id, text in TEXTS.items():
+        index.add(doc_id, text)
+
+    assert index.search("rankine turbine", k=2)[0][0] == "c2"
+    index.remove("c2")
+    assert "c2" not in [doc_id for doc_id, _ in index.search("rankine turbine")]
+
+    index.save()
+    reloaded = BM25Index.load(index.path)
+    assert reloaded.search("6061-t6") == index.search("6061-t6")
+
+
+def test_rrf_favours_ids_ranked_well_by_both_lists():
+    assert reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "a"]])[0] == "b"
+
+
+def _retriever(tmp_path, embeddings):
+    store = NumpyVectorStore(str(tmp_path / "subject_db"), embeddings)
+    store.add_texts(list(TEXTS.values()), ids=list(TEXTS))
+    index = BM25Index()
+    for doc_id, text in TEXTS.items():
+        index.add(doc_id, text)
+    return HybridRetriever(vector_store=store, lexical_index=index, k=2, fetch_k=4)
+
+
+def test_short_keyword_queries_skip_the_query_embedding(tmp_path, embeddings):
+    retriever = _retriever(tmp_path, embeddings)
+    requests_before = embeddings.request_count
+
+    docs = retriever.invoke("R-134a")
+
+    assert [doc.id for doc in docs] == ["c1"]
+    assert embeddings.request_count == requests_before
+
+
+def test_long_queries_fuse_dense_and_lexical_results(tmp_path, embeddings):
+    retriever = _retriever(tmp_path, embeddings)
+    requests_before = embeddings.request_count
+
+    docs = retriever.invoke("what is the yield strength of aluminium 6061-T6 in MPa")
+
+    assert embeddings.request_count == requests_before + 1
+    assert len(docs) == 2 and "c3" in [doc.id for doc in docs]
+
+
+def test_short_questions_still_reach_dense_retrieval(tmp_path, embeddings):
+    retriever = _retriever(tmp_path, embeddings)
+    requests_before = embeddings.request_count
+
+    # "is" and "what" match lexically, but the question is not a keyword query.
+    docs = retriever.invoke("What is R-134a?")
+
+    assert embeddings.request_count == requests_before + 1
+    assert "c1" in [doc.id for doc in docs]
+    # Keywords the index has never seen cannot be answered lexically either.
+    retriever.invoke("enthalpy turbine")
+    assert embeddings.request_count == requests_before + 2
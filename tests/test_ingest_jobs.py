@@ -0,0 +1,121 @@
+# --- 1. Standard library imports ---
+import io
+import time
+
+# --- 2. Third-party imports ---
+import pytest
+from streamlit.testing.v1 import AppTest
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiEmbeddings
+from src import config, ingestion
+from src.ingest_jobs import IngestJobQueue
+from src.subject_catalog import session_scope
+
+
+def _session_id_script():
+    import streamlit as st
+
+    from src import subject_catalog
+
+    subject_catalog.ensure_workspace_id()
+    st.write(subject_catalog.get_session_id())
+    st.write(subject_catalog.get_session_id())
+
+
+def _read_only_script():
+    import streamlit as st
+
+    from src import subject_catalog
+
+    try:
+        st.write(subject_catalog.get_session_id())
+    except RuntimeError:
+        st.write("no workspace")
+
+
+def _run_with_workspace(workspace_id=None, script=_session_id_script):
+    app = AppTest.from_function(script)
+    if workspace_id is not None:
+        app.query_params[config.WORKSPACE_QUERY_PARAM] = workspace_id
+    app.run()
+    # AppTest keeps every query param as a list of values.
+    [url_id] = app.query_params.get(config.WORKSPACE_QUERY_PARAM, [None])
+    return [markdown.value for markdown in app.markdown], url_id
+
+
+def test_sessions_are_named_by_the_workspace_in_the_url():
+    (first, again), url_id = _run_with_workspace()
+    assert first == again == url_id and len(first) == 32
+
+    # The same URL (e.g. after a server restart) names the same session directory.
+    assert _run_with_workspace(first)[0] == [first, first]
+
+    # Anything that is not a workspace ID this app made is replaced, never used as a path.
+    (replaced, _), url_id = _run_with_workspace("../../etc")
+    assert replaced == url_id and replaced != "../../etc"
+
+
+def test_reading_the_session_id_never_changes_the_url():
+    assert _run_with_workspace(script=_read_only_script) == (["no workspace"], None)
+    assert _run_with_workspace("../../etc", script=_read_only_script) == (["no workspace"], "../../etc")
+
+    workspace_id = "0123456789abcdef0123456789abcdef"
+    assert _run_with_workspace(workspace_id, script=_read_only_script) == ([workspace_id], workspace_id)
+
+
+class ProcessKilled(BaseException):
+    """Stands in for the server process dying: not an Exception, so the job is not marked failed."""
+
+
+class DyingEmbeddings(FakeGeminiEmbeddings):
+    """Embeds `batches_before_death` batches, then 'kills the process'."""
+
+    def __init__(self, batches_before_death: int, **kwargs):
+        super().__init__(**kwargs)
+        self.batches_left = batches_before_death
+
+    def embed_documents(self, texts):
+        if not self.batches_left:
+            raise ProcessKilled()
+        self.batches_left -= 1
+        return super().embed_documents(texts)
+
+
+def _wait_until_finished(job):
+    deadline = time.time() + 30
+    while job.snapshot()["status"] in ("queued", "running") and time.time() < deadline:
+        time.sleep(0.01)
+    return job.snapshot()
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    monkeypatch.setattr(config, "INGEST_STREAM_BATCH_SIZE", 4)
+
+
+def test_a_job_killed_mid_ingest_resumes_from_its_checkpoint(session_dir, small_batches, make_pdf):
+    pdf = make_pdf(4)
+    with session_scope("reference"):
+        expected = ingestion.ingest_pdf_stream("Thermo", None, "notes.pdf", io.BytesIO(pdf),
+                                               embeddings_model=FakeGeminiEmbeddings(size=16))
+    assert expected["chunks_added"] > 8
+
+    with session_scope("student"):
+        killed = IngestJobQueue(max_workers=1).submit(
+            "Thermo", "notes.pdf", pdf, None, embeddings_model=DyingEmbeddings(2, size=16, batch_size=4)
+        )
+    state = _wait_until_finished(killed)
+    # The job died while running; its state on disk says so, with two batches checkpointed.
+    assert state["status"] == "running" and state["chunks_stored"] == 8
+
+    # A new process (a new queue) opened by the same workspace picks the job up again.
+    embeddings = FakeGeminiEmbeddings(size=16)
+    with session_scope("student"):
+        [resumed] = IngestJobQueue().resume_interrupted(None, embeddings_model=embeddings)
+    state = _wait_until_finished(resumed)
+
+    assert state["status"] == "done"
+    assert state["stats"]["chunks_resumed"] == 8
+    assert embeddings.texts_embedded == expected["chunks_added"] - 8
+    assert state["stats"]["chunks_added"] == expected["chunks_added"] - 8
@@ -0,0 +1,86 @@
+# --- 1. Standard library imports ---
+import io
+
+# --- 2. Third-party imports ---
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+# --- 3. Local application imports ---
+from src import config, ingestion, vector_store_manager
+from src.ingest_manifest import SubjectManifest
+from src.near_duplicates import appears_in
+
+
+def _replace_page(pdf_bytes: bytes, page_number: int, other_pdf_bytes: bytes) -> bytes:
+    """The same PDF with one page taken from another PDF."""
+    original, other = PdfReader(io.BytesIO(pdf_bytes)), PdfReader(io.BytesIO(other_pdf_bytes))
+    writer = PdfWriter()
+    for index, page in enumerate(original.pages):
+        writer.add_page(other.pages[0] if index == page_number else page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def _ingest(file_name, pdf_bytes, embeddings):
+    return ingestion.ingest_pdf_stream("Thermo", None, file_name, io.BytesIO(pdf_bytes), embeddings_model=embeddings)
+
+
+def test_reingest_only_embeds_changed_pages(session_dir, embeddings, make_pdf):
+    original = make_pdf(4)
+    first = _ingest("notes.pdf", original, embeddings)
+    assert (first["pages_embedded"], first["pages_skipped"]) == (4, 0)
+
+    assert _ingest("notes.pdf", original, embeddings)["file_skipped"]
+
+    embedded_before = embeddings.texts_embedded
+    edited = _ingest("notes.pdf", _replace_page(original, 2, make_pdf(1, seed=7)), embeddings)
+    assert (edited["pages_embedded"], edited["pages_skipped"]) == (1, 3)
+    assert embeddings.texts_embedded - embedded_before == edited["chunks_added"]
+    assert edited["chunks_deleted"] > 0
+
+    # The store holds exactly the chunks the manifest lists, and the index moved on.
+    manifest = SubjectManifest.load(vector_store_manager.get_subject_db_path("Thermo"))
+    store = vector_store_manager.create_or_load_subject_vector_store("Thermo", None, embeddings_model=embeddings)
+    assert sorted(store.get()["ids"]) == sorted(manifest.all_chunk_ids())
+    assert manifest.index_version == 2
+
+
+def test_removed_pages_are_deleted(session_dir, embeddings, make_pdf):
+    _ingest("notes.pdf", make_pdf(4), embeddings)
+    manifest = SubjectManifest.load(vector_store_manager.get_subject_db_path("Thermo"))
+    last_page_ids = manifest.get_file("notes.pdf")["pages"]["3"]["chunk_ids"]
+
+    shorter = PdfWriter(clone_from=PdfReader(io.BytesIO(make_pdf(4))))
+    shorter.remove_page(3)
+    buffer = io.BytesIO()
+    shorter.write(buffer)
+    stats = _ingest("notes.pdf", buffer.getvalue(), embeddings)
+
+    assert stats["pages_embedded"] == 0
+    assert stats["chunks_deleted"] == len(last_page_ids)
+    store = vector_store_manager.create_or_load_subject_vector_store("Thermo", None, embeddings_model=embeddings)
+    assert not set(last_page_ids) & set(store.get()["ids"])
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_stored_chunks_list_duplicates_ingested_later(session_dir, embeddings, make_pdf, monkeypatch, backend):
+    monkeypatch.setattr(config, "VECTOR_BACKEND", backend)
+    slides = make_pdf(2)
+    _ingest("lecture.pdf", slides, embeddings)
+    store = vector_store_manager.create_or_load_subject_vector_store("Thermo", None, embeddings_model=embeddings)
+    stored_ids = sorted(store.get()["ids"])
+
+    stats = _ingest("copy.pdf", slides, embeddings)
+
+    assert stats["chunks_added"] == 0 and stats["chunks_deduplicated"] == len(stored_ids)
+    result = store.get(include=["metadatas"])
+    assert sorted(result["ids"]) == stored_ids
+    for metadata in result["metadatas"]:
+        assert appears_in(metadata) == [("lecture.pdf", metadata["page"]), ("copy.pdf", metadata["page"])]
+
+    # Once the copy changes, its old pages no longer point at the stored chunks.
+    _ingest("copy.pdf", make_pdf(2, seed=3), embeddings)
+    result = store.get(ids=stored_ids, include=["metadatas"])
+    for metadata in result["metadatas"]:
+        assert appears_in(metadata) == [("lecture.pdf", metadata["page"])]
@@ -0,0 +1,58 @@
+# --- 1. Standard library imports ---
+import socket
+import urllib.request
+
+# --- 2. Local application imports ---
+from src import instrumentation
+from src.instrumentation import MetricsRegistry, record_count, span, trace_request
+
+
+def test_prometheus_text_has_counters_and_cumulative_histograms():
+    registry = MetricsRegistry(buckets=(0.1, 1))
+    registry.increment("requests_total", 2, cache='a"b')
+    registry.observe("duration_seconds", 0.05, stage="split")
+    registry.observe("duration_seconds", 0.5, stage="split")
+
+    lines = registry.render_prometheus().splitlines()
+
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{cache="a\\"b"} 2' in lines
+    assert 'duration_seconds_bucket{stage="split",le="0.1"} 1' in lines
+    assert 'duration_seconds_bucket{stage="split",le="1"} 2' in lines
+    assert 'duration_seconds_bucket{stage="split",le="+Inf"} 2' in lines
+    assert 'duration_seconds_count{stage="split"} 2' in lines
+
+
+def test_trace_collects_spans_and_counts_by_stage():
+    with trace_request("ingest") as trace:
+        for _ in range(3):
+            with span("embed"):
+                pass
+        record_count("chunks_stored", 5)
+        record_count("chunks_stored", 0)
+
+    result = trace.to_dict()
+    assert result["stages"]["embed"]["count"] == 3
+    assert result["counts"] == {"chunks_stored": 5}
+    assert result["total_seconds"] >= result["stages"]["embed"]["seconds"]
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def test_metrics_server_listens_on_localhost_by_default(monkeypatch):
+    monkeypatch.setattr(instrumentation, "_server", None)
+    assert instrumentation.start_metrics_server() is None  # No port configured.
+
+    server = instrumentation.start_metrics_server(port=_free_port())
+    try:
+        host, port = server.server_address[:2]
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+    finally:
+        server.shutdown()
+        server.server_close()
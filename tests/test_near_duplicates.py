@@ -0,0 +1,56 @@
+# --- 2. Third-party imports ---
+import numpy as np
+from langchain_core.documents import Document
+
+# --- 3. Local application imports ---
+from src.near_duplicates import NearDuplicateIndex, minhash_signature
+
+BASE = " ".join(f"word{i}" for i in range(120))
+
+
+def _chunk(chunk_id, text, source="lecture1.pdf", page=1):
+    return Document(id=chunk_id, page_content=text, metadata={"source": source, "page": page})
+
+
+def _filter(index, chunks):
+    stats = {"chunks_deduplicated": 0}
+    return [chunk.id for chunk in index.filter_chunks(chunks, stats)], stats["chunks_deduplicated"]
+
+
+def test_signatures_estimate_jaccard_similarity():
+    near = BASE.replace("word60", "changed")
+    unrelated = " ".join(f"other{i}" for i in range(120))
+
+    def similarity(a, b):
+        return float(np.mean(minhash_signature(a) == minhash_signature(b)))
+
+    assert similarity(BASE, BASE) == 1.0
+    assert similarity(BASE, near) > 0.85
+    assert similarity(BASE, unrelated) < 0.2
+
+
+def test_near_duplicates_become_references_of_the_stored_chunk(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dedup.json"))
+    chunks = [
+        _chunk("a", BASE),
+        _chunk("b", BASE.replace("word60", "changed"), source="lecture2.pdf", page=4),
+        _chunk("c", " ".join(f"other{i}" for i in range(120))),
+    ]
+
+    assert _filter(index, chunks) == (["a", "c"], 1)
+    assert index.references("b") == [("a", "lecture1.pdf", 1), ("b", "lecture2.pdf", 4)]
+    # Re-ingesting the same chunks stores nothing new.
+    assert _filter(index, chunks) == (["a", "c"], 0)
+
+
+def test_a_stored_chunk_is_deleted_only_when_nothing_references_it(tmp_path):
+    path = str(tmp_path / "dedup.json")
+    index = NearDuplicateIndex(path)
+    _filter(index, [_chunk("a", BASE), _chunk("b", BASE, source="copy.pdf")])
+    index.save()
+
+    reloaded = NearDuplicateIndex.load(path)
+    assert reloaded.release(["a"]) == []
+    assert reloaded.references("b") == [("b", "copy.pdf", 1)]
+    assert reloaded.release(["b", "untracked"]) == ["a", "untracked"]
+    assert len(reloaded) == 0
@@ -0,0 +1,100 @@
+# --- 1. Standard library imports ---
+import math
+import os
+
+# --- 2. Third-party imports ---
+import numpy as np
+import pytest
+
+# --- 3. Local application imports ---
+from src.numpy_store import SEGMENT_PREFIX, NumpyVectorStore, _quantize
+
+
+def _texts(start: int, count: int):
+    return [f"chunk {i} about topic {i % 7}" for i in range(start, start + count)]
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    return str(tmp_path / "subject_db")
+
+
+@pytest.mark.parametrize("dtype", ["float16", "int8"])
+def test_adds_upserts_and_deletes_match_a_reference(store_dir, embeddings, dtype):
+    store = NumpyVectorStore(store_dir, embeddings, dtype=dtype)
+    expected = {}
+    for start in range(0, 200, 20):
+        texts = _texts(start, 20)
+        ids = [f"id-{start + i}" for i in range(20)]
+        store.add_texts(texts, ids=ids, metadatas=[{"page": start + i} for i in range(20)])
+        expected.update(zip(ids, texts))
+    store.add_texts(["replaced text"], ids=["id-5"])
+    expected["id-5"] = "replaced text"
+    removed = [f"id-{i}" for i in range(40, 90)]
+    store.delete(ids=removed)
+    for chunk_id in removed:
+        del expected[chunk_id]
+
+    # A fresh instance reads the same version from disk.
+    reopened = NumpyVectorStore(store_dir, embeddings)
+    result = reopened.get(include=["documents", "embeddings"])
+    assert dict(zip(result["ids"], result["documents"])) == expected
+    vectors = np.asarray(embeddings.embed_documents(result["documents"]), dtype=np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert np.allclose(result["embeddings"], vectors, atol=0.02)
+
+    [(doc, score)] = reopened.similarity_search_with_score("replaced text", k=1)
+    assert doc.id == "id-5" and score == pytest.approx(1.0, abs=0.01)
+    assert not reopened.similarity_search("chunk 50 about topic 1", k=200, filter={"page": 50})
+
+
+def test_batched_ingest_does_not_rewrite_the_whole_store_per_batch(store_dir, embeddings, monkeypatch):
+    rows_written = []
+    write_segment = NumpyVectorStore._write_segment
+
+    def counting_write_segment(self, ids, *args):
+        rows_written.append(len(ids))
+        return write_segment(self, ids, *args)
+
+    monkeypatch.setattr(NumpyVectorStore, "_write_segment", counting_write_segment)
+    store = NumpyVectorStore(store_dir, embeddings)
+    batches, batch_size = 64, 10
+    for batch in range(batches):
+        store.add_texts(_texts(batch * batch_size, batch_size))
+
+    total_rows = batches * batch_size
+    assert len(store) == total_rows
+    # Each row is rewritten O(log N) times, not once per later batch.
+    assert sum(rows_written) <= total_rows * (math.log2(batches) + 2)
+    segment_names = {name.split(".", 1)[0] for name in os.listdir(store_dir) if name.startswith(SEGMENT_PREFIX)}
+    assert len(segment_names) <= math.log2(batches) + 1
+
+
+def test_mostly_deleted_segments_are_compacted(store_dir, embeddings):
+    store = NumpyVectorStore(store_dir, embeddings)
+    ids = store.add_texts(_texts(0, 100))
+
+    store.delete(ids=ids[:60])
+
+    snapshot = store._snapshot
+    assert len(snapshot) == 40 and len(snapshot.ids) == 40
+    assert all(not entry["deleted"] for entry in snapshot.entries)
+    store.delete(ids=ids[60:])
+    assert len(store) == 0 and not store.similarity_search("chunk", k=4)
+    assert not [name for name in os.listdir(store_dir) if name.startswith(SEGMENT_PREFIX)]
+
+
+def test_a_commit_leaves_other_instances_segments_alone(store_dir, embeddings):
+    store = NumpyVectorStore(store_dir, embeddings)
+    store.add_texts(_texts(0, 10))
+    # Another instance has written a segment it has not committed yet.
+    other = NumpyVectorStore(store_dir, embeddings)
+    vectors, scales = _quantize(np.full((1, 16), 0.25, dtype=np.float32), "float16")
+    pending = other._write_segment(["pending"], ["text"], [{}], vectors, scales)
+
+    store.add_texts(_texts(10, 10))  # merges this instance's two segments
+
+    on_disk = {name.split(".", 1)[0] for name in os.listdir(store_dir) if name.startswith(SEGMENT_PREFIX)}
+    assert on_disk == {entry["name"] for entry in store._snapshot.entries} | {pending["name"]}
+    assert not [name for name in os.listdir(store_dir) if name.endswith(".tmp")]
+
@@ -0,0 +1,74 @@
+# --- 2. Third-party imports ---
+import pytest
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiChat
+from src.numpy_store import NumpyVectorStore
+from src.quiz_bank import parse_quiz_text
+from src.quiz_engine import QuizEngine
+
+TEXTS = [
+    "The Carnot cycle is the most efficient heat engine cycle between two reservoirs.",
+    "Entropy of an isolated system never decreases.",
+    "Laminar flow becomes turbulent above a critical Reynolds number.",
+]
+
+
+@pytest.fixture
+def engine(tmp_path, embeddings):
+    subject_db_path = str(tmp_path / "subject_db")
+    store = NumpyVectorStore(subject_db_path, embeddings)
+    store.add_texts(TEXTS, metadatas=[{"source": "notes.pdf", "page": page} for page in range(len(TEXTS))])
+    return QuizEngine(store, subject_db_path, None, llm=FakeGeminiChat())
+
+
+def test_parse_quiz_text_keeps_only_well_formed_questions_with_known_sources(engine):
+    docs = engine.retriever.invoke("entropy")[:1]
+    text = (
+        "Q: What never decreases?\nA) Entropy\nB) Mass\nC) Heat\nD) Work\nAnswer: A\nSource: [SOURCE 1]\n"
+        "Q: Missing options?\nA) One\nAnswer: A\nSource: [SOURCE 1]\n"
+        "Q: Unknown source?\nA) a\nB) b\nC) c\nD) d\nAnswer: B\nSource: [SOURCE 2]\n"
+    )
+
+    [question] = parse_quiz_text(text, docs)
+
+    assert question["question"] == "What never decreases?"
+    assert question["answer"] == "A" and question["source_chunk_id"] == docs[0].id
+
+
+def test_a_bank_miss_streams_the_generated_questions(engine):
+    events = list(engine.stream_quiz("entropy", 4))
+
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "sources" and kinds[-1] == "questions"
+    assert kinds.count("token") > 1  # really token by token
+    assert "Answer:" in "".join(value for kind, value in events if kind == "token")
+    questions = events[-1][1]
+    assert questions and len(questions) == len(engine.bank)
+    # One cluster streamed, the other generated in parallel.
+    assert engine.quiz_chain.steps[1].request_count == 2
+
+
+def test_banked_questions_are_served_without_generating(engine):
+    engine.get_quiz("entropy", 4)
+    llm = engine.quiz_chain.steps[1]
+    calls = llm.request_count
+
+    events = list(engine.stream_quiz("entropy", 2))
+
+    assert [kind for kind, _ in events] == ["sources", "questions"]
+    assert len(events[-1][1]) == 2
+    assert llm.request_count == calls
+
+
+def test_quiz_sources_are_packed_like_every_other_chain(tmp_path, embeddings):
+    subject_db_path = str(tmp_path / "subject_db")
+    store = NumpyVectorStore(subject_db_path, embeddings)
+    # The same passage twice, e.g. from two copies of a handout.
+    texts = TEXTS + [TEXTS[1]]
+    store.add_texts(texts, metadatas=[{"source": "notes.pdf", "page": page} for page in range(len(texts))])
+    engine = QuizEngine(store, subject_db_path, None, llm=FakeGeminiChat())
+
+    docs = engine.retriever.invoke("entropy")
+
+    assert sorted(doc.page_content for doc in docs) == sorted(TEXTS)
@@ -0,0 +1,47 @@
+# --- 1. Standard library imports ---
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- 3. Local application imports ---
+from src.resource_registry import TTLCache
+
+
+def test_concurrent_misses_build_the_value_once():
+    cache, builds = TTLCache(ttl_seconds=60, max_entries=4), []
+
+    def build():
+        builds.append(threading.get_ident())
+        time.sleep(0.05)
+        return object()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        values = list(executor.map(lambda _: cache.get_or_create("key", build), range(8)))
+
+    assert len(builds) == 1
+    assert all(value is values[0] for value in values)
+
+
+def test_idle_entries_expire_and_the_least_recently_used_is_dropped(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr("src.resource_registry.time.monotonic", lambda: now[0])
+    cache = TTLCache(ttl_seconds=10, max_entries=2)
+    cache.get_or_create("a", lambda: "a1")
+    cache.get_or_create("b", lambda: "b1")
+    cache.get_or_create("a", lambda: "unused")  # "b" is now the least recently used
+    cache.get_or_create("c", lambda: "c1")
+
+    assert cache.get_or_create("b", lambda: "b2") == "b2"
+    now[0] = 11.0
+    assert cache.get_or_create("a", lambda: "a2") == "a2"
+
+
+def test_invalidate_drops_matching_keys():
+    cache = TTLCache(ttl_seconds=60, max_entries=4)
+    cache.get_or_create(("path/a", 1), lambda: "a")
+    cache.get_or_create(("path/b", 1), lambda: "b")
+
+    cache.invalidate(lambda key: key[0] == "path/a")
+
+    assert len(cache) == 1
+    assert cache.get_or_create(("path/b", 1), lambda: "unused") == "b"
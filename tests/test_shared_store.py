@@ -0,0 +1,96 @@
+# --- 1. Standard library imports ---
+import io
+import multiprocessing
+
+# --- 2. Third-party imports ---
+import pytest
+
+# --- 3. Local application imports ---
+from src import config, ingestion, shared_store, vector_store_manager
+from src.store_janitor import StoreJanitor
+from src.subject_catalog import session_scope
+
+
+@pytest.fixture
+def shared_mode(session_dir, monkeypatch):
+    monkeypatch.setattr(config, "SHARED_STORAGE_ENABLED", True)
+    return session_dir
+
+
+def _ingest(session_id, subject_name, file_name, pdf_bytes, embeddings):
+    with session_scope(session_id):
+        return ingestion.ingest_pdf_stream(subject_name, None, file_name, io.BytesIO(pdf_bytes), embeddings_model=embeddings)
+
+
+def _view(session_id, subject_name, embeddings):
+    with session_scope(session_id):
+        return vector_store_manager.create_or_load_subject_vector_store(subject_name, None, embeddings_model=embeddings)
+
+
+def test_identical_uploads_are_embedded_once_and_keep_each_sessions_name(shared_mode, embeddings, make_pdf):
+    pdf = make_pdf(2)
+    first = _ingest("student_a", "Thermo", "lecture1.pdf", pdf, embeddings)
+    second = _ingest("student_b", "Heat", "Week 1 notes.pdf", pdf, embeddings)
+    _ingest("student_c", "Other", "private.pdf", make_pdf(2, seed=3), embeddings)
+
+    assert first["chunks_added"] > 0 and second["chunks_added"] == 0
+    view_a, view_b = _view("student_a", "Thermo", embeddings), _view("student_b", "Heat", embeddings)
+    assert {doc.metadata["source"] for doc in view_a.similarity_search("entropy", k=10)} == {"lecture1.pdf"}
+    assert {doc.metadata["source"] for doc in view_b.similarity_search("entropy", k=10)} == {"Week 1 notes.pdf"}
+    assert {metadata["source"] for metadata in view_b.get()["metadatas"]} == {"Week 1 notes.pdf"}
+
+
+def _mark_documents(shared_path, prefix, count):
+    config.SHARED_VECTOR_DB_PATH = shared_path
+    for index in range(count):
+        shared_store.mark_document_stored(f"{prefix}{index}", index)
+
+
+def test_registry_updates_from_several_processes_are_not_lost(shared_mode):
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=_mark_documents, args=(config.SHARED_VECTOR_DB_PATH, prefix, 25))
+        for prefix in ("a", "b", "c")
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(shared_store._load_registry()) == 75
+
+
+def _open_shared_store(shared_path):
+    config.SHARED_VECTOR_DB_PATH = shared_path
+    try:
+        shared_store.open_shared_store(None)
+    except RuntimeError:
+        raise SystemExit(3)
+
+
+def test_only_one_process_per_host_opens_the_shared_store(shared_mode):
+    shared_store.open_shared_store(None)
+    other_process = multiprocessing.get_context("fork").Process(
+        target=_open_shared_store, args=(config.SHARED_VECTOR_DB_PATH,)
+    )
+    other_process.start()
+    other_process.join()
+
+    assert other_process.exitcode == 3
+    shared_store.open_shared_store(None)  # the owner itself can reopen it
+
+
+def test_janitor_collects_documents_no_view_references(shared_mode, embeddings, make_pdf):
+    kept, dropped = make_pdf(1), make_pdf(1, seed=5)
+    _ingest("student_a", "Thermo", "kept.pdf", kept, embeddings)
+    _ingest("student_b", "Heat", "dropped.pdf", dropped, embeddings)
+    with session_scope("student_b"):
+        vector_store_manager.delete_subject_vector_store("Heat")
+
+    janitor = StoreJanitor(root=config.SESSIONS_ROOT, active_window_seconds=1e-9)
+    report = janitor.sweep()
+
+    assert report["shared_documents_removed"] == 1
+    store = shared_store.open_shared_store(embeddings)
+    assert {metadata["doc_hash"] for metadata in store.get()["metadatas"]} == set(shared_store._load_registry())
+    assert _view("student_a", "Thermo", embeddings).similarity_search("entropy")
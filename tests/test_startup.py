@@ -0,0 +1,9 @@
+# --- 2. Local application imports ---
+from benchmarks.run_benchmarks import bench_startup
+
+
+def test_landing_page_runs_without_loading_the_vector_store_stack():
+    result = bench_startup(reruns=1, cold_starts=1)
+
+    assert not result["app_exception"]
+    assert result["heavy_modules_loaded"] == []
@@ -0,0 +1,174 @@
+# --- 1. Standard library imports ---
+import multiprocessing
+import os
+import threading
+import time
+
+# --- 2. Third-party imports ---
+import pytest
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiEmbeddings
+from src import config, store_janitor
+from src.ingest_jobs import IngestJobQueue
+from src.store_janitor import StoreJanitor
+from src.subject_catalog import session_scope
+
+
+def _make_subject(session_id: str, subject_name: str, size: int = 1000) -> str:
+    subject_db_path = os.path.join(config.SESSIONS_ROOT, session_id, f"subject_{subject_name}_db")
+    os.makedirs(subject_db_path)
+    with open(os.path.join(subject_db_path, "data.bin"), "wb") as f:
+        f.write(b"x" * size)
+    return subject_db_path
+
+
+def _age(path: str, seconds: float):
+    """Backdates the modification time of a directory tree."""
+    stamp = time.time() - seconds
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            os.utime(os.path.join(dir_path, file_name), (stamp, stamp))
+        os.utime(dir_path, (stamp, stamp))
+
+
+def test_sessions_idle_past_the_ttl_are_deleted(session_dir, tmp_path):
+    idle = _make_subject("idle_student", "thermo")
+    active = _make_subject("active_student", "fluids")
+    outside = tmp_path / "subject_unrelated_db"
+    outside.mkdir()
+    _age(os.path.dirname(idle), 3600)
+    _age(str(outside), 3600)
+    janitor = StoreJanitor(session_ttl_seconds=600, active_window_seconds=60)
+    evicted = []
+    janitor.on_evict.append(evicted.append)
+    janitor.touch(active)
+
+    report = janitor.sweep()
+
+    assert evicted == [idle]
+    assert [entry["reason"] for entry in report["evicted"]] == ["session_ttl"]
+    assert not os.path.exists(os.path.dirname(idle))
+    assert os.path.exists(active)
+    # Only the app's own sessions directory is ever cleaned.
+    assert outside.exists()
+
+
+def test_quota_evicts_least_recently_used_unprotected_subjects(session_dir):
+    oldest = _make_subject("student", "oldest")
+    leased = _make_subject("student", "leased")
+    newest = _make_subject("student", "newest")
+    janitor = StoreJanitor(disk_quota_bytes=2500, active_window_seconds=1e-9)
+    for path in (leased, oldest, newest):
+        janitor.touch(path)
+
+    with janitor.lease(leased):
+        report = janitor.sweep()
+
+    assert [(entry["path"], entry["reason"]) for entry in report["evicted"]] == [(oldest, "disk_quota")]
+    assert os.path.exists(leased) and os.path.exists(newest)
+    assert report["bytes_in_use"] == 2000
+
+
+def test_a_lease_keeps_an_expired_session_until_released(session_dir):
+    subject_db_path = _make_subject("student", "thermo")
+    janitor = StoreJanitor(session_ttl_seconds=1e-9, active_window_seconds=1e-9)
+
+    janitor.acquire_lease(subject_db_path)
+    assert janitor.sweep()["evicted"] == []
+    janitor.release_lease(subject_db_path)
+
+    assert [entry["path"] for entry in janitor.sweep()["evicted"]] == [subject_db_path]
+
+
+def _hold_lease(root, subject_db_path, leased, release):
+    janitor = StoreJanitor(root=root)
+    janitor.acquire_lease(subject_db_path)
+    leased.set()
+    release.wait(timeout=10)
+    # Exits without releasing, like a crashed server process.
+
+
+def test_leases_and_access_are_seen_by_every_process(session_dir):
+    leased = _make_subject("student", "leased")
+    read_only = _make_subject("student", "read_only")
+    context = multiprocessing.get_context("fork")
+    lease_taken, release = context.Event(), context.Event()
+    other_process = context.Process(target=_hold_lease, args=(config.SESSIONS_ROOT, leased, lease_taken, release))
+    other_process.start()
+    assert lease_taken.wait(timeout=10)
+    _age(os.path.dirname(leased), 3600)
+    # Another process's janitor records a query against an old, read-only store.
+    StoreJanitor().touch(read_only)
+
+    janitor = StoreJanitor(disk_quota_bytes=1, active_window_seconds=60)
+    assert janitor.sweep()["evicted"] == []
+
+    release.set()
+    other_process.join()
+    # The dead process's lease no longer protects anything.
+    assert [entry["path"] for entry in janitor.sweep()["evicted"]] == [leased]
+
+
+def test_eviction_rechecks_for_leases_taken_during_the_sweep(session_dir):
+    first = _make_subject("student", "first")
+    second = _make_subject("student", "second")
+    _age(os.path.dirname(first), 3600)
+    janitor = StoreJanitor(session_ttl_seconds=600, active_window_seconds=60)
+    # Another request opens the second subject while the janitor is deleting the first.
+    janitor.on_evict.append(lambda path: StoreJanitor().acquire_lease(second))
+
+    report = janitor.sweep()
+
+    assert [entry["path"] for entry in report["evicted"]] == [first]
+    assert os.path.exists(second)
+
+
+class BlockingEmbeddings(FakeGeminiEmbeddings):
+    """Holds every embedding call until `release` is set."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.release = threading.Event()
+
+    def embed_documents(self, texts):
+        self.release.wait(timeout=10)
+        return super().embed_documents(texts)
+
+
+def _wait_until_finished(job):
+    deadline = time.time() + 10
+    while job.snapshot()["status"] in ("queued", "running") and time.time() < deadline:
+        time.sleep(0.01)
+    return job.snapshot()["status"]
+
+
+def test_queued_and_running_jobs_protect_their_sessions(session_dir, make_pdf, monkeypatch):
+    janitor = StoreJanitor(session_ttl_seconds=1e-9, active_window_seconds=1e-9)
+    monkeypatch.setattr(store_janitor, "_janitor", janitor)
+    embeddings = BlockingEmbeddings(size=16)
+    queue = IngestJobQueue(max_workers=1)
+    pdf = make_pdf(1)
+    with session_scope("busy_student"):
+        running = queue.submit("Thermo", "a.pdf", pdf, None, embeddings_model=embeddings)
+    with session_scope("waiting_student"):
+        queued = queue.submit("Fluids", "b.pdf", pdf, None, embeddings_model=embeddings)
+
+    report = janitor.sweep()
+    assert queued.snapshot()["status"] == "queued"
+    embeddings.release.set()
+
+    assert report["evicted"] == []
+    assert os.path.exists(queued.pdf_path)
+    assert _wait_until_finished(running) == "done"
+    assert _wait_until_finished(queued) == "done"
+    # Once both jobs are finished nothing protects the sessions any more.
+    assert len(janitor.sweep()["evicted"]) == 2
+    assert os.listdir(config.SESSIONS_ROOT) == []
+
+
+@pytest.mark.parametrize("create_root", [False, True])
+def test_sessions_root_may_be_missing_or_empty(session_dir, create_root):
+    if create_root:
+        os.makedirs(config.SESSIONS_ROOT)
+    assert StoreJanitor().sweep()["evicted"] == []
@@ -0,0 +1,43 @@
+# --- 2. Third-party imports ---
+import pytest
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiChat
+from src import rag_chain_builder
+from src.numpy_store import NumpyVectorStore
+
+TEXTS = [
+    "The Carnot cycle is the most efficient heat engine cycle between two reservoirs.",
+    "Entropy of an isolated system never decreases.",
+    "Laminar flow becomes turbulent above a critical Reynolds number.",
+]
+
+
+@pytest.fixture
+def vector_store(tmp_path, embeddings):
+    store = NumpyVectorStore(str(tmp_path / "subject_db"), embeddings)
+    store.add_texts(TEXTS, metadatas=[{"source": "notes.pdf", "page": page} for page in range(len(TEXTS))])
+    return store
+
+
+def test_qa_streams_sources_before_answer_tokens(vector_store):
+    llm = FakeGeminiChat(response_tokens=20)
+    chain = rag_chain_builder.create_rag_qa_chain(vector_store, None, llm=llm)
+
+    events = list(rag_chain_builder.stream_chain_events(chain, "What is the Carnot cycle?"))
+
+    kinds = [kind for kind, _ in events]
+    assert kinds.index("sources") < kinds.index("token")
+    assert len([kind for kind in kinds if kind == "token"]) > 1  # really token by token
+    streamed_answer = "".join(value for kind, value in events if kind == "token")
+    assert streamed_answer == chain.invoke("What is the Carnot cycle?")["answer"]
+
+
+def test_quiz_streams_its_text_with_the_source_documents(vector_store):
+    chain = rag_chain_builder.create_quiz_chain(vector_store, None, llm=FakeGeminiChat())
+
+    events = list(rag_chain_builder.stream_chain_events(chain, {"context_query": "entropy", "num_questions": 3}))
+
+    sources = [value for kind, value in events if kind == "sources"]
+    assert sources and sources[0]
+    assert "Answer:" in "".join(value for kind, value in events if kind == "token")
@@ -0,0 +1,107 @@
+# --- 1. Standard library imports ---
+import io
+import os
+import zipfile
+
+# --- 2. Third-party imports ---
+import numpy as np
+import pytest
+
+# --- 3. Local application imports ---
+from src import config, ingestion, vector_store_manager
+from src.ingest_manifest import SubjectManifest, get_manifest_path
+from src.lexical_index import get_lexical_index_path
+from src.subject_catalog import get_subject_db_path
+from src.subject_snapshot import SIDECAR_PREFIX
+
+
+def _ingest(subject_name, pdf_bytes, embeddings):
+    ingestion.ingest_pdf_stream(subject_name, None, "notes.pdf", io.BytesIO(pdf_bytes), embeddings_model=embeddings)
+
+
+def _export(subject_name, embeddings) -> bytes:
+    buffer = io.BytesIO()
+    vector_store_manager.export_subject_snapshot(subject_name, buffer, embeddings_model=embeddings)
+    return buffer.getvalue()
+
+
+def _contents(subject_name, embeddings):
+    store = vector_store_manager.create_or_load_subject_vector_store(subject_name, None, embeddings_model=embeddings)
+    result = store.get(include=["documents", "metadatas", "embeddings"])
+    order = np.argsort(result["ids"])
+    return (
+        [result["ids"][i] for i in order],
+        [result["documents"][i] for i in order],
+        [result["metadatas"][i] for i in order],
+        np.asarray(result["embeddings"], dtype=np.float32)[order],
+    )
+
+
+@pytest.mark.parametrize("backend", ["chroma", "numpy"])
+def test_a_snapshot_round_trips_without_embedding_calls(session_dir, embeddings, make_pdf, backend):
+    _ingest("Thermo", make_pdf(3), embeddings)
+    snapshot = _export("Thermo", embeddings)
+    embedded_before = embeddings.texts_embedded
+
+    result = vector_store_manager.import_subject_snapshot(
+        "Thermo copy", io.BytesIO(snapshot), embeddings_model=embeddings, backend=backend
+    )
+
+    assert embeddings.texts_embedded == embedded_before
+    ids, texts, metadatas, vectors = _contents("Thermo", embeddings)
+    copy_ids, copy_texts, copy_metadatas, copy_vectors = _contents("Thermo copy", embeddings)
+    assert result == {"subject_name": "Thermo copy", "chunks_imported": len(ids)}
+    assert (copy_ids, copy_texts, copy_metadatas) == (ids, texts, metadatas)
+    # Vectors travel as float16.
+    assert np.allclose(copy_vectors, vectors, atol=1e-2)
+    assert vector_store_manager.get_subject_backend(get_subject_db_path("Thermo copy")) == backend
+
+    copy_path = get_subject_db_path("Thermo copy")
+    assert os.path.exists(get_lexical_index_path(copy_path))
+    manifest = SubjectManifest.load(copy_path)
+    assert manifest.file_hashes() == SubjectManifest.load(get_subject_db_path("Thermo")).file_hashes()
+    assert manifest.index_version > 0
+
+
+def test_a_shared_subject_is_imported_as_a_dedicated_store(session_dir, embeddings, make_pdf, monkeypatch):
+    monkeypatch.setattr(config, "SHARED_STORAGE_ENABLED", True)
+    _ingest("Thermo", make_pdf(2), embeddings)
+    snapshot = _export("Thermo", embeddings)
+    monkeypatch.setattr(config, "SHARED_STORAGE_ENABLED", False)
+
+    vector_store_manager.import_subject_snapshot("Thermo copy", io.BytesIO(snapshot), embeddings_model=embeddings)
+
+    manifest = SubjectManifest.load(get_subject_db_path("Thermo copy"))
+    assert manifest.storage == "dedicated"
+    # Its manifest lists the imported chunks, so re-uploading the file replaces them.
+    assert sorted(manifest.all_chunk_ids()) == _contents("Thermo copy", embeddings)[0]
+
+
+def test_unusable_snapshots_are_rejected(session_dir, embeddings, make_pdf, monkeypatch):
+    _ingest("Thermo", make_pdf(1), embeddings)
+    snapshot = _export("Thermo", embeddings)
+
+    with pytest.raises(ValueError, match="already exists"):
+        vector_store_manager.import_subject_snapshot(None, io.BytesIO(snapshot), embeddings_model=embeddings)
+    with pytest.raises(ValueError, match="Unreadable"):
+        vector_store_manager.import_subject_snapshot("Copy", io.BytesIO(b"not a zip"), embeddings_model=embeddings)
+    monkeypatch.setattr(config, "EMBEDDING_MODEL_NAME", "another-embedding-model")
+    with pytest.raises(ValueError, match="re-upload"):
+        vector_store_manager.import_subject_snapshot("Copy", io.BytesIO(snapshot), embeddings_model=embeddings)
+    assert not os.path.exists(get_subject_db_path("Copy"))
+
+
+def test_only_known_sidecar_files_are_restored(session_dir, embeddings, make_pdf, tmp_path):
+    _ingest("Thermo", make_pdf(1), embeddings)
+    buffer = io.BytesIO(_export("Thermo", embeddings))
+    with zipfile.ZipFile(buffer, "a") as archive:
+        archive.writestr(SIDECAR_PREFIX + "/../../../escaped.txt", b"nope")
+        archive.writestr(SIDECAR_PREFIX + "_notes.txt", b"nope")
+    buffer.seek(0)
+
+    vector_store_manager.import_subject_snapshot("Thermo copy", buffer, embeddings_model=embeddings)
+
+    copy_path = get_subject_db_path("Thermo copy")
+    assert os.path.exists(get_manifest_path(copy_path))
+    assert not os.path.exists(copy_path + "_notes.txt")
+    assert not any(name == "escaped.txt" for _, _, files in os.walk(tmp_path) for name in files)
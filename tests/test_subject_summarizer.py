@@ -0,0 +1,76 @@
+# --- 1. Standard library imports ---
+import io
+
+# --- 3. Local application imports ---
+from benchmarks.fakes import FakeGeminiChat
+from src import config, ingestion, vector_store_manager
+from src.subject_summarizer import SubjectSummarizer, _group_by_budget, create_subject_summary_chain
+from src.summary_cache import PartialSummaryCache
+
+
+def _ingest(file_name, pdf_bytes, embeddings):
+    ingestion.ingest_pdf_stream("Thermo", None, file_name, io.BytesIO(pdf_bytes), embeddings_model=embeddings)
+
+
+def _summarizer(embeddings, llm):
+    vector_store = vector_store_manager.create_or_load_subject_vector_store("Thermo", None, embeddings_model=embeddings)
+    return SubjectSummarizer(vector_store, vector_store_manager.get_subject_db_path("Thermo"), llm)
+
+
+def test_group_by_budget_keeps_order_and_never_drops_oversized_texts():
+    groups = _group_by_budget(["a" * 40, "b" * 40, "c" * 400, "d" * 4], max_tokens=30)
+
+    assert groups == [["a" * 40, "b" * 40], ["c" * 400], ["d" * 4]]
+
+
+def test_document_summaries_are_cached_by_content(session_dir, embeddings, make_pdf):
+    _ingest("a.pdf", make_pdf(2), embeddings)
+    _ingest("b.pdf", make_pdf(2, seed=1), embeddings)
+    llm = FakeGeminiChat(response_tokens=5)
+
+    first = _summarizer(embeddings, llm).summarize_documents()
+    calls_after_first = llm.request_count
+    assert [name for name, _ in first] == ["a.pdf", "b.pdf"]
+    assert calls_after_first >= 2
+
+    assert _summarizer(embeddings, llm).summarize_documents() == first
+    assert llm.request_count == calls_after_first
+
+    # Only the changed document is summarized again, and the stale entry is pruned.
+    _ingest("b.pdf", make_pdf(2, seed=2), embeddings)
+    third = _summarizer(embeddings, llm).summarize_documents()
+    assert third[0] == first[0] and third[1] != first[1]
+    assert llm.request_count > calls_after_first
+    assert len(PartialSummaryCache.load(vector_store_manager.get_subject_db_path("Thermo")).entries) == 2
+
+
+def test_documents_merged_into_near_duplicates_are_still_summarized(session_dir, embeddings, make_pdf):
+    slides = make_pdf(2)
+    _ingest("lecture.pdf", slides, embeddings)
+    _ingest("copy.pdf", slides, embeddings)
+
+    summaries = _summarizer(embeddings, FakeGeminiChat(response_tokens=5)).summarize_documents()
+
+    assert [name for name, _ in summaries] == ["copy.pdf", "lecture.pdf"]
+
+
+def test_long_documents_are_mapped_in_sections_and_reduced(session_dir, embeddings, make_pdf, monkeypatch):
+    monkeypatch.setattr(config, "SUMMARY_MAP_SECTION_TOKENS", 300)
+    _ingest("long.pdf", make_pdf(6), embeddings)
+    llm = FakeGeminiChat(response_tokens=5)
+
+    [(name, summary)] = _summarizer(embeddings, llm).summarize_documents()
+
+    # More than one map call, plus at least one combine call.
+    assert llm.request_count >= 3
+    assert name == "long.pdf" and summary
+
+
+def test_subject_summary_chain_returns_the_final_summary(session_dir, embeddings, make_pdf):
+    _ingest("a.pdf", make_pdf(2), embeddings)
+    vector_store = vector_store_manager.create_or_load_subject_vector_store("Thermo", None, embeddings_model=embeddings)
+    chain = create_subject_summary_chain(
+        vector_store, vector_store_manager.get_subject_db_path("Thermo"), None, llm=FakeGeminiChat(response_tokens=5)
+    )
+
+    assert len(chain.invoke("Thermo").split()) == 5